@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python 执行器单次调用开销微基准
+
+对比每次调用的固定开销：
+- 旧路径：create_safe_globals() 重建沙箱 + 对源码字符串 eval/exec
+- 新路径：从只读模板复制沙箱 + 复用编译缓存中的代码对象
+- 端到端：通过工作进程池执行一次短代码
+
+用法:
+    python benchmarks/bench_python_executor.py --iterations 20000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import mcp_server_python_executor as executor
+
+
+EXPRESSION = "sum(x * x for x in range(10))"
+CODE = "result = sum(x * x for x in range(10))"
+
+
+def bench(label: str, func, iterations: int) -> float:
+    """运行 iterations 次并输出每次调用的平均耗时（微秒）"""
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    per_call = (time.perf_counter() - start) / iterations * 1e6
+    print(f"{label:<40} {per_call:10.2f} us/call")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python 执行器单次调用开销微基准")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--pool-iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    n = args.iterations
+    print(f"表达式: {EXPRESSION}\n")
+
+    compiled_expr = compile(EXPRESSION, "<string>", "eval")
+    sandbox = executor.new_sandbox()
+    baseline = bench("用户代码本身（预编译，复用环境）", lambda: eval(compiled_expr, sandbox, {}), n)
+
+    old_eval = bench("旧 evaluate_expression 路径",
+                     lambda: eval(EXPRESSION, executor.create_safe_globals(), {}), n)
+    new_eval = bench("新 evaluate_expression 路径",
+                     lambda: eval(executor.code_cache.compile(EXPRESSION, "eval"), executor.new_sandbox(), {}), n)
+
+    limits = executor.resolve_limits({})
+    new_exec = bench("新 execute_python 工作进程内路径", lambda: executor._execute(CODE, limits), n)
+
+    print(f"\n固定开销: 旧 {old_eval - baseline:.2f} us，新 {new_eval - baseline:.2f} us")
+    print(f"工作进程内 execute_python 总耗时: {new_exec:.2f} us")
+
+    async def pool_round_trips():
+        await executor.pool.start()
+        try:
+            await executor.execute_code_with_timeout(CODE, 5, limits)
+            start = time.perf_counter()
+            for _ in range(args.pool_iterations):
+                await executor.execute_code_with_timeout(CODE, 5, limits)
+            per_call = (time.perf_counter() - start) / args.pool_iterations * 1e6
+            print(f"{'端到端（进程池往返）':<40} {per_call:10.2f} us/call")
+        finally:
+            executor.pool.close()
+
+    asyncio.run(pool_round_trips())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP 传输方式单次调用延迟微基准
+
+通过 MCPManager 对同一类轻量工具分别以三种方式调用，对比每次调用的延迟：
+- inprocess：导入 mcp_server_calc 的 app，经内存流连接
+- stdio：python mcp_server_calc.py 子进程
+- rest：uvicorn 运行 mcp_server_rest（echo 工具）
+
+工具本身只需几微秒，测得的延迟基本都是传输和编解码开销。
+
+用法:
+    python benchmarks/bench_transports.py --iterations 2000
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "server"))
+
+from mcp_manager import MCPManager
+from models import MCPServerConfig
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+async def bench(manager: MCPManager, label: str, tool_key: str, arguments: Dict, iterations: int):
+    """调用 iterations 次并输出延迟分布（微秒）"""
+    for _ in range(min(50, iterations)):
+        await manager.call_tool(tool_key, arguments)
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await manager.call_tool(tool_key, arguments)
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+    mean = sum(latencies) / len(latencies)
+    print(f"{label:<12} mean={mean:10.1f} us  p50={percentile(latencies, 50):10.1f} us  "
+          f"p95={percentile(latencies, 95):10.1f} us  p99={percentile(latencies, 99):10.1f} us")
+
+
+async def wait_for_rest(manager: MCPManager, config: MCPServerConfig):
+    """REST 服务器启动需要时间，连接失败时重试"""
+    for _ in range(50):
+        try:
+            await manager.connect_to_server(config)
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("REST 服务器未能启动")
+
+
+async def run(args):
+    manager = MCPManager(config_file=ROOT_DIR / "benchmarks" / "no-config.json")
+    calc_arguments = {"expression": "1 + 2 * 3"}
+    print(f"每种方式 {args.iterations} 次调用\n")
+
+    try:
+        await manager.connect_to_server(MCPServerConfig(
+            name="calc-inprocess", type="inprocess", module=str(ROOT_DIR / "mcp_server_calc.py")
+        ))
+        await bench(manager, "inprocess", "calc-inprocess:calculator", calc_arguments, args.iterations)
+
+        await manager.connect_to_server(MCPServerConfig(
+            name="calc-stdio", type="stdio", command=sys.executable,
+            args=[str(ROOT_DIR / "mcp_server_calc.py")]
+        ))
+        await bench(manager, "stdio", "calc-stdio:calculator", calc_arguments, args.iterations)
+
+        if not args.skip_rest:
+            rest_process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "mcp_server_rest:app",
+                 "--port", str(args.rest_port), "--log-level", "warning"],
+                cwd=ROOT_DIR
+            )
+            try:
+                await wait_for_rest(manager, MCPServerConfig(
+                    name="rest", type="rest", url=f"http://127.0.0.1:{args.rest_port}"
+                ))
+                await bench(manager, "rest", "rest:echo", {"text": "1 + 2 * 3"}, args.iterations)
+            finally:
+                rest_process.terminate()
+                rest_process.wait()
+    finally:
+        await manager.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP 传输方式单次调用延迟微基准")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--rest-port", type=int, default=9100)
+    parser.add_argument("--skip-rest", action="store_true", help="不测试 REST 方式")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
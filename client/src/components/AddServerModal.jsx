@@ -7,6 +7,7 @@ function AddServerModal({ onClose, onAdd }) {
     command: '',
     args: '',
     url: '',
+    module: '',
     env: ''
   })
 
@@ -35,6 +36,9 @@ function AddServerModal({ onClose, onAdd }) {
       config.command = formData.command
       config.args = args
       config.env = env
+    } else if (formData.type === 'inprocess') {
+      // 进程内类型配置
+      config.module = formData.module.trim()
     } else {
       // rest 类型配置
       config.url = formData.url
@@ -91,6 +95,7 @@ function AddServerModal({ onClose, onAdd }) {
                 className="form-select"
               >
                 <option value="stdio">stdio 协议（本地进程）</option>
+                <option value="inprocess">进程内（导入 Python 模块）</option>
                 <option value="rest">REST API（HTTP 服务）</option>
               </select>
             </div>
@@ -129,6 +134,20 @@ function AddServerModal({ onClose, onAdd }) {
                   />
                 </div>
               </>
+            ) : formData.type === 'inprocess' ? (
+              <div className="form-group">
+                <label>模块 *</label>
+                <input 
+                  type="text" 
+                  required
+                  value={formData.module}
+                  onChange={(e) => setFormData({...formData, module: e.target.value})}
+                  placeholder="例如: mcp_server_calc.py"
+                />
+                <small style={{color: '#64748b', fontSize: '12px', marginTop: '5px', display: 'block'}}>
+                  模块名或 .py 文件路径，模块中需要有 MCP 服务器实例 app，在 Web 服务器进程内运行
+                </small>
+              </div>
             ) : (
               <div className="form-group">
                 <label>服务器 URL *</label>
@@ -71,6 +71,20 @@ function ChatBox() {
           arguments: data.arguments
         }])
         break
+      case 'tool_progress':
+        // 工具执行中的部分输出，追加到同一工具的进度消息中
+        setMessages(prev => {
+          const last = prev[prev.length - 1]
+          if (last && last.type === 'tool_progress' && last.tool === data.tool) {
+            return [...prev.slice(0, -1), { ...last, content: last.content + data.content }]
+          }
+          return [...prev, {
+            type: 'tool_progress',
+            tool: data.tool,
+            content: data.content
+          }]
+        })
+        break
       case 'tool_result':
         setMessages(prev => [...prev, {
           type: 'tool_result',
@@ -90,6 +104,13 @@ function ChatBox() {
           content: `❌ 错误: ${data.content}`
         }])
         break
+      case 'reconnect':
+        // 服务器排空重启，连接关闭后会自动重连
+        setMessages(prev => [...prev, {
+          type: 'system',
+          content: `🔄 ${data.content}`
+        }])
+        break
     }
   }
 
@@ -198,6 +219,12 @@ function ChatBox() {
                   </pre>
                 </div>
               )}
+              {msg.type === 'tool_progress' && (
+                <div className="tool-result">
+                  <div className="tool-result-header">⏳ 执行中: {msg.tool}</div>
+                  <div className="tool-result-content">{msg.content}</div>
+                </div>
+              )}
               {msg.type === 'tool_result' && (
                 <div className="tool-result">
                   <div className="tool-result-header">✅ 工具结果: {msg.tool}</div>
@@ -81,6 +81,8 @@ function ServerList({ servers, connectedServers, onUpdate }) {
             let displayInfo = ''
             if (serverType === 'rest') {
               displayInfo = `REST API: ${server.url || ''}`
+            } else if (serverType === 'inprocess') {
+              displayInfo = `进程内: ${server.module || ''}`
             } else {
               const cmd = server.command || ''
               const args = Array.isArray(server.args) ? server.args.join(' ') : ''
@@ -92,7 +94,7 @@ function ServerList({ servers, connectedServers, onUpdate }) {
                 <div className="server-name">
                   <span className={`status-indicator ${isConnected ? 'connected' : ''}`}></span>
                   {server.name}
-                  <span className="server-type-badge">{serverType === 'rest' ? 'REST' : 'stdio'}</span>
+                  <span className="server-type-badge">{serverType === 'rest' ? 'REST' : serverType === 'inprocess' ? '进程内' : 'stdio'}</span>
                 </div>
                 <div className="server-command">
                   {displayInfo}
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+假 LLM - 用于压测的通义千问替身
+
+返回与 dashscope ``Generation.call(result_format='message')`` 相同结构的响应，
+按脚本先发起若干次工具调用，再给出最终回答。延迟与回答大小可配置。
+"""
+
+import itertools
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+class FakeLLM:
+    """可配置的假模型，签名与 Generation.call 一致"""
+
+    def __init__(
+        self,
+        latency_ms: float = 50,
+        tool_calls_per_turn: int = 1,
+        tool_names: Optional[List[str]] = None,
+        tool_arguments: Optional[Dict[str, Any]] = None,
+        response_bytes: int = 256
+    ):
+        """
+        初始化假模型
+
+        Args:
+            latency_ms: 每次调用的模拟延迟（同步阻塞，与真实 SDK 行为一致）
+            tool_calls_per_turn: 每轮对话在最终回答前发起的工具调用次数
+            tool_names: 允许调用的工具键列表，为空时使用请求中的全部工具
+            tool_arguments: 工具调用参数
+            response_bytes: 最终回答的大小（字节）
+        """
+        self.latency_ms = latency_ms
+        self.tool_calls_per_turn = tool_calls_per_turn
+        self.tool_names = tool_names or []
+        self.tool_arguments = tool_arguments or {}
+        self.response_bytes = response_bytes
+        self._call_ids = itertools.count()
+
+    def __call__(self, model: str, messages: List[Dict[str, Any]],
+                 tools: Optional[List[Dict[str, Any]]] = None, **kwargs) -> SimpleNamespace:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        # 统计本轮用户消息之后已经完成的工具调用次数
+        done = 0
+        for msg in reversed(messages):
+            if msg["role"] == "user":
+                break
+            if msg["role"] == "tool":
+                done += 1
+
+        candidates = [t["function"]["name"] for t in tools or []]
+        if self.tool_names:
+            candidates = [name for name in candidates if name in self.tool_names]
+
+        if candidates and done < self.tool_calls_per_turn:
+            name = candidates[done % len(candidates)]
+            message = SimpleNamespace(
+                role="assistant",
+                content="",
+                tool_calls=[{
+                    "id": f"call_{next(self._call_ids)}",
+                    "type": "function",
+                    "function": {
+                        "name": name,
+                        "arguments": json.dumps(self.tool_arguments, ensure_ascii=False)
+                    }
+                }]
+            )
+        else:
+            message = SimpleNamespace(
+                role="assistant",
+                content="x" * self.response_bytes,
+                tool_calls=None
+            )
+
+        return SimpleNamespace(
+            status_code=200,
+            message="",
+            output=SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        )
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+假 REST MCP 服务器 - 用于压测
+
+实现与 mcp_server_rest.py 相同的 /mcp/tools 和 /mcp/call 接口，
+提供一个 fake_work 工具，按配置的延迟和负载大小返回结果。
+
+用法:
+    python fake_rest_server.py --port 9100 --latency-ms 20 --payload-bytes 1024
+"""
+
+import argparse
+import asyncio
+from typing import Any, Dict
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+import uvicorn
+
+
+# 创建 FastAPI 应用
+app = FastAPI(title="Fake MCP REST Server")
+
+# 压测参数（在 main 中根据命令行设置）
+settings = argparse.Namespace(latency_ms=10.0, payload_bytes=256)
+
+
+class ToolCallRequest(BaseModel):
+    tool_name: str
+    arguments: Dict[str, Any]
+
+
+@app.get("/mcp/tools")
+async def get_tools():
+    """获取工具列表"""
+    return [{
+        "name": "fake_work",
+        "description": "模拟一次耗时的工具调用，返回固定大小的结果",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "note": {
+                    "type": "string",
+                    "description": "任意文本，会原样出现在结果开头"
+                }
+            }
+        }
+    }]
+
+
+@app.post("/mcp/call")
+async def call_tool(request: ToolCallRequest):
+    """执行工具调用"""
+    if request.tool_name != "fake_work":
+        return {"success": False, "result": "", "error": f"未知工具: {request.tool_name}"}
+
+    await asyncio.sleep(settings.latency_ms / 1000)
+    note = request.arguments.get("note", "")
+    return {"success": True, "result": note + "x" * settings.payload_bytes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="假 REST MCP 服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="每次调用的延迟（毫秒）")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="结果大小（字节）")
+    settings = parser.parse_args()
+    uvicorn.run(app, host=settings.host, port=settings.port, log_level="warning")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+假 stdio MCP 服务器 - 用于压测
+
+提供一个 fake_work 工具，按配置的延迟和负载大小返回结果。
+
+用法:
+    python fake_stdio_server.py --latency-ms 20 --payload-bytes 1024
+"""
+
+import argparse
+import asyncio
+from typing import Any, List
+
+from mcp.server import Server
+from mcp.server.stdio import stdio_server
+from mcp.types import Tool, TextContent
+
+
+# 创建服务器实例
+app = Server("fake-stdio-server")
+
+# 压测参数（在 main 中根据命令行设置）
+settings = argparse.Namespace(latency_ms=10.0, payload_bytes=256)
+
+
+@app.list_tools()
+async def list_tools() -> List[Tool]:
+    """列出所有可用的工具"""
+    return [
+        Tool(
+            name="fake_work",
+            description="模拟一次耗时的工具调用，返回固定大小的结果",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "note": {
+                        "type": "string",
+                        "description": "任意文本，会原样出现在结果开头"
+                    }
+                }
+            }
+        )
+    ]
+
+
+@app.call_tool()
+async def call_tool(name: str, arguments: Any) -> List[TextContent]:
+    """执行工具调用"""
+    if name != "fake_work":
+        return [TextContent(type="text", text=f"未知工具: {name}")]
+
+    await asyncio.sleep(settings.latency_ms / 1000)
+    note = (arguments or {}).get("note", "")
+    return [TextContent(type="text", text=note + "x" * settings.payload_bytes)]
+
+
+async def main():
+    """运行服务器"""
+    async with stdio_server() as (read_stream, write_stream):
+        await app.run(
+            read_stream,
+            write_stream,
+            app.create_initialization_options()
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="假 stdio MCP 服务器")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="每次调用的延迟（毫秒）")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="结果大小（字节）")
+    settings = parser.parse_args()
+    asyncio.run(main())
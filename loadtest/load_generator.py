@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebSocket 压测负载生成器
+
+打开 N 个 /ws/chat 客户端，按脚本驱动对话，统计吞吐量和
+p50/p95/p99 延迟，结果以 JSON 输出，便于不同版本之间对比。
+
+用法:
+    python load_generator.py --url ws://127.0.0.1:8000/ws/chat \\
+        --clients 50 --conversations 5 --output result.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import websockets
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
+# 默认对话脚本（每条消息对应一轮对话）
+DEFAULT_SCRIPT = [
+    "请调用工具完成一次计算",
+    "再调用一次工具",
+    "总结一下结果",
+]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """计算延迟分布（毫秒）"""
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3),
+    }
+
+
+class ClientStats:
+    """单个客户端的统计数据"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttfb: List[float] = []
+        self.turns_ok = 0
+        self.turns_failed = 0
+        self.frames = 0
+        self.bytes_received = 0
+        self.connect_errors = 0
+        self.errors: List[str] = []
+
+
+def decode_frame(raw) -> Dict[str, Any]:
+    """解码一帧数据（文本帧为 JSON，二进制帧为 msgpack）"""
+    if isinstance(raw, bytes):
+        return msgpack.unpackb(raw, raw=False)
+    return json.loads(raw)
+
+
+async def run_turn(ws, message: str, stats: ClientStats, args) -> None:
+    """发送一条消息并等待最终回答"""
+    payload = {"message": message}
+    if args.subprotocol == "msgpack":
+        await ws.send(msgpack.packb(payload, use_bin_type=True))
+    else:
+        await ws.send(json.dumps(payload, ensure_ascii=False))
+
+    start = time.perf_counter()
+    first_frame = None
+    failed = False
+    deadline = start + args.turn_timeout
+
+    while True:
+        # 出现错误帧后只再等待一个宽限期，ChatBot 的错误路径不一定以 response 结束
+        wait = deadline - time.perf_counter()
+        if failed:
+            wait = min(wait, args.error_grace)
+        if wait <= 0:
+            break
+        try:
+            raw = await asyncio.wait_for(ws.recv(), timeout=wait)
+        except asyncio.TimeoutError:
+            if not failed:
+                failed = True
+                stats.errors.append("turn timeout")
+            break
+
+        now = time.perf_counter()
+        if first_frame is None:
+            first_frame = now
+        stats.frames += 1
+        stats.bytes_received += len(raw)
+
+        frame = decode_frame(raw)
+        if frame.get("type") == "response":
+            break
+        if frame.get("type") == "error":
+            failed = True
+            stats.errors.append(str(frame.get("content"))[:200])
+
+    end = time.perf_counter()
+    if failed:
+        stats.turns_failed += 1
+    else:
+        stats.turns_ok += 1
+        stats.latencies.append((end - start) * 1000)
+        stats.ttfb.append(((first_frame or end) - start) * 1000)
+
+
+async def run_client(client_id: int, script: List[str], args) -> ClientStats:
+    """单个客户端：依次执行若干次对话"""
+    stats = ClientStats()
+    if args.ramp_up:
+        await asyncio.sleep(args.ramp_up * client_id / args.clients)
+
+    subprotocols = [args.subprotocol] if args.subprotocol else None
+    for _ in range(args.conversations):
+        try:
+            async with websockets.connect(args.url, subprotocols=subprotocols, max_size=None) as ws:
+                for message in script:
+                    await run_turn(ws, message, stats, args)
+        except Exception as e:
+            stats.connect_errors += 1
+            stats.errors.append(f"{type(e).__name__}: {e}")
+    return stats
+
+
+async def run(args) -> Dict[str, Any]:
+    """运行压测并汇总结果"""
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_client(i, script, args) for i in range(args.clients)
+    ])
+    duration = time.perf_counter() - start
+
+    latencies = [v for s in results for v in s.latencies]
+    ttfb = [v for s in results for v in s.ttfb]
+    turns_ok = sum(s.turns_ok for s in results)
+    errors = [e for s in results for e in s.errors]
+
+    return {
+        "label": args.label,
+        "config": {
+            "url": args.url,
+            "clients": args.clients,
+            "conversations": args.conversations,
+            "turns_per_conversation": len(script),
+            "subprotocol": args.subprotocol,
+        },
+        "summary": {
+            "duration_s": round(duration, 3),
+            "turns_ok": turns_ok,
+            "turns_failed": sum(s.turns_failed for s in results),
+            "connect_errors": sum(s.connect_errors for s in results),
+            "throughput_turns_per_s": round(turns_ok / duration, 3) if duration else None,
+            "frames": sum(s.frames for s in results),
+            "bytes_received": sum(s.bytes_received for s in results),
+        },
+        "latency_ms": summarize(latencies),
+        "ttfb_ms": summarize(ttfb),
+        "sample_errors": errors[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/ws/chat 压测负载生成器")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/chat")
+    parser.add_argument("--clients", type=int, default=10, help="并发客户端数")
+    parser.add_argument("--conversations", type=int, default=3, help="每个客户端的对话次数")
+    parser.add_argument("--script", help="对话脚本 JSON 文件（消息字符串列表）")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="客户端启动分散到的秒数")
+    parser.add_argument("--turn-timeout", type=float, default=60.0, help="单轮对话超时（秒）")
+    parser.add_argument("--error-grace", type=float, default=0.5, help="错误帧后的等待时间（秒）")
+    parser.add_argument("--subprotocol", choices=["json", "msgpack"], help="协商的 WebSocket 子协议")
+    parser.add_argument("--label", default="", help="结果标签（如提交号），便于对比")
+    parser.add_argument("--output", help="结果 JSON 文件路径，默认输出到标准输出")
+    args = parser.parse_args()
+
+    if args.subprotocol == "msgpack" and msgpack is None:
+        parser.error("使用 msgpack 子协议需要安装 msgpack")
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    summary = result["summary"]
+    latency = result["latency_ms"]
+    print(
+        f"完成 {summary['turns_ok']} 轮（失败 {summary['turns_failed']}），"
+        f"吞吐 {summary['throughput_turns_per_s']} 轮/秒，"
+        f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压测用 Web 服务器启动器
+
+以假 LLM 和本地假 MCP 服务器启动 server/mcp_web_server.py 中的应用，
+不读写 mcp_servers_config.json，也不访问外部网络。
+
+用法:
+    python run_server.py --port 8000 --stdio-servers 2 --rest \\
+        --llm-latency-ms 50 --tool-latency-ms 20 --tool-payload-bytes 4096
+"""
+
+import argparse
+import asyncio
+import logging
+import subprocess
+import sys
+from pathlib import Path
+
+import uvicorn
+
+LOADTEST_DIR = Path(__file__).resolve().parent
+SERVER_DIR = LOADTEST_DIR.parent / "server"
+sys.path.insert(0, str(SERVER_DIR))
+
+from fake_llm import FakeLLM
+import mcp_web_server
+from models import MCPServerConfig
+
+logger = logging.getLogger("loadtest.run_server")
+
+
+def build_configs(args) -> list:
+    """构造假 MCP 服务器配置"""
+    tool_args = [
+        "--latency-ms", str(args.tool_latency_ms),
+        "--payload-bytes", str(args.tool_payload_bytes),
+    ]
+    configs = [
+        MCPServerConfig(
+            name=f"fake-stdio-{i}",
+            type="stdio",
+            command=sys.executable,
+            args=[str(LOADTEST_DIR / "fake_stdio_server.py")] + tool_args
+        )
+        for i in range(args.stdio_servers)
+    ]
+    if args.rest:
+        configs.append(MCPServerConfig(
+            name="fake-rest",
+            type="rest",
+            url=f"http://127.0.0.1:{args.rest_port}"
+        ))
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以假 LLM 和假 MCP 服务器启动 Web 服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="假 LLM 每次调用的延迟")
+    parser.add_argument("--tool-calls-per-turn", type=int, default=1, help="每轮对话的工具调用次数")
+    parser.add_argument("--response-bytes", type=int, default=256, help="最终回答大小")
+    parser.add_argument("--stdio-servers", type=int, default=1, help="假 stdio 服务器数量")
+    parser.add_argument("--rest", action="store_true", help="同时启动假 REST 服务器")
+    parser.add_argument("--rest-port", type=int, default=9100)
+    parser.add_argument("--tool-latency-ms", type=float, default=10.0, help="假工具调用延迟")
+    parser.add_argument("--tool-payload-bytes", type=int, default=256, help="假工具结果大小")
+    args = parser.parse_args()
+
+    rest_process = None
+    if args.rest:
+        rest_process = subprocess.Popen([
+            sys.executable, str(LOADTEST_DIR / "fake_rest_server.py"),
+            "--port", str(args.rest_port),
+            "--latency-ms", str(args.tool_latency_ms),
+            "--payload-bytes", str(args.tool_payload_bytes),
+        ])
+
+    app = mcp_web_server.app
+    manager, chatbot = mcp_web_server.init_managers()
+    manager.configs = build_configs(args)
+    chatbot.llm_call = FakeLLM(
+        latency_ms=args.llm_latency_ms,
+        tool_calls_per_turn=args.tool_calls_per_turn,
+        tool_arguments={"note": "loadtest "},
+        response_bytes=args.response_bytes
+    )
+
+    @app.on_event("startup")
+    async def connect_fake_servers():
+        """连接所有假 MCP 服务器（REST 服务器启动需要时间，失败时重试）"""
+        for config in manager.configs:
+            for attempt in range(20):
+                try:
+                    await manager.connect_to_server(config)
+                    break
+                except Exception as e:
+                    logger.warning(f"连接 {config.name} 失败（第 {attempt + 1} 次）: {e}")
+                    await asyncio.sleep(0.5)
+
+    try:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    finally:
+        if rest_process:
+            rest_process.terminate()
+            rest_process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大结果暂存（spool）- MCP 服务器与 Web 服务器共用
+
+超过阈值的工具结果由 MCP 服务器写入本地暂存目录，协议中只传输一个标记
+（句柄 + 预览）；MCPManager 识别标记后只把预览交给对话，完整结果通过
+Web API 按需分页读取。stdio 管道和对话消息的大小不再随结果大小增长。
+
+MCP 服务器端:
+    @app.call_tool()
+    @spool_large_results
+    async def call_tool(name, arguments): ...
+
+Web 服务器端:
+    parse_marker(text) / describe(marker) / read_page(handle, offset, length)
+
+服务器以进程内方式运行时没有管道，Web 服务器调用 disable() 后装饰器直接返回原结果。
+
+只依赖标准库；写入标记时才导入 mcp.types。
+"""
+
+import asyncio
+import functools
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# 暂存目录（MCPManager 启动 stdio 服务器时通过该环境变量传给子进程，两端保持一致）
+SPOOL_DIR_ENV = "MCP_SPOOL_DIR"
+SPOOL_DIR = Path(os.getenv(SPOOL_DIR_ENV) or Path(tempfile.gettempdir()) / "mcp-spool")
+
+# 超过该字节数的结果写入暂存目录（默认高于 read_file 的单次上限，正常分段读取不受影响）
+SPOOL_THRESHOLD = int(os.getenv("MCP_SPOOL_THRESHOLD", str(512 * 1024)))
+
+# 标记中附带的预览字节数
+SPOOL_PREVIEW_BYTES = int(os.getenv("MCP_SPOOL_PREVIEW_BYTES", str(16 * 1024)))
+
+# 暂存文件保留时间（秒），写入新结果时顺带清理过期文件
+SPOOL_TTL = float(os.getenv("MCP_SPOOL_TTL", "3600"))
+_CLEANUP_INTERVAL = 60
+
+# 标记前缀（标记为单个 TextContent，前缀后接 JSON）
+MARKER_PREFIX = "@@mcp-spool@@"
+
+# 分页读取的最大字节数
+MAX_PAGE_BYTES = 1024 * 1024
+
+_HANDLE_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_last_cleanup = 0.0
+_enabled = True
+
+
+def _utf8_prefix(data: bytes, limit: int) -> bytes:
+    """不超过 limit 字节、不截断多字节字符的前缀"""
+    if len(data) <= limit:
+        return data
+    end = limit
+    while end > 0 and (data[end] & 0xC0) == 0x80:
+        end -= 1
+    return data[:end]
+
+
+def _spool_path(handle: str) -> Path:
+    if not _HANDLE_PATTERN.match(handle or ""):
+        raise ValueError(f"无效的句柄: {handle}")
+    return SPOOL_DIR / f"{handle}.txt"
+
+
+def cleanup(max_age: float = SPOOL_TTL) -> int:
+    """删除过期的暂存文件，返回删除的数量"""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(SPOOL_DIR))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.endswith(".txt") and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def write(data: bytes) -> Dict[str, Any]:
+    """
+    把结果写入暂存目录（临时文件 + 重命名，读者不会看到写了一半的文件）
+
+    Returns:
+        标记内容：handle、size、preview
+    """
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup > _CLEANUP_INTERVAL:
+        _last_cleanup = now
+        cleanup()
+
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    handle = uuid.uuid4().hex
+    fd, temp_path = tempfile.mkstemp(dir=SPOOL_DIR, prefix=f".{handle}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, _spool_path(handle))
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    preview = _utf8_prefix(data, SPOOL_PREVIEW_BYTES).decode("utf-8", errors="replace")
+    return {"handle": handle, "size": len(data), "preview": preview}
+
+
+def disable():
+    """关闭当前进程中的暂存（进程内运行的服务器与调用方共享内存，写入磁盘没有意义）"""
+    global _enabled
+    _enabled = False
+
+
+def spool_large_results(handler):
+    """
+    call_tool 处理函数的装饰器：结果超过 SPOOL_THRESHOLD 时写入暂存目录，只返回标记
+
+    只处理全部为文本的结果；图片等其他内容原样返回。
+    """
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        contents = await handler(*args, **kwargs)
+        if not _enabled or not contents or any(getattr(item, "type", None) != "text" for item in contents):
+            return contents
+        # 字符数乘以 UTF-8 最大字节数仍不超过阈值时无需编码
+        if sum(len(item.text) for item in contents) * 4 <= SPOOL_THRESHOLD:
+            return contents
+
+        data = "\n".join(item.text for item in contents).encode("utf-8")
+        if len(data) <= SPOOL_THRESHOLD:
+            return contents
+
+        from mcp.types import TextContent
+        try:
+            marker = await asyncio.to_thread(write, data)
+        except OSError:
+            return contents
+        return [TextContent(type="text", text=MARKER_PREFIX + json.dumps(marker, ensure_ascii=False))]
+
+    return wrapper
+
+
+def parse_marker(text: str) -> Optional[Dict[str, Any]]:
+    """识别暂存标记，不是标记时返回 None"""
+    if not text.startswith(MARKER_PREFIX):
+        return None
+    try:
+        marker = json.loads(text[len(MARKER_PREFIX):])
+    except ValueError:
+        return None
+    if not isinstance(marker, dict) or not _HANDLE_PATTERN.match(str(marker.get("handle", ""))):
+        return None
+    return marker
+
+
+def describe(marker: Dict[str, Any]) -> str:
+    """交给对话的文本：预览 + 完整结果的获取方式"""
+    preview = marker.get("preview", "")
+    size = marker.get("size", 0)
+    handle = marker["handle"]
+    return (
+        f"{preview}\n\n"
+        f"[结果共 {size} 字节，此处只显示前 {len(preview.encode('utf-8'))} 字节。"
+        f"完整结果已暂存，句柄 {handle}，可通过 GET /api/results/{handle}?offset=0 分页读取]"
+    )
+
+
+def read_page(handle: str, offset: int = 0, length: int = MAX_PAGE_BYTES) -> Dict[str, Any]:
+    """
+    分页读取暂存结果（页首和页尾都对齐到 UTF-8 字符边界）
+
+    offset 落在多字节字符中间时向后移到下一个字符的开头，返回的 offset 为实际起点。
+
+    Raises:
+        ValueError: 句柄无效
+        FileNotFoundError: 结果不存在或已过期
+    """
+    path = _spool_path(handle)
+    # 每页至少能容纳一个完整的 UTF-8 字符，否则分页无法前进
+    length = max(4, min(length, MAX_PAGE_BYTES))
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = max(0, min(offset, size))
+        f.seek(offset)
+        # 页首最多跳过 3 个续字节，页尾多读 3 字节用于判断是否截断多字节字符
+        data = f.read(length + 6)
+
+    skip = 0
+    while skip < min(3, len(data)) and (data[skip] & 0xC0) == 0x80:
+        skip += 1
+    offset += skip
+    page = _utf8_prefix(data[skip:], length)
+    end = offset + len(page)
+    return {
+        "handle": handle,
+        "offset": offset,
+        "end": end,
+        "size": size,
+        "next_offset": end if end < size else None,
+        "content": page.decode("utf-8", errors="replace")
+    }
+
+
+def delete(handle: str) -> bool:
+    """删除暂存结果"""
+    try:
+        os.unlink(_spool_path(handle))
+        return True
+    except FileNotFoundError:
+        return False
@@ -5,11 +5,23 @@ MCP Server - 计算工具服务器
 提供数学计算和数据处理工具
 """
 
+import array
+import ast
 import asyncio
+import base64
+import csv
+import math
+import random
 import sys
 import io
 import json
-from typing import Any, List
+from functools import lru_cache, reduce
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:  # 可选依赖，未安装时统计使用纯 Python 实现
+    numpy = None
 
 # 设置 Windows 控制台编码
 if sys.platform == 'win32':
@@ -20,10 +32,682 @@ from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
+from mcp_result_spool import spool_large_results
+
 
 # 创建服务器实例
 app = Server("calc-tools-server")
 
+# 表达式中可用的函数和常量
+FUNCTIONS = {
+    "sqrt": math.sqrt,
+    "pow": math.pow,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "atan2": math.atan2,
+    "log": math.log,
+    "log10": math.log10,
+    "log2": math.log2,
+    "exp": math.exp,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "hypot": math.hypot,
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+}
+CONSTANTS = {
+    "pi": math.pi,
+    "e": math.e,
+    "tau": math.tau,
+    "inf": math.inf,
+}
+
+# 整数乘方结果的最大位数，防止 9**9**9 之类的表达式耗尽 CPU 和内存
+MAX_POWER_BITS = 100_000
+
+# 编译缓存的最大条目数
+EXPRESSION_CACHE_SIZE = 1024
+
+# 单次调用最多的变量绑定组数和表达式数
+MAX_BINDINGS = 10_000
+MAX_BATCH_EXPRESSIONS = 1_000
+
+# 变量绑定达到该组数时尝试用 numpy 向量化求值
+VECTORIZE_MIN_ROWS = 16
+
+# float64 能精确表示的整数范围：超出的整数取值和结果留给标量求值，以得到精确结果
+FLOAT_EXACT_INT = 2 ** 53
+
+
+def _safe_power(base, exponent):
+    """乘方运算，整数结果过大时报错"""
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 \
+            and base.bit_length() * exponent > MAX_POWER_BITS:
+        raise OverflowError("乘方结果过大")
+    return base ** exponent
+
+
+# 求值环境只构建一次，每次调用不再创建字典
+_EVAL_GLOBALS = {"__builtins__": {}, "__pow__": _safe_power, **FUNCTIONS, **CONSTANTS}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+
+class _PowerRewriter(ast.NodeTransformer):
+    """把 a ** b 改写为 __pow__(a, b)，以便限制结果大小"""
+    
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(
+                ast.Call(func=ast.Name(id="__pow__", ctx=ast.Load()), args=[node.left, node.right], keywords=[]),
+                node
+            )
+        return node
+
+
+class CompiledExpression:
+    """编译后的表达式"""
+    
+    __slots__ = ("source", "code", "variables")
+    
+    def __init__(self, source: str, code, variables: Tuple[str, ...]):
+        self.source = source
+        self.code = code
+        self.variables = variables
+    
+    def evaluate(self, bindings: Optional[Dict[str, Any]] = None):
+        """
+        求值
+        
+        Args:
+            bindings: 变量名到数值的映射
+        """
+        bindings = bindings or {}
+        missing = [name for name in self.variables if name not in bindings]
+        if missing:
+            raise NameError(f"未定义的变量: {', '.join(missing)}")
+        return eval(self.code, _EVAL_GLOBALS, bindings)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(source: str) -> CompiledExpression:
+    """
+    把表达式解析为受限的语法树并编译，结果按源码缓存
+    
+    只允许数值常量、变量、四则运算、乘方、比较、条件表达式和白名单函数调用；
+    不在函数和常量表中的名称视为变量。
+    
+    Raises:
+        SyntaxError: 表达式语法错误
+        ValueError: 表达式包含不允许的语法
+    """
+    tree = ast.parse(source.strip(), mode="eval")
+    variables = set()
+    
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"不支持的语法: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool)
+                                               or not isinstance(node.value, (int, float))):
+            raise ValueError(f"不支持的常量: {node.value!r}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise ValueError(f"不支持的函数: {ast.unparse(node.func)}")
+            if node.keywords:
+                raise ValueError("函数调用不支持关键字参数")
+        if isinstance(node, ast.Name):
+            if node.id.startswith("_"):
+                raise ValueError(f"不允许的名称: {node.id}")
+            if node.id not in FUNCTIONS and node.id not in CONSTANTS:
+                variables.add(node.id)
+    
+    tree = ast.fix_missing_locations(_PowerRewriter().visit(tree))
+    code = compile(tree, "<expression>", "eval")
+    return CompiledExpression(source, code, tuple(sorted(variables)))
+
+
+# 统计：分位数和直方图基于的样本上限，数据量超过后使用水库抽样，结果为近似值
+STATS_RESERVOIR_SIZE = 100_000
+
+# 流式读取数据时每批的字节数和行数
+STATS_CHUNK_BYTES = 1024 * 1024
+STATS_CHUNK_ROWS = 64 * 1024
+
+# 直方图的最大区间数
+MAX_HISTOGRAM_BINS = 1000
+
+# 打包数组支持的数据类型（小端）及对应的 array 类型码
+DTYPES = {
+    "float64": "d", "float32": "f",
+    "int8": "b", "uint8": "B", "int16": "h", "uint16": "H",
+    "int32": "i", "uint32": "I", "int64": "q", "uint64": "Q",
+}
+
+
+class StatsAccumulator:
+    """
+    分批累积的统计量
+    
+    均值和方差按批计算后用 Chan 等人的并行公式合并（批内为 Welford 算法），
+    数据只需读取一遍；最小值、最大值精确，分位数和直方图基于水库抽样的样本。
+    安装 numpy 时批内计算向量化。
+    """
+    
+    def __init__(self, reservoir_size: int = STATS_RESERVOIR_SIZE, seed: int = 0):
+        self.count = 0
+        self.missing = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.reservoir_size = reservoir_size
+        self._sample: list = []
+        self._random = random.Random(seed)
+        self._rng = numpy.random.default_rng(seed) if numpy is not None else None
+    
+    @property
+    def exact(self) -> bool:
+        """样本是否包含全部数据（分位数和直方图是否精确）"""
+        return self.count <= self.reservoir_size
+    
+    def add(self, values: Iterable):
+        """累积一批数值，NaN 和 None 计为缺失值（numpy 把 None 转换为 NaN，纯 Python 实现与之一致）"""
+        if numpy is not None:
+            self._add_vectorized(numpy.asarray(values, dtype=numpy.float64))
+        else:
+            self._add_python(values)
+    
+    def _add_vectorized(self, values):
+        nan = numpy.isnan(values)
+        if nan.any():
+            self.missing += int(nan.sum())
+            values = values[~nan]
+        if not len(values):
+            return
+        self._sample_vectorized(values)
+        mean = float(values.mean())
+        self._merge(len(values), mean, float(numpy.square(values - mean).sum()),
+                    float(values.sum()), float(values.min()), float(values.max()))
+    
+    def _add_python(self, values: Iterable):
+        n, mean, m2, total = 0, 0.0, 0.0, 0.0
+        lo, hi = math.inf, -math.inf
+        for value in values:
+            x = math.nan if value is None else float(value)
+            if x != x:
+                self.missing += 1
+                continue
+            self._sample_one(self.count + n, x)
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+            total += x
+            lo = min(lo, x)
+            hi = max(hi, x)
+        if n:
+            self._merge(n, mean, m2, total, lo, hi)
+    
+    def _merge(self, n: int, mean: float, m2: float, total: float, lo: float, hi: float):
+        """合并一批的统计量"""
+        count = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / count
+        self.m2 += m2 + delta * delta * self.count * n / count
+        self.count = count
+        self.total += total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+    
+    def _sample_one(self, position: int, x: float):
+        """水库抽样（算法 R）：position 为该值在全部数据中的序号"""
+        if len(self._sample) < self.reservoir_size:
+            self._sample.append(x)
+            return
+        j = self._random.randrange(position + 1)
+        if j < self.reservoir_size:
+            self._sample[j] = x
+    
+    def _sample_vectorized(self, values):
+        """水库抽样的向量化版本，与逐个抽样等价（同一位置后出现的值覆盖先出现的值）"""
+        filled = len(self._sample[0]) if self._sample else 0
+        free = self.reservoir_size - filled
+        start = self.count
+        if free > 0:
+            head = values[:free]
+            self._sample = [numpy.concatenate(self._sample + [head])]
+            values = values[free:]
+            start += len(head)
+            if not len(values):
+                return
+        positions = numpy.arange(start, start + len(values), dtype=numpy.int64)
+        slots = self._rng.integers(0, positions + 1)
+        keep = slots < self.reservoir_size
+        self._sample[0][slots[keep]] = values[keep]
+    
+    def _sorted_sample(self):
+        if numpy is not None:
+            return numpy.sort(self._sample[0]) if self._sample else numpy.empty(0)
+        return sorted(self._sample)
+    
+    def summary(self, quantiles: List[float], bins: int) -> Dict[str, Any]:
+        """汇总统计结果"""
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        sample = self._sorted_sample()
+        return {
+            "count": self.count,
+            "missing": self.missing,
+            "sum": self.total,
+            "mean": self.mean,
+            "variance": variance,
+            "stddev": math.sqrt(variance),
+            "min": self.min,
+            "max": self.max,
+            "quantiles": {q: _quantile(sample, q) for q in quantiles},
+            "histogram": self._histogram(sample, bins),
+            "exact": self.exact,
+            "sample_size": len(sample),
+        }
+    
+    def _histogram(self, sample, bins: int) -> List[Tuple[float, float, int]]:
+        """以精确的最小值和最大值划分区间，按样本计数（抽样时按比例放大）"""
+        if not len(sample) or bins < 1:
+            return []
+        lo, hi = self.min, self.max
+        if lo == hi:
+            return [(lo, hi, self.count)]
+        width = (hi - lo) / bins
+        counts = [0] * bins
+        if numpy is not None:
+            index = numpy.minimum(((sample - lo) / width).astype(numpy.int64), bins - 1)
+            counts = numpy.bincount(index, minlength=bins).tolist()
+        else:
+            for x in sample:
+                counts[min(int((x - lo) / width), bins - 1)] += 1
+        scale = self.count / len(sample)
+        return [(lo + i * width, lo + (i + 1) * width, round(c * scale)) for i, c in enumerate(counts)]
+
+
+def _quantile(sorted_values, q: float) -> Optional[float]:
+    """线性插值分位数（与 numpy 默认方法一致）"""
+    n = len(sorted_values)
+    if not n:
+        return None
+    position = q * (n - 1)
+    lower = int(math.floor(position))
+    upper = min(lower + 1, n - 1)
+    fraction = position - lower
+    return float(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction)
+
+
+def _iter_packed(raw: bytes, dtype: str) -> Iterable:
+    """按批解码小端打包数组"""
+    typecode = DTYPES[dtype]
+    itemsize = array.array(typecode).itemsize
+    if len(raw) % itemsize:
+        raise ValueError(f"数据长度 {len(raw)} 不是 {dtype} 元素大小 {itemsize} 的整数倍")
+    step = STATS_CHUNK_BYTES - STATS_CHUNK_BYTES % itemsize
+    for offset in range(0, len(raw), step):
+        chunk = raw[offset:offset + step]
+        if numpy is not None:
+            yield numpy.frombuffer(chunk, dtype=numpy.dtype(dtype).newbyteorder("<"))
+        else:
+            values = array.array(typecode, chunk)
+            if sys.byteorder == "big":
+                values.byteswap()
+            yield values
+
+
+def _iter_binary_file(path: str, dtype: str) -> Iterable:
+    """按批读取二进制文件（小端打包数组）"""
+    typecode = DTYPES[dtype]
+    itemsize = array.array(typecode).itemsize
+    step = STATS_CHUNK_BYTES - STATS_CHUNK_BYTES % itemsize
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(step)
+            if not chunk:
+                break
+            if len(chunk) % itemsize:
+                raise ValueError(f"文件长度不是 {dtype} 元素大小 {itemsize} 的整数倍")
+            yield from _iter_packed(chunk, dtype)
+
+
+def _iter_csv_file(path: str, column: Any) -> Iterable[List[float]]:
+    """
+    按批读取 CSV 文件中的一列
+    
+    column 为列序号或列名（列名表示首行是表头）；首行不是数字时视为表头跳过，
+    无法解析为数字的单元格计为缺失值（NaN）。
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = None
+        index = column if isinstance(column, int) else None
+        if index is None:
+            header = next(reader, [])
+            if column not in header:
+                raise ValueError(f"CSV 中没有列 {column}")
+            index = header.index(column)
+        
+        batch: List[float] = []
+        for row_number, row in enumerate(reader):
+            try:
+                batch.append(float(row[index]))
+            except (IndexError, ValueError):
+                if row_number == 0 and header is None:
+                    continue
+                batch.append(math.nan)
+            if len(batch) >= STATS_CHUNK_ROWS:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _parse_bins(value: Any) -> int:
+    """直方图区间数：0 表示不输出直方图，超过 MAX_HISTOGRAM_BINS 时取上限"""
+    try:
+        bins = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("直方图区间数必须是整数") from None
+    if bins < 0:
+        raise ValueError("直方图区间数不能小于 0")
+    return min(bins, MAX_HISTOGRAM_BINS)
+
+
+def compute_statistics(arguments: dict) -> Dict[str, Any]:
+    """根据工具参数读取数据并计算统计量（阻塞调用，大文件应在线程中运行）"""
+    quantiles = arguments.get("quantiles") or [0.25, 0.5, 0.75]
+    if any(not isinstance(q, (int, float)) or not 0 <= q <= 1 for q in quantiles):
+        raise ValueError("分位数必须在 0 到 1 之间")
+    bins = _parse_bins(arguments.get("bins", 10))
+    dtype = arguments.get("dtype", "float64")
+    if dtype not in DTYPES:
+        raise ValueError(f"不支持的数据类型 {dtype}，可选: {', '.join(DTYPES)}")
+    
+    sources = [key for key in ("numbers", "data", "path") if arguments.get(key) is not None]
+    if len(sources) != 1:
+        raise ValueError("请提供 numbers、data、path 中的一个")
+    
+    if sources[0] == "numbers":
+        chunks = [arguments["numbers"]]
+    elif sources[0] == "data":
+        chunks = _iter_packed(base64.b64decode(arguments["data"]), dtype)
+    else:
+        path = arguments["path"]
+        file_format = arguments.get("format") or ("csv" if path.lower().endswith((".csv", ".txt")) else "binary")
+        if file_format == "csv":
+            chunks = _iter_csv_file(path, arguments.get("column", 0))
+        elif file_format == "binary":
+            chunks = _iter_binary_file(path, dtype)
+        else:
+            raise ValueError(f"不支持的文件格式 {file_format}")
+    
+    accumulator = StatsAccumulator()
+    for chunk in chunks:
+        accumulator.add(chunk)
+    return accumulator.summary([float(q) for q in quantiles], bins)
+
+
+def format_statistics(stats: Dict[str, Any]) -> str:
+    """把统计结果格式化为文本"""
+    if not stats["count"]:
+        return "错误: 没有有效的数字"
+    
+    lines = [
+        f"数量: {stats['count']}",
+        f"总和: {stats['sum']}",
+        f"平均值: {stats['mean']}",
+        f"方差: {stats['variance']}",
+        f"标准差: {stats['stddev']}",
+        f"最小值: {stats['min']}",
+        f"最大值: {stats['max']}",
+    ]
+    if stats["missing"]:
+        lines.insert(1, f"缺失值: {stats['missing']}")
+    
+    approximate = "" if stats["exact"] else f"（近似，基于 {stats['sample_size']} 个抽样值）"
+    if 0.5 in stats["quantiles"]:
+        lines.append(f"中位数: {stats['quantiles'][0.5]}{approximate}")
+    lines.append(f"分位数{approximate}: " + ", ".join(
+        f"p{q * 100:g}={value}" for q, value in stats["quantiles"].items()
+    ))
+    if stats["histogram"]:
+        lines.append(f"直方图{approximate}:")
+        lines.extend(f"  [{lo:.6g}, {hi:.6g}): {count}" for lo, hi, count in stats["histogram"])
+    
+    return "统计结果:\n" + "\n".join(lines)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check_bindings(bindings: Any) -> Dict[str, Any]:
+    """校验一组变量绑定，只接受数值"""
+    if not isinstance(bindings, dict):
+        raise ValueError("变量绑定必须是对象")
+    for name, value in bindings.items():
+        if not _is_number(value):
+            raise ValueError(f"变量 {name} 的值必须是数字")
+    return bindings
+
+
+def _build_vector_globals() -> Optional[Dict[str, Any]]:
+    """向量化求值环境：函数替换为 numpy 的逐元素版本，未安装 numpy 时返回 None"""
+    if numpy is None:
+        return None
+    
+    def log(x, base=None):
+        return numpy.log(x) if base is None else numpy.log(x) / numpy.log(base)
+    
+    def reducer(name, ufunc):
+        # 与标量的 min/max 一致：单个数值参数不可迭代，报错后整批改为逐项求值
+        def reduce_args(*args):
+            if len(args) < 2:
+                raise TypeError(f"{name} 需要至少两个参数")
+            return reduce(ufunc, args)
+        return reduce_args
+    
+    functions = {
+        "sqrt": numpy.sqrt,
+        "pow": numpy.power,
+        "sin": numpy.sin,
+        "cos": numpy.cos,
+        "tan": numpy.tan,
+        "asin": numpy.arcsin,
+        "acos": numpy.arccos,
+        "atan": numpy.arctan,
+        "atan2": numpy.arctan2,
+        "log": log,
+        "log10": numpy.log10,
+        "log2": numpy.log2,
+        "exp": numpy.exp,
+        "floor": numpy.floor,
+        "ceil": numpy.ceil,
+        "hypot": numpy.hypot,
+        "abs": numpy.abs,
+        "round": numpy.round,
+        "min": reducer("min", numpy.minimum),
+        "max": reducer("max", numpy.maximum),
+    }
+    return {"__builtins__": {}, "__pow__": numpy.power, **functions, **CONSTANTS}
+
+
+_VECTOR_GLOBALS = _build_vector_globals()
+
+
+def _evaluate_row(compiled: CompiledExpression, values: Optional[Dict[str, Any]]):
+    """对一组变量取值求值，出错时返回异常对象"""
+    try:
+        if values is None:
+            raise ValueError("变量绑定必须是对象")
+        return compiled.evaluate(_check_bindings(values))
+    except Exception as e:
+        return e
+
+
+def _float_exact(value: Any) -> bool:
+    """取值能否无损转换为 float64：浮点数，或不超过 FLOAT_EXACT_INT 的整数"""
+    return type(value) is float or (type(value) is int and -FLOAT_EXACT_INT <= value <= FLOAT_EXACT_INT)
+
+
+def _numeric_column(rows: List[Optional[Dict[str, Any]]], name: str):
+    """取出所有行中某个变量的值组成数组；任意一行缺少该变量或取值不能无损转换为 float64 时返回 None"""
+    try:
+        values = [row[name] for row in rows]
+    except (KeyError, TypeError):
+        return None
+    types = {type(value) for value in values}
+    if not types <= {int, float}:
+        return None
+    if int in types and not all(map(_float_exact, values)):
+        return None
+    return numpy.array(values, dtype=numpy.float64)
+
+
+def _evaluate_vectorized(compiled: CompiledExpression, rows: List[Optional[Dict[str, Any]]],
+                         results: List[Any]) -> List[int]:
+    """
+    用 numpy 一次计算所有有效的变量取值
+    
+    结果为 NaN 或无穷大的项（标量求值可能报错，如 sqrt(-1)）、结果超出浮点数精确整数范围的项
+    （标量求值得到精确的大整数），以及取值无效或不能无损转换为 float64 的项（如超过 2**53
+    的整数）留给逐项求值，返回这些项的序号。
+    """
+    total = len(rows)
+    valid = range(total)
+    columns = {name: _numeric_column(rows, name) for name in compiled.variables}
+    
+    if any(column is None for column in columns.values()):
+        # 存在无效的取值：只向量化有效的行
+        valid = [i for i, row in enumerate(rows)
+                 if row is not None and all(_float_exact(row.get(name)) for name in compiled.variables)]
+        if not valid:
+            return list(range(total))
+        columns = {
+            name: numpy.array([rows[i][name] for i in valid], dtype=numpy.float64)
+            for name in compiled.variables
+        }
+    
+    try:
+        with numpy.errstate(all="ignore"):
+            values = numpy.broadcast_to(eval(compiled.code, _VECTOR_GLOBALS, columns), (len(valid),))
+    except Exception:
+        # 表达式不支持向量化（如条件表达式、布尔运算），全部逐项求值
+        return list(range(total))
+    
+    magnitude = numpy.abs(values.astype(numpy.float64))
+    exact = (magnitude < FLOAT_EXACT_INT).tolist()
+    pending = set(range(total)) - set(valid)
+    for i, value, ok in zip(valid, values.tolist(), exact):
+        if ok:
+            results[i] = value
+        else:
+            pending.add(i)
+    return sorted(pending)
+
+
+def evaluate_bindings(compiled: CompiledExpression, bindings: List[Any],
+                      shared: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """
+    对多组变量取值分别求值，出错只影响该组
+    
+    Args:
+        compiled: 编译后的表达式
+        bindings: 变量取值列表
+        shared: 各组共用的变量取值
+    
+    Returns:
+        与 bindings 等长的结果列表，出错的项为异常对象
+    """
+    if shared:
+        rows = [dict(shared, **item) if isinstance(item, dict) else None for item in bindings]
+    else:
+        rows = [item if isinstance(item, dict) else None for item in bindings]
+    results: List[Any] = [None] * len(rows)
+    pending = range(len(rows))
+    if _VECTOR_GLOBALS is not None and compiled.variables and len(rows) >= VECTORIZE_MIN_ROWS:
+        pending = _evaluate_vectorized(compiled, rows, results)
+    for i in pending:
+        results[i] = _evaluate_row(compiled, rows[i])
+    return results
+
+
+def calculate_bindings(expression: str, compiled: CompiledExpression, bindings: List[Any],
+                       shared: Dict[str, Any]) -> str:
+    """calculator 的多组变量取值：每组绑定单独求值，出错只影响该组"""
+    lines = []
+    for item, result in zip(bindings, evaluate_bindings(compiled, bindings, shared)):
+        values = dict(shared, **item) if isinstance(item, dict) else shared
+        assignment = ", ".join(f"{name}={values.get(name)}" for name in compiled.variables)
+        lines.append(f"{assignment} → {format_value(result)}")
+    return f"计算结果: {expression}\n" + "\n".join(lines)
+
+
+def calculate_batch(arguments: dict) -> str:
+    """批量计算，返回紧凑的表格文本"""
+    shared = _check_bindings(arguments.get("variables") or {})
+    expressions = arguments.get("expressions")
+    
+    if expressions is not None:
+        if not isinstance(expressions, list):
+            raise ValueError("expressions 必须是数组")
+        if len(expressions) > MAX_BATCH_EXPRESSIONS:
+            raise ValueError(f"表达式超过 {MAX_BATCH_EXPRESSIONS} 个")
+        results = []
+        for expression in expressions:
+            try:
+                results.append(compile_expression(str(expression)).evaluate(shared))
+            except Exception as e:
+                results.append(e)
+        header = "序号 | 表达式 | 结果"
+        rows = [f"{i} | {expression} | {format_value(result)}"
+                for i, (expression, result) in enumerate(zip(expressions, results), 1)]
+        title = "批量计算结果"
+    else:
+        expression = arguments.get("expression")
+        bindings = arguments.get("bindings")
+        if not expression or not isinstance(bindings, list):
+            raise ValueError("请提供 expressions，或者 expression 和 bindings")
+        if len(bindings) > MAX_BINDINGS:
+            raise ValueError(f"变量绑定超过 {MAX_BINDINGS} 组")
+        compiled = compile_expression(expression)
+        results = evaluate_bindings(compiled, bindings, shared)
+        header = " | ".join(list(compiled.variables) + ["结果"])
+        rows = []
+        for item, result in zip(bindings, results):
+            values = dict(shared, **item) if isinstance(item, dict) else shared
+            rows.append(" | ".join([str(values.get(name)) for name in compiled.variables] + [format_value(result)]))
+        title = f"批量计算结果: {expression}"
+    
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    return f"{title}（{len(results)} 项，失败 {failed} 项）\n{header}\n" + "\n".join(rows)
+
+
+def format_value(value: Any) -> str:
+    """格式化批量计算的结果：整数值的浮点数显示为整数，异常显示为错误信息"""
+    if isinstance(value, Exception):
+        return f"错误: {value}"
+    if isinstance(value, float) and value.is_integer() and abs(value) < FLOAT_EXACT_INT:
+        return str(int(value))
+    return str(value)
+
 
 @app.list_tools()
 async def list_tools() -> List[Tool]:
@@ -37,15 +721,54 @@ async def list_tools() -> List[Tool]:
                 "properties": {
                     "expression": {
                         "type": "string",
-                        "description": "要计算的数学表达式，例如: '2 + 2', 'sqrt(16)', 'pow(2, 3)'"
+                        "description": "要计算的数学表达式，例如: '2 + 2', 'sqrt(16)', 'pow(2, 3)'，"
+                                       "可以包含变量，如 'x * y + 1'"
+                    },
+                    "variables": {
+                        "type": "object",
+                        "description": "变量取值（可选），如 {\"x\": 2, \"y\": 3}"
+                    },
+                    "bindings": {
+                        "type": "array",
+                        "items": {"type": "object"},
+                        "description": f"多组变量取值（可选），对每一组分别求值，最多 {MAX_BINDINGS} 组"
                     }
                 },
                 "required": ["expression"]
             }
         ),
+        Tool(
+            name="calculate_batch",
+            description="一次计算多个表达式，或对同一表达式代入多组变量取值，结果以表格返回。"
+                        "需要多次计算时优先使用本工具，而不是多次调用 calculator",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "expressions": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": f"表达式列表，最多 {MAX_BATCH_EXPRESSIONS} 个"
+                    },
+                    "expression": {
+                        "type": "string",
+                        "description": "与 bindings 一起使用的单个表达式，如 'x ** 2 + y'"
+                    },
+                    "bindings": {
+                        "type": "array",
+                        "items": {"type": "object"},
+                        "description": f"变量取值列表，如 [{{\"x\": 1, \"y\": 2}}, {{\"x\": 3, \"y\": 4}}]，最多 {MAX_BINDINGS} 组"
+                    },
+                    "variables": {
+                        "type": "object",
+                        "description": "所有表达式或各组共用的变量取值（可选）"
+                    }
+                }
+            }
+        ),
         Tool(
             name="statistics",
-            description="计算数字列表的统计信息（平均值、最大值、最小值、总和）",
+            description="计算数字的统计信息（数量、总和、平均值、方差、标准差、最小值、最大值、分位数、直方图）。"
+                        "大量数据请用 data 传打包数组或用 path 指定本地 CSV/二进制文件，不要展开成 JSON 列表",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -53,64 +776,87 @@ async def list_tools() -> List[Tool]:
                         "type": "array",
                         "items": {"type": "number"},
                         "description": "数字列表"
+                    },
+                    "data": {
+                        "type": "string",
+                        "description": "Base64 编码的小端打包数组，元素类型由 dtype 指定"
+                    },
+                    "path": {
+                        "type": "string",
+                        "description": "本地数据文件路径：.csv/.txt 按 CSV 读取，其他按 dtype 的二进制打包数组读取"
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": ["csv", "binary"],
+                        "description": "文件格式（可选），默认按扩展名判断"
+                    },
+                    "column": {
+                        "type": ["integer", "string"],
+                        "description": "CSV 的列序号（从 0 开始）或列名，默认 0",
+                        "default": 0
+                    },
+                    "dtype": {
+                        "type": "string",
+                        "enum": list(DTYPES),
+                        "description": "data 和二进制文件的元素类型，默认 float64",
+                        "default": "float64"
+                    },
+                    "quantiles": {
+                        "type": "array",
+                        "items": {"type": "number"},
+                        "description": "要计算的分位数（0 到 1），默认 [0.25, 0.5, 0.75]"
+                    },
+                    "bins": {
+                        "type": "integer",
+                        "description": f"直方图区间数，默认 10，最大 {MAX_HISTOGRAM_BINS}，0 表示不输出直方图",
+                        "default": 10
                     }
-                },
-                "required": ["numbers"]
+                }
             }
         )
     ]
 
 
 @app.call_tool()
+@spool_large_results
 async def call_tool(name: str, arguments: Any) -> List[TextContent]:
     """执行工具调用"""
     
     if name == "calculator":
         expression = arguments.get("expression", "")
         try:
-            # 安全的数学计算环境
-            import math
-            safe_dict = {
-                "sqrt": math.sqrt,
-                "pow": math.pow,
-                "sin": math.sin,
-                "cos": math.cos,
-                "tan": math.tan,
-                "log": math.log,
-                "log10": math.log10,
-                "exp": math.exp,
-                "abs": abs,
-                "round": round,
-                "pi": math.pi,
-                "e": math.e
-            }
+            compiled = compile_expression(expression)
+            bindings = arguments.get("bindings")
+            if bindings is None:
+                result = compiled.evaluate(_check_bindings(arguments.get("variables") or {}))
+                return [TextContent(type="text", text=f"计算结果: {expression} = {result}")]
             
-            result = eval(expression, {"__builtins__": {}}, safe_dict)
-            return [TextContent(type="text", text=f"计算结果: {expression} = {result}")]
+            if not isinstance(bindings, list):
+                return [TextContent(type="text", text="计算错误: bindings 必须是数组")]
+            if len(bindings) > MAX_BINDINGS:
+                return [TextContent(type="text", text=f"计算错误: 变量绑定超过 {MAX_BINDINGS} 组")]
+            
+            # 多组绑定在线程中求值：进程内运行时不阻塞 Web 服务器的事件循环
+            shared = arguments.get("variables") or {}
+            text = await asyncio.to_thread(calculate_bindings, expression, compiled, bindings, shared)
+            return [TextContent(type="text", text=text)]
+        except Exception as e:
+            return [TextContent(type="text", text=f"计算错误: {str(e)}")]
+    
+    elif name == "calculate_batch":
+        try:
+            return [TextContent(type="text", text=await asyncio.to_thread(calculate_batch, arguments))]
         except Exception as e:
             return [TextContent(type="text", text=f"计算错误: {str(e)}")]
     
     elif name == "statistics":
-        numbers = arguments.get("numbers", [])
         try:
-            if not numbers:
+            if arguments.get("numbers") == []:
                 return [TextContent(type="text", text="错误: 数字列表为空")]
             
-            total = sum(numbers)
-            avg = total / len(numbers)
-            max_val = max(numbers)
-            min_val = min(numbers)
-            
-            result = {
-                "总和": total,
-                "平均值": avg,
-                "最大值": max_val,
-                "最小值": min_val,
-                "数量": len(numbers)
-            }
-            
-            result_text = "统计结果:\n" + "\n".join([f"{k}: {v}" for k, v in result.items()])
-            return [TextContent(type="text", text=result_text)]
+            # 大文件的读取和计算在线程中进行，不阻塞 stdio 通信
+            stats = await asyncio.to_thread(compute_statistics, arguments)
+            return [TextContent(type="text", text=format_statistics(stats))]
         except Exception as e:
             return [TextContent(type="text", text=f"统计计算错误: {str(e)}")]
     
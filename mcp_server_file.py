@@ -6,24 +6,1454 @@ MCP Server - 文件工具服务器
 """
 
 import asyncio
+import base64
+import bisect
+import bz2
+import fnmatch
+import gzip
+import hashlib
+import itertools
+import json
+import lzma
+import math
+import mmap
+import multiprocessing
+import os
+import re
+import site
 import sys
 import io
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 # 设置 Windows 控制台编码
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
+try:
+    import xxhash
+except ImportError:  # 可选依赖，安装后可使用 xxh 系列摘要
+    xxhash = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，安装后可读取 .zst 文件
+    zstandard = None
+
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
+from mcp_result_spool import spool_large_results
+
 
 # 创建服务器实例
 app = Server("file-tools-server")
 
+# 单次读取返回的最大字节数（工具参数 max_bytes 不能超过该值）
+MAX_READ_BYTES = int(os.getenv("FILE_SERVER_MAX_READ_BYTES", str(256 * 1024)))
+
+# 行索引：每个数据块记录一次之前的换行数，最多缓存的文件数
+LINE_INDEX_BLOCK = 1024 * 1024
+LINE_INDEX_CACHE_SIZE = 64
+
+
+class LineIndex:
+    """
+    稀疏行索引
+    
+    记录每个固定大小数据块之前的换行数，只在需要时向后扩展；定位某一行时先二分找到数据块，
+    再在块内查找换行符，不需要逐行扫描整个文件。
+    """
+    
+    def __init__(self, signature: Tuple[int, int, int]):
+        self.signature = signature
+        # block_lines[i] 为前 i 个数据块中的换行数
+        self.block_lines = [0]
+    
+    def line_offset(self, mm, line: int) -> Optional[int]:
+        """
+        第 line 行（从 1 开始）的起始字节偏移，超出文件行数时返回 None
+        """
+        skip = line - 1
+        if skip <= 0:
+            return 0
+        
+        size = len(mm)
+        while self.block_lines[-1] < skip:
+            start = (len(self.block_lines) - 1) * LINE_INDEX_BLOCK
+            if start >= size:
+                return None
+            self.block_lines.append(self.block_lines[-1] + mm[start:start + LINE_INDEX_BLOCK].count(b"\n"))
+        
+        block = bisect.bisect_left(self.block_lines, skip) - 1
+        position = block * LINE_INDEX_BLOCK
+        for _ in range(skip - self.block_lines[block]):
+            position = mm.find(b"\n", position) + 1
+        return position if position < size else None
+
+
+# 按路径缓存的行索引，以 (inode, 大小, 修改时间) 校验
+_line_indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+
+
+def _file_signature(st: os.stat_result) -> Tuple[int, int, int]:
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _get_line_index(path: Path, st: os.stat_result) -> LineIndex:
+    key = str(path.resolve())
+    signature = _file_signature(st)
+    index = _line_indexes.get(key)
+    if index is None or index.signature != signature:
+        index = LineIndex(signature)
+        _line_indexes[key] = index
+        if len(_line_indexes) > LINE_INDEX_CACHE_SIZE:
+            _line_indexes.popitem(last=False)
+    _line_indexes.move_to_end(key)
+    return index
+
+
+# 读取缓存：总字节预算、单个文件的大小上限
+FILE_CACHE_BYTES = int(os.getenv("FILE_SERVER_CACHE_BYTES", str(64 * 1024 * 1024)))
+FILE_CACHE_MAX_ENTRY = int(os.getenv("FILE_SERVER_CACHE_MAX_ENTRY", str(1024 * 1024)))
+
+
+class CachedFile:
+    """缓存的文件内容，解码后的文本在首次整文件读取时生成"""
+    
+    __slots__ = ("signature", "data", "text", "size")
+    
+    def __init__(self, signature: Tuple[int, int, int], data: bytes):
+        self.signature = signature
+        self.data = data
+        self.text: Optional[str] = None
+        self.size = len(data)
+
+
+class ReadCache:
+    """
+    按路径缓存文件内容的 LRU 缓存，总大小不超过字节预算
+    
+    每次读取仍会 stat 文件，(inode, 大小, 修改时间) 不一致时视为未命中，
+    因此外部修改过的文件不会读到旧内容；命中时不再读取磁盘。
+    """
+    
+    def __init__(self, budget: int, max_entry: int):
+        self.budget = budget
+        self.max_entry = max_entry
+        self.entries: "OrderedDict[str, CachedFile]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, signature: Tuple[int, int, int]) -> Optional[CachedFile]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+    
+    def put(self, key: str, signature: Tuple[int, int, int], data: bytes) -> CachedFile:
+        entry = CachedFile(signature, data)
+        if entry.size > self.max_entry:
+            return entry
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.bytes += entry.size
+            self._evict()
+        return entry
+    
+    def decode(self, key: str, entry: CachedFile) -> str:
+        """整文件解码后的文本（缓存起来，计入字节预算）"""
+        if entry.text is None:
+            text = entry.data.decode("utf-8", errors="replace")
+            with self._lock:
+                if entry.text is None:
+                    entry.text = text
+                    if self.entries.get(key) is entry:
+                        added = sys.getsizeof(text)
+                        entry.size += added
+                        self.bytes += added
+                        self._evict()
+        return entry.text
+    
+    def invalidate(self, key: str):
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+                self.invalidations += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "budget_bytes": self.budget,
+                "max_entry_bytes": self.max_entry,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+    
+    def _remove(self, key: str):
+        self.bytes -= self.entries.pop(key).size
+    
+    def _evict(self):
+        while self.bytes > self.budget and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.bytes -= entry.size
+            self.evictions += 1
+
+
+read_cache = ReadCache(FILE_CACHE_BYTES, FILE_CACHE_MAX_ENTRY)
+
+
+# 搜索：工作进程数、默认结果上限、默认跳过的目录
+SEARCH_WORKERS = int(os.getenv("FILE_SERVER_SEARCH_WORKERS", str(os.cpu_count() or 2)))
+DEFAULT_SEARCH_MAX_MATCHES = 200
+DEFAULT_SEARCH_MAX_BYTES = 64 * 1024
+MAX_CONTEXT_LINES = 10
+DEFAULT_EXCLUDED_DIRS = [".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv"]
+
+# 文件数不超过该值时在线程中直接搜索，省去进程间通信
+SEARCH_INLINE_FILES = 8
+
+# 结果中单行的最大字符数
+SEARCH_MAX_LINE_CHARS = 500
+
+
+def _search_file(path: str, regex: "re.Pattern", context: int, max_matches: int) -> Optional[List[tuple]]:
+    """
+    在单个文件中搜索（内存映射），每行最多记录一次匹配
+    
+    Returns:
+        [(行号, 行内容, 前文行列表, 后文行列表)]；二进制文件或无法读取时返回 None
+    """
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(b"\0", 0, 8192) >= 0:
+                    return None
+                
+                matches = []
+                position = 0
+                line_number = 1
+                counted_to = 0
+                while len(matches) < max_matches:
+                    match = regex.search(mm, position)
+                    if match is None:
+                        break
+                    line_start = mm.rfind(b"\n", 0, match.start()) + 1
+                    line_end = mm.find(b"\n", match.start())
+                    if line_end < 0:
+                        line_end = len(mm)
+                    line_number += mm[counted_to:line_start].count(b"\n")
+                    counted_to = line_start
+                    
+                    before = []
+                    cursor = line_start
+                    for _ in range(context):
+                        if cursor == 0:
+                            break
+                        previous = mm.rfind(b"\n", 0, cursor - 1) + 1
+                        before.insert(0, mm[previous:cursor - 1])
+                        cursor = previous
+                    after = []
+                    cursor = line_end + 1
+                    for _ in range(context):
+                        if cursor >= len(mm):
+                            break
+                        following = mm.find(b"\n", cursor)
+                        following = len(mm) if following < 0 else following
+                        after.append(mm[cursor:following])
+                        cursor = following + 1
+                    
+                    matches.append((line_number, mm[line_start:line_end], before, after))
+                    position = line_end + 1
+                    if position >= len(mm):
+                        break
+                return matches
+    except (OSError, ValueError):
+        return None
+
+
+def _search_batch(paths: List[str], pattern: bytes, flags: int, context: int,
+                  max_matches: int) -> List[Tuple[str, Optional[List[tuple]]]]:
+    """在一批文件中搜索（在工作进程中调用）"""
+    regex = re.compile(pattern, flags)
+    results = []
+    remaining = max_matches
+    for path in paths:
+        matches = _search_file(path, regex, context, remaining)
+        results.append((path, matches))
+        if matches:
+            remaining -= len(matches)
+            if remaining <= 0:
+                break
+    return results
+
+
+_search_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_search_pool() -> ProcessPoolExecutor:
+    """搜索进程池（首次使用时创建，之后复用）"""
+    global _search_pool
+    if _search_pool is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        # 子进程按模块名导入本模块；按文件路径加载时（如 Web 服务器的进程内模式）
+        # 本目录不在导入路径中，由子进程自行加入
+        _search_pool = ProcessPoolExecutor(
+            max_workers=SEARCH_WORKERS,
+            mp_context=multiprocessing.get_context(method),
+            initializer=site.addsitedir,
+            initargs=(os.path.dirname(os.path.abspath(__file__)),)
+        )
+    return _search_pool
+
+
+def _collect_files(root: Path, include: List[str], exclude: List[str]) -> List[str]:
+    """遍历目录，按文件名或相对路径的 glob 过滤"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not any(fnmatch.fnmatch(d, pattern) for pattern in exclude))
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(path, root)
+            if include and not any(fnmatch.fnmatch(filename, pattern) or fnmatch.fnmatch(relative, pattern)
+                                   for pattern in include):
+                continue
+            if any(fnmatch.fnmatch(filename, pattern) or fnmatch.fnmatch(relative, pattern) for pattern in exclude):
+                continue
+            files.append(path)
+    return files
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+
+def _decode_line(data: bytes) -> str:
+    text = data.decode("utf-8", errors="replace").rstrip("\r")
+    if len(text) > SEARCH_MAX_LINE_CHARS:
+        text = text[:SEARCH_MAX_LINE_CHARS] + "…"
+    return text
+
+
+async def search_files(arguments: dict) -> str:
+    """
+    在目录树中并行搜索文件内容
+    
+    文件按批分发到进程池，每个进程用内存映射读取文件并跳过二进制文件；
+    匹配行数或输出字节数达到上限后取消尚未开始的批次。
+    """
+    root = Path(arguments.get("root") or ".")
+    pattern = arguments.get("pattern") or ""
+    if not pattern:
+        return "错误: 搜索内容不能为空"
+    if not root.is_dir():
+        return f"错误: 目录不存在: {root}"
+    
+    context = max(0, min(int(arguments.get("context_lines", 0)), MAX_CONTEXT_LINES))
+    max_matches = max(1, int(arguments.get("max_matches", DEFAULT_SEARCH_MAX_MATCHES)))
+    max_bytes = max(1, min(int(arguments.get("max_bytes", DEFAULT_SEARCH_MAX_BYTES)), MAX_READ_BYTES))
+    flags = 0 if arguments.get("case_sensitive", True) else re.IGNORECASE
+    source = pattern if arguments.get("regex") else re.escape(pattern)
+    try:
+        re.compile(source.encode("utf-8"), flags)
+    except re.error as e:
+        return f"错误: 正则表达式无效: {e}"
+    
+    include = _as_list(arguments.get("include"))
+    exclude = _as_list(arguments.get("exclude")) or DEFAULT_EXCLUDED_DIRS
+    files = await asyncio.to_thread(_collect_files, root, include, exclude)
+    
+    args = (source.encode("utf-8"), flags, context, max_matches)
+    if len(files) <= SEARCH_INLINE_FILES:
+        batches = [await asyncio.to_thread(_search_batch, files, *args)]
+    else:
+        # 批数为工作进程数的数倍，大文件不会拖住整体进度
+        batch_size = max(1, min(256, math.ceil(len(files) / (SEARCH_WORKERS * 4))))
+        loop = asyncio.get_running_loop()
+        pool = _get_search_pool()
+        futures = [
+            loop.run_in_executor(pool, _search_batch, files[i:i + batch_size], *args)
+            for i in range(0, len(files), batch_size)
+        ]
+        batches = []
+        found = 0
+        for future in asyncio.as_completed(futures):
+            batch = await future
+            batches.append(batch)
+            found += sum(len(matches) for _, matches in batch if matches)
+            if found >= max_matches:
+                break
+        for future in futures:
+            future.cancel()
+    
+    results: Dict[str, List[tuple]] = {}
+    skipped = 0
+    for batch in batches:
+        for path, matches in batch:
+            if matches is None:
+                skipped += 1
+            elif matches:
+                results[path] = matches
+    
+    lines = []
+    size = 0
+    total = 0
+    truncated = False
+    for path in sorted(results):
+        relative = os.path.relpath(path, root)
+        for line_number, line, before, after in results[path]:
+            if total >= max_matches:
+                truncated = True
+                break
+            block = [f"{relative}-{line_number - len(before) + i}-{_decode_line(text)}" for i, text in enumerate(before)]
+            block.append(f"{relative}:{line_number}:{_decode_line(line)}")
+            block.extend(f"{relative}-{line_number + 1 + i}-{_decode_line(text)}" for i, text in enumerate(after))
+            if context:
+                block.append("--")
+            block_size = sum(len(text.encode("utf-8")) + 1 for text in block)
+            if size + block_size > max_bytes:
+                truncated = True
+                break
+            lines.extend(block)
+            size += block_size
+            total += 1
+        if truncated:
+            break
+    # 搜索在匹配数达到上限时就已停止，之后可能还有未搜索到的匹配
+    if total >= max_matches:
+        truncated = True
+    
+    summary = f"扫描 {len(files)} 个文件，{len(results)} 个文件匹配，显示 {total} 处匹配"
+    if skipped:
+        summary += f"，跳过 {skipped} 个二进制或无法读取的文件"
+    if truncated:
+        summary += "，已达到结果上限"
+    if not lines:
+        return f"搜索结果: 未找到 {pattern!r}（{summary}）"
+    return f"搜索结果: {pattern!r}（{summary}）:\n" + "\n".join(lines)
+
+
+# 文件索引：持久化目录、两次增量刷新的最小间隔（秒）、单个索引的最大文件数
+FILE_INDEX_DIR = Path(os.getenv("FILE_SERVER_CACHE_DIR", str(Path.home() / ".cache" / "mcp-file-server")))
+FILE_INDEX_TTL = float(os.getenv("FILE_SERVER_INDEX_TTL", "2"))
+FILE_INDEX_MAX_FILES = int(os.getenv("FILE_SERVER_INDEX_MAX_FILES", "1000000"))
+FILE_INDEX_VERSION = 1
+
+DEFAULT_LIST_LIMIT = 500
+MAX_LIST_LIMIT = 10000
+
+
+# 进程的 umask（导入时读取一次），新文件按普通创建文件的权限设置
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write(path: Path, data: Union[bytes, Iterable[bytes]]) -> int:
+    """
+    先写同目录下的临时文件再重命名，读者不会看到写了一半的文件
+    
+    Args:
+        path: 目标文件路径
+        data: 文件内容，或依次写入的数据块
+    
+    Returns:
+        写入的字节数
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        written = 0
+        with os.fdopen(fd, "wb") as f:
+            for chunk in ([data] if isinstance(data, (bytes, bytearray)) else data):
+                f.write(chunk)
+                written += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        # 关闭后按路径设置权限（Windows 上 Python 3.13 之前没有 os.fchmod）
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+        return written
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class FileIndex:
+    """
+    目录树的文件元数据索引（路径、大小、修改时间）
+    
+    每个目录记录自身的 mtime：只有新增、删除或重命名过条目的目录才会重新 scandir，
+    mtime 未变的目录复用上次的文件列表。目录 mtime 不反映文件内容的修改，
+    因此未变目录中的已知文件仍会逐个 stat，更新大小和修改时间。
+    """
+    
+    def __init__(self, root: Path):
+        self.root = root
+        # 相对目录 -> [目录 mtime_ns, 子目录名列表, {文件名: [大小, mtime_ns]}]
+        self.dirs: Dict[str, list] = {}
+        self.refreshed_at = 0.0
+        self.truncated = False
+        self.lock = threading.Lock()
+        self.path = FILE_INDEX_DIR / f"index-{hashlib.sha1(str(root).encode('utf-8')).hexdigest()[:16]}.json"
+        self._load()
+    
+    @property
+    def file_count(self) -> int:
+        return sum(len(entry[2]) for entry in self.dirs.values())
+    
+    def _load(self):
+        """加载持久化的索引，加载后仍会按目录 mtime 校验"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == FILE_INDEX_VERSION and data.get("root") == str(self.root):
+            self.dirs = data.get("dirs", {})
+    
+    def _save(self):
+        data = {"version": FILE_INDEX_VERSION, "root": str(self.root), "dirs": self.dirs}
+        try:
+            atomic_write(self.path, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        except OSError:
+            pass
+    
+    def _scan(self, directory: str, mtime: int) -> list:
+        subdirs = []
+        files = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not any(fnmatch.fnmatch(entry.name, pattern) for pattern in DEFAULT_EXCLUDED_DIRS):
+                                subdirs.append(entry.name)
+                        elif entry.is_file():
+                            st = entry.stat()
+                            files[entry.name] = [st.st_size, st.st_mtime_ns]
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return [mtime, sorted(subdirs), files]
+    
+    def _restat(self, directory: str, files: dict) -> bool:
+        """重新 stat 目录中已知的文件，更新大小和修改时间，返回是否有变化"""
+        changed = False
+        for name, meta in files.items():
+            try:
+                st = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            if meta[0] != st.st_size or meta[1] != st.st_mtime_ns:
+                files[name] = [st.st_size, st.st_mtime_ns]
+                changed = True
+        return changed
+    
+    def refresh(self, force: bool = False) -> Tuple[int, int]:
+        """
+        增量刷新索引
+        
+        Args:
+            force: 忽略目录 mtime，重新扫描所有目录
+        
+        Returns:
+            (重新扫描的目录数, 目录总数)
+        """
+        with self.lock:
+            dirs = {}
+            scanned = 0
+            updated = False
+            files = 0
+            truncated = False
+            stack = [""]
+            while stack:
+                relative = stack.pop()
+                directory = os.path.join(self.root, relative) if relative else str(self.root)
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue
+                entry = self.dirs.get(relative)
+                if force or entry is None or entry[0] != mtime:
+                    entry = self._scan(directory, mtime)
+                    scanned += 1
+                elif self._restat(directory, entry[2]):
+                    updated = True
+                dirs[relative] = entry
+                files += len(entry[2])
+                if files >= FILE_INDEX_MAX_FILES:
+                    truncated = True
+                    break
+                stack.extend(reversed([os.path.join(relative, name) for name in entry[1]]))
+            
+            changed = scanned > 0 or updated or dirs.keys() != self.dirs.keys()
+            self.dirs = dirs
+            self.truncated = truncated
+            self.refreshed_at = time.monotonic()
+            if changed:
+                self._save()
+            return scanned, len(dirs)
+    
+    def query(self, pattern: Optional[str] = None, min_size: Optional[int] = None,
+              max_size: Optional[int] = None, min_age: Optional[float] = None,
+              max_age: Optional[float] = None) -> List[Tuple[str, int, int]]:
+        """按 glob、大小和修改时间（距今秒数）筛选，返回 [(相对路径, 大小, mtime_ns)]"""
+        now_ns = time.time_ns()
+        newest = now_ns - int(min_age * 1e9) if min_age is not None else None
+        oldest = now_ns - int(max_age * 1e9) if max_age is not None else None
+        results = []
+        for relative, (_, _, files) in self.dirs.items():
+            for name, (size, mtime) in files.items():
+                if min_size is not None and size < min_size:
+                    continue
+                if max_size is not None and size > max_size:
+                    continue
+                if newest is not None and mtime > newest:
+                    continue
+                if oldest is not None and mtime < oldest:
+                    continue
+                path = os.path.join(relative, name) if relative else name
+                if pattern and not (fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern)):
+                    continue
+                results.append((path, size, mtime))
+        return results
+
+
+_file_indexes: Dict[str, FileIndex] = {}
+_file_indexes_lock = threading.Lock()
+
+
+def get_file_index(root: Path) -> FileIndex:
+    """获取目录的索引（进程内复用，首次使用时从磁盘加载）"""
+    key = str(root.resolve())
+    with _file_indexes_lock:
+        index = _file_indexes.get(key)
+        if index is None:
+            index = _file_indexes[key] = FileIndex(Path(key))
+        return index
+
+
+def _format_mtime(mtime_ns: int) -> str:
+    return datetime.fromtimestamp(mtime_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def list_files(arguments: dict) -> str:
+    """从文件索引中列出文件（索引超过 FILE_INDEX_TTL 秒未刷新时先增量刷新）"""
+    root = Path(arguments.get("root") or ".")
+    if not root.is_dir():
+        return f"错误: 目录不存在: {root}"
+    
+    start = time.perf_counter()
+    index = get_file_index(root)
+    force = bool(arguments.get("refresh"))
+    scanned = None
+    if force or time.monotonic() - index.refreshed_at > FILE_INDEX_TTL:
+        scanned, _ = index.refresh(force=force)
+    
+    results = index.query(
+        pattern=arguments.get("pattern"),
+        min_size=_int_arg(arguments, "min_size"),
+        max_size=_int_arg(arguments, "max_size"),
+        min_age=arguments.get("min_age_seconds"),
+        max_age=arguments.get("max_age_seconds")
+    )
+    sort_by = arguments.get("sort_by", "path")
+    if sort_by == "size":
+        results.sort(key=lambda item: (-item[1], item[0]))
+    elif sort_by == "mtime":
+        results.sort(key=lambda item: (-item[2], item[0]))
+    else:
+        results.sort()
+    
+    limit = max(1, min(int(arguments.get("limit", DEFAULT_LIST_LIMIT)), MAX_LIST_LIMIT))
+    elapsed = (time.perf_counter() - start) * 1000
+    
+    summary = f"匹配 {len(results)} 个文件"
+    if len(results) > limit:
+        summary += f"，显示前 {limit} 个"
+    summary += f"；索引共 {index.file_count} 个文件"
+    if scanned is not None:
+        summary += f"，本次重新扫描 {scanned}/{len(index.dirs)} 个目录"
+    if index.truncated:
+        summary += f"，已达到索引上限 {FILE_INDEX_MAX_FILES}"
+    summary += f"，耗时 {elapsed:.1f}ms"
+    
+    if not results:
+        return f"文件列表: {root}（{summary}）"
+    lines = [f"{size:>12}  {_format_mtime(mtime)}  {path}" for path, size, mtime in results[:limit]]
+    return f"文件列表: {root}（{summary}）:\n" + "\n".join(lines)
+
+
+def stat_files(arguments: dict) -> str:
+    """直接 stat 指定路径，返回准确的类型、大小和修改时间"""
+    paths = _as_list(arguments.get("paths"))
+    if not paths:
+        return "错误: 路径不能为空"
+    
+    lines = []
+    for file_path in paths:
+        try:
+            st = os.stat(file_path)
+        except OSError as e:
+            lines.append(f"{file_path}: 错误: {e.strerror or e}")
+            continue
+        if os.path.isdir(file_path):
+            kind = "目录"
+        elif os.path.isfile(file_path):
+            kind = "文件"
+        else:
+            kind = "其他"
+        lines.append(f"{file_path}: {kind}, {st.st_size} 字节, 修改于 {_format_mtime(st.st_mtime_ns)}")
+    return "文件信息:\n" + "\n".join(lines)
+
+
+def _char_boundary(mm, position: int) -> int:
+    """把字节位置向前调整到 UTF-8 字符边界（最多回退 3 字节），避免截断多字节字符"""
+    for candidate in range(position, max(position - 4, 0), -1):
+        if candidate >= len(mm) or (mm[candidate] & 0xC0) != 0x80:
+            return candidate
+    return position
+
+
+def _int_arg(arguments: dict, name: str) -> Optional[int]:
+    value = arguments.get(name)
+    if value is None:
+        return None
+    value = int(value)
+    if value < 0:
+        raise ValueError(f"{name} 不能为负数")
+    return value
+
+
+# 压缩格式的魔数（按文件内容识别，不依赖扩展名）
+COMPRESSION_MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+
+# 解压时每次读取的字节数
+DECOMPRESS_CHUNK = 256 * 1024
+
+# 检查前多少字节中是否有 NUL 来判断二进制内容
+BINARY_SNIFF_BYTES = 8192
+
+
+def _is_binary(data, arguments: dict) -> bool:
+    encoding = arguments.get("encoding", "auto")
+    if encoding == "base64":
+        return True
+    if encoding == "utf-8":
+        return False
+    return data.find(b"\0", 0, BINARY_SNIFF_BYTES) >= 0
+
+
+def _base64_budget(max_bytes: int) -> int:
+    """base64 结果不超过 max_bytes 时可读取的原始字节数（3 的倍数，分段结果可直接拼接）"""
+    return max(3, max_bytes * 3 // 4 // 3 * 3)
+
+
+def _compression_format(path: Path) -> Optional[str]:
+    with open(path, "rb") as f:
+        head = f.read(6)
+    for magic, name in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def _open_decompressed(path: Path, compression: str):
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "xz":
+        return lzma.open(path, "rb")
+    if zstandard is None:
+        raise ValueError("读取 zstd 压缩文件需要安装 zstandard")
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+
+
+def _read_compressed(path: Path, compression: str, arguments: dict) -> str:
+    """
+    边解压边读取压缩文件，范围和行数限制作用于解压后的内容
+    
+    解压数据按块处理，内存占用只与返回的内容大小有关；
+    压缩流不能随机访问，每次读取都从头解压到所需位置。
+    """
+    max_bytes = min(_int_arg(arguments, "max_bytes") or MAX_READ_BYTES, MAX_READ_BYTES)
+    offset = _int_arg(arguments, "offset")
+    length = _int_arg(arguments, "length")
+    start_line = _int_arg(arguments, "start_line")
+    max_lines = _int_arg(arguments, "max_lines")
+    tail_lines = _int_arg(arguments, "tail_lines")
+    
+    with _open_decompressed(path, compression) as stream:
+        first = stream.read(DECOMPRESS_CHUNK)
+        binary = _is_binary(first, arguments)
+        if binary and (start_line is not None or tail_lines is not None):
+            return "错误: 二进制内容不支持按行读取，请使用 offset/length"
+        chunks = itertools.chain([first], iter(lambda: stream.read(DECOMPRESS_CHUNK), b""))
+        
+        total = None
+        next_line = None
+        if tail_lines is not None:
+            data, total = _tail_stream(chunks, tail_lines, max_bytes)
+            start, end = total - len(data), total
+            next_offset = None
+        elif start_line is not None:
+            found = _lines_stream(chunks, start_line, max_lines, max_bytes)
+            if found is None:
+                return f"错误: 起始行 {start_line} 超出文件行数"
+            data, start, lines_read, more = found
+            end = start + len(data)
+            next_offset = end if more else None
+            if more and data.endswith(b"\n"):
+                next_line = start_line + lines_read
+            if not more:
+                total = end
+        else:
+            start = offset or 0
+            limit = _base64_budget(max_bytes) if binary else max_bytes
+            want = limit if length is None else min(length, limit)
+            data, more = _range_stream(chunks, start, want)
+            cut = want
+            if more and not binary and 0 < _char_boundary(data, want):
+                cut = _char_boundary(data, want)
+            data = data[:cut]
+            end = start + len(data)
+            requested_more = more and (length is None or end < start + length)
+            next_offset = end if requested_more else None
+            if not more:
+                total = end
+    
+    label = f"{compression} 解压"
+    if binary:
+        content = base64.b64encode(data).decode("ascii")
+        label += "，base64"
+    else:
+        content = data.decode("utf-8", errors="replace")
+    
+    if start == 0 and total is not None and end == total:
+        return f"文件内容（{label}）:\n{content}"
+    
+    cursor = f"start_line={next_line}" if next_line is not None else f"offset={next_offset}"
+    footer = f"\n\n[已读取解压后字节 {start}-{end}"
+    if total is not None:
+        footer += f"，解压后共 {total} 字节"
+    footer += f"；继续读取请使用 {cursor}]" if next_offset is not None else "]"
+    return f"文件内容（{label}，字节 {start}-{end}）:\n{content}{footer}"
+
+
+def _range_stream(chunks, start: int, want: int) -> Tuple[bytes, bool]:
+    """
+    从解压流中取 [start, start + want) 的字节
+    
+    Returns:
+        (数据, 之后是否还有数据)；还有数据时多返回 1 个字节，用于对齐字符边界
+    """
+    out = bytearray()
+    position = 0
+    for chunk in chunks:
+        chunk_end = position + len(chunk)
+        if chunk_end > start:
+            low = max(start - position, 0)
+            out += chunk[low:low + want + 1 - len(out)]
+            if len(out) > want:
+                return bytes(out), True
+        position = chunk_end
+    return bytes(out), False
+
+
+def _lines_stream(chunks, start_line: int, max_lines: Optional[int],
+                  max_bytes: int) -> Optional[Tuple[bytes, int, int, bool]]:
+    """
+    从解压流中按行读取
+    
+    Returns:
+        (数据, 起始字节偏移, 读取的完整行数, 之后是否还有数据)；起始行超出行数时返回 None
+    """
+    line = 1
+    position = 0
+    start = 0 if start_line <= 1 else None
+    out = bytearray()
+    lines_read = 0
+    line_begin = 0
+    for chunk in chunks:
+        index = 0
+        if start is None:
+            while line < start_line:
+                newline = chunk.find(b"\n", index)
+                if newline < 0:
+                    break
+                line += 1
+                index = newline + 1
+            if line < start_line:
+                position += len(chunk)
+                continue
+            start = position + index
+        
+        while index < len(chunk):
+            if max_lines is not None and lines_read >= max_lines:
+                return bytes(out), start, lines_read, True
+            newline = chunk.find(b"\n", index)
+            segment_end = len(chunk) if newline < 0 else newline + 1
+            room = max_bytes - len(out)
+            if segment_end - index > room:
+                if lines_read == 0:
+                    # 单行超过上限：截到字符边界
+                    out += chunk[index:max(index, _char_boundary(chunk, index + room))]
+                else:
+                    # 只返回完整的行
+                    del out[line_begin:]
+                return bytes(out), start, lines_read, True
+            out += chunk[index:segment_end]
+            index = segment_end
+            if newline >= 0:
+                lines_read += 1
+                line_begin = len(out)
+        position += len(chunk)
+    
+    if start is None or (start == position and start > 0):
+        return None
+    return bytes(out), start, lines_read + (1 if out and not out.endswith(b"\n") else 0), False
+
+
+def _tail_stream(chunks, tail_lines: int, max_bytes: int) -> Tuple[bytes, int]:
+    """从解压流中取最后若干行（总大小不超过 max_bytes），返回 (数据, 解压后总字节数)"""
+    lines: deque = deque()
+    size = 0
+    total = 0
+    pending = b""
+    for chunk in chunks:
+        total += len(chunk)
+        parts = (pending + chunk).split(b"\n")
+        pending = parts.pop()
+        # 超长的行只需要保留末尾部分
+        if len(pending) > max_bytes:
+            pending = pending[-max_bytes:]
+        for part in parts[-tail_lines:]:
+            lines.append(part + b"\n")
+            size += len(part) + 1
+            while len(lines) > tail_lines or (size > max_bytes and len(lines) > 1):
+                size -= len(lines.popleft())
+    if pending:
+        lines.append(pending)
+        size += len(pending)
+        while len(lines) > tail_lines or (size > max_bytes and len(lines) > 1):
+            size -= len(lines.popleft())
+    
+    data = b"".join(lines)
+    if len(data) > max_bytes:
+        data = data[-max_bytes:]
+        skip = 0
+        while skip < len(data) and (data[skip] & 0xC0) == 0x80:
+            skip += 1
+        data = data[skip:]
+    return data, total
+
+
+def read_range(path: Path, arguments: dict) -> str:
+    """
+    按字节范围、行范围或末尾若干行读取文件
+    
+    不超过 FILE_CACHE_MAX_ENTRY 的文件整体读入读取缓存，命中时不访问磁盘；
+    更大的文件使用内存映射，只读取返回的部分。压缩文件边解压边读取，
+    二进制内容以 base64 返回。
+    
+    Args:
+        path: 文件路径
+        arguments: 工具参数（offset/length、start_line/max_lines、tail_lines、max_bytes、encoding、decompress）
+    
+    Returns:
+        文件内容文本；未读完时末尾附带继续读取的参数
+    """
+    for name in ("tail_lines", "max_lines"):
+        if _int_arg(arguments, name) == 0:
+            return f"错误: {name} 必须大于 0"
+    
+    if arguments.get("max_lines") is not None and arguments.get("start_line") is None \
+            and arguments.get("tail_lines") is None:
+        if arguments.get("offset") is not None or arguments.get("length") is not None:
+            return "错误: max_lines 用于按行读取，不能与 offset/length 一起使用"
+        # 只指定 max_lines 时从第 1 行开始读取
+        arguments = dict(arguments, start_line=1)
+    
+    st = os.stat(path)
+    if st.st_size == 0:
+        return "文件内容:\n"
+    
+    if arguments.get("decompress", True):
+        compression = _compression_format(path)
+        if compression is not None:
+            return _read_compressed(path, compression, arguments)
+    
+    key = os.path.abspath(path)
+    entry = None
+    if st.st_size <= read_cache.max_entry:
+        entry = read_cache.get(key, _file_signature(st))
+    if entry is None and st.st_size <= read_cache.max_entry:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+        if len(data) == st.st_size:
+            entry = read_cache.put(key, _file_signature(st), data)
+        else:
+            # 读取期间文件被修改，本次直接使用读到的内容，不放入缓存
+            entry = CachedFile(_file_signature(st), data)
+    
+    if entry is not None:
+        max_bytes = min(_int_arg(arguments, "max_bytes") or MAX_READ_BYTES, MAX_READ_BYTES)
+        ranged = any(arguments.get(name) is not None for name in ("offset", "length", "start_line", "tail_lines"))
+        if not ranged and len(entry.data) <= max_bytes and not _is_binary(entry.data, arguments):
+            return f"文件内容:\n{read_cache.decode(key, entry)}"
+        return _read_buffer(path, st, entry.data, arguments)
+    
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            return "文件内容:\n"
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _read_buffer(path, st, mm, arguments)
+
+
+def _read_buffer(path: Path, st: os.stat_result, mm, arguments: dict) -> str:
+    """在内存映射或缓存的文件内容上按参数截取范围"""
+    max_bytes = min(_int_arg(arguments, "max_bytes") or MAX_READ_BYTES, MAX_READ_BYTES)
+    offset = _int_arg(arguments, "offset")
+    length = _int_arg(arguments, "length")
+    start_line = _int_arg(arguments, "start_line")
+    max_lines = _int_arg(arguments, "max_lines")
+    tail_lines = _int_arg(arguments, "tail_lines")
+    size = len(mm)
+    binary = _is_binary(mm, arguments)
+    if binary and (start_line is not None or tail_lines is not None):
+        return "错误: 二进制文件不支持按行读取，请使用 offset/length"
+    
+    next_line = None
+    if binary:
+        start = min(offset or 0, size)
+        requested_end = size if length is None else min(size, start + length)
+        end = min(requested_end, start + _base64_budget(max_bytes))
+        next_offset = end if end < requested_end else None
+        # 直接对内存映射的切片视图编码，不复制原始数据
+        with memoryview(mm) as view:
+            content = base64.b64encode(view[start:end]).decode("ascii")
+        footer = f"\n\n[已读取字节 {start}-{end}，文件共 {size} 字节"
+        footer += f"；继续读取请使用 offset={next_offset}]" if next_offset is not None else "]"
+        return f"文件内容（base64，字节 {start}-{end}）:\n{content}{footer}"
+    elif tail_lines is not None:
+        # 从末尾向前查找换行符，只访问返回的部分
+        end = size
+        start = size
+        search_end = size - 1 if mm[size - 1] == ord("\n") else size
+        for _ in range(tail_lines):
+            newline = mm.rfind(b"\n", 0, search_end)
+            start = newline + 1
+            if newline < 0 or end - start > max_bytes:
+                break
+            search_end = newline
+        if end - start > max_bytes:
+            # 超出上限时保留最后的完整行
+            cut = mm.find(b"\n", end - max_bytes, end)
+            start = cut + 1 if 0 <= cut < end - 1 else _char_boundary(mm, end - max_bytes)
+        next_offset = None
+    elif start_line is not None:
+        start = _get_line_index(path, st).line_offset(mm, start_line)
+        if start is None:
+            return f"错误: 起始行 {start_line} 超出文件行数"
+        limit = min(size, start + max_bytes)
+        end = start
+        lines_read = 0
+        while end < limit and (max_lines is None or lines_read < max_lines):
+            newline = mm.find(b"\n", end, limit)
+            if newline < 0:
+                # 最后一行没有换行符，或单行超过上限
+                if limit == size or lines_read == 0:
+                    end = limit if limit == size else _char_boundary(mm, limit)
+                    lines_read += limit == size
+                break
+            end = newline + 1
+            lines_read += 1
+        next_offset = end if end < size else None
+        if next_offset is not None and end > start and mm[end - 1] == ord("\n"):
+            next_line = start_line + lines_read
+    else:
+        start = min(offset or 0, size)
+        requested_end = size if length is None else min(size, start + length)
+        end = min(requested_end, start + max_bytes)
+        if end < size and _char_boundary(mm, end) > start:
+            end = _char_boundary(mm, end)
+        next_offset = end if end < requested_end else None
+    
+    content = mm[start:end].decode("utf-8", errors="replace")
+    
+    if start == 0 and end == size:
+        return f"文件内容:\n{content}"
+    
+    cursor = f"start_line={next_line}" if next_line is not None else f"offset={next_offset}"
+    footer = f"\n\n[已读取字节 {start}-{end}，文件共 {size} 字节"
+    footer += f"；继续读取请使用 {cursor}]" if next_offset is not None else "]"
+    return f"文件内容（字节 {start}-{end}）:\n{content}{footer}"
+
+
+# 批量读写：单次调用的最大文件数、读取结果总字节数、写入内容总字节数、并发数
+MAX_BATCH_FILES = 100
+MAX_BATCH_READ_BYTES = int(os.getenv("FILE_SERVER_MAX_BATCH_READ_BYTES", str(1024 * 1024)))
+MAX_BATCH_WRITE_BYTES = int(os.getenv("FILE_SERVER_MAX_BATCH_WRITE_BYTES", str(16 * 1024 * 1024)))
+BATCH_CONCURRENCY = 8
+
+
+def _content_chunks(content: Union[str, List[str], None]) -> List[str]:
+    """写入内容：字符串或按顺序写入的字符串块列表"""
+    if content is None:
+        return []
+    if isinstance(content, str):
+        return [content]
+    return [str(chunk) for chunk in content]
+
+
+def write_content(file_path: str, content: Union[str, List[str], None], mode: str = "overwrite") -> int:
+    """
+    写入文件并使读取缓存失效
+    
+    Args:
+        file_path: 文件路径
+        content: 字符串，或分块的字符串列表（逐块编码写入，不拼接成一个大字符串）
+        mode: overwrite 为原子替换（临时文件 + 重命名）；append 为追加到文件末尾
+    
+    Returns:
+        写入的字节数
+    """
+    path = Path(file_path)
+    chunks = _content_chunks(content)
+    try:
+        if mode == "append":
+            path.parent.mkdir(parents=True, exist_ok=True)
+            written = 0
+            with open(path, "ab") as f:
+                for chunk in chunks:
+                    data = chunk.encode("utf-8")
+                    f.write(data)
+                    written += len(data)
+            return written
+        if mode != "overwrite":
+            raise ValueError(f"不支持的写入模式: {mode}")
+        return atomic_write(path, (chunk.encode("utf-8") for chunk in chunks))
+    finally:
+        read_cache.invalidate(os.path.abspath(path))
+
+
+def _batch_items(arguments: dict) -> List[dict]:
+    items = arguments.get("files") or []
+    items = [{"file_path": item} if isinstance(item, str) else dict(item) for item in items]
+    if not items:
+        raise ValueError("文件列表不能为空")
+    if len(items) > MAX_BATCH_FILES:
+        raise ValueError(f"单次最多处理 {MAX_BATCH_FILES} 个文件，收到 {len(items)} 个")
+    return items
+
+
+async def read_many(arguments: dict) -> List[str]:
+    """
+    并发读取多个文件，每个文件一段结果
+    
+    每个文件可以单独指定 read_file 的范围参数；结果按请求顺序拼接，
+    累计超过 max_total_bytes 后的文件不再返回内容。
+    """
+    items = _batch_items(arguments)
+    total_cap = min(int(arguments.get("max_total_bytes", MAX_BATCH_READ_BYTES)), MAX_BATCH_READ_BYTES)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def read_one(item: dict) -> str:
+        file_path = item.get("file_path")
+        async with semaphore:
+            try:
+                path = Path(file_path)
+                if not path.is_file():
+                    return f"错误: 文件不存在: {file_path}"
+                return await asyncio.to_thread(read_range, path, item)
+            except Exception as e:
+                return f"读取文件时出错: {str(e)}"
+    
+    contents = await asyncio.gather(*[read_one(item) for item in items])
+    
+    results = []
+    used = 0
+    for item, content in zip(items, contents):
+        size = len(content.encode("utf-8"))
+        if used + size > total_cap:
+            content = f"[未返回：累计结果超过 {total_cap} 字节上限，请单独读取或指定范围]"
+        else:
+            used += size
+        results.append(f"=== {item.get('file_path')} ===\n{content}")
+    return results
+
+
+async def write_many(arguments: dict) -> List[str]:
+    """
+    并发写入多个文件，每个文件一行结果
+    
+    同一路径的多个条目按顺序依次写入（可用 append 模式分块写入大文件），
+    不同路径之间并发；写入前检查内容总大小。
+    """
+    items = _batch_items(arguments)
+    sizes = [sum(len(chunk.encode("utf-8")) for chunk in _content_chunks(item.get("content"))) for item in items]
+    if sum(sizes) > MAX_BATCH_WRITE_BYTES:
+        raise ValueError(f"写入内容共 {sum(sizes)} 字节，超过 {MAX_BATCH_WRITE_BYTES} 字节上限")
+    
+    groups: Dict[str, List[int]] = {}
+    for position, item in enumerate(items):
+        groups.setdefault(os.path.abspath(item.get("file_path") or ""), []).append(position)
+    
+    results: List[Optional[str]] = [None] * len(items)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def write_group(positions: List[int]):
+        async with semaphore:
+            for position in positions:
+                item = items[position]
+                file_path = item.get("file_path")
+                mode = item.get("mode", "overwrite")
+                try:
+                    if not file_path:
+                        raise ValueError("文件路径不能为空")
+                    written = await asyncio.to_thread(write_content, file_path, item.get("content"), mode)
+                    action = "追加" if mode == "append" else "写入"
+                    results[position] = f"成功{action} {written} 字节: {file_path}"
+                except Exception as e:
+                    results[position] = f"写入文件时出错: {file_path}: {str(e)}"
+    
+    await asyncio.gather(*[write_group(positions) for positions in groups.values()])
+    return results
+
+
+# 摘要：读取缓冲区大小、线程数、缓存条目数
+HASH_BUFFER_SIZE = 1024 * 1024
+HASH_WORKERS = int(os.getenv("FILE_SERVER_HASH_WORKERS", str(min(8, (os.cpu_count() or 2) * 2))))
+HASH_CACHE_SIZE = 100000
+MAX_HASH_FILES = 10000
+HASH_ALGORITHMS = ["sha256", "sha1", "md5", "blake2b"] + (["xxh64", "xxh3_64", "xxh3_128"] if xxhash else [])
+
+_hash_buffers = threading.local()
+_hash_cache: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int, int], str]]" = OrderedDict()
+_hash_cache_lock = threading.Lock()
+_hash_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _new_hasher(algorithm: str):
+    if algorithm.startswith("xxh"):
+        if xxhash is None:
+            raise ValueError(f"{algorithm} 需要安装 xxhash")
+        return getattr(xxhash, algorithm)()
+    return hashlib.new(algorithm)
+
+
+def hash_file(file_path: str, algorithm: str) -> Tuple[str, int, bool]:
+    """
+    流式计算文件摘要（每个线程复用一个固定大小的缓冲区，内存占用与文件大小无关）
+    
+    结果按 (inode, 大小, 修改时间) 缓存，文件未变时不再读取。
+    
+    Returns:
+        (十六进制摘要, 文件大小, 是否命中缓存)
+    """
+    key = (os.path.abspath(file_path), algorithm)
+    with open(file_path, "rb") as f:
+        signature = _file_signature(os.fstat(f.fileno()))
+        with _hash_cache_lock:
+            cached = _hash_cache.get(key)
+            if cached is not None and cached[0] == signature:
+                _hash_cache.move_to_end(key)
+                return cached[1], signature[1], True
+        
+        buffer = getattr(_hash_buffers, "buffer", None)
+        if buffer is None:
+            buffer = _hash_buffers.buffer = bytearray(HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        hasher = _new_hasher(algorithm)
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+        digest = hasher.hexdigest()
+    
+    with _hash_cache_lock:
+        _hash_cache[key] = (signature, digest)
+        _hash_cache.move_to_end(key)
+        while len(_hash_cache) > HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+    return digest, signature[1], False
+
+
+def _get_hash_pool() -> ThreadPoolExecutor:
+    """摘要线程池（hashlib 在计算大块数据时释放 GIL，线程即可并行）"""
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash")
+    return _hash_pool
+
+
+async def _hash_all(paths: List[str], algorithm: str) -> Dict[str, Union[Tuple[str, int, bool], Exception]]:
+    loop = asyncio.get_running_loop()
+    pool = _get_hash_pool()
+    results = await asyncio.gather(
+        *[loop.run_in_executor(pool, hash_file, path, algorithm) for path in paths],
+        return_exceptions=True
+    )
+    return dict(zip(paths, results))
+
+
+async def hash_files(arguments: dict) -> str:
+    """
+    计算文件摘要，或在目录中查找重复文件
+    
+    查找重复文件时先用文件索引按大小分组，只对大小相同的文件计算摘要
+    （刷新索引时会重新 stat 文件，大小是当前值）。
+    """
+    algorithm = arguments.get("algorithm", "sha256")
+    if algorithm not in HASH_ALGORITHMS:
+        return f"错误: 不支持的摘要算法: {algorithm}，可用: {', '.join(HASH_ALGORITHMS)}"
+    
+    start = time.perf_counter()
+    if arguments.get("find_duplicates"):
+        return await _find_duplicates(arguments, algorithm, start)
+    
+    paths = _as_list(arguments.get("paths"))
+    if not paths:
+        return "错误: 路径不能为空"
+    if len(paths) > MAX_HASH_FILES:
+        return f"错误: 单次最多计算 {MAX_HASH_FILES} 个文件的摘要"
+    expected = arguments.get("expected") or {}
+    if not isinstance(expected, dict):
+        return "错误: expected 必须是 {路径: 摘要} 对象"
+    
+    results = await _hash_all(paths, algorithm)
+    lines = []
+    total = 0
+    hits = 0
+    mismatches = 0
+    invalid = 0
+    for path in paths:
+        result = results[path]
+        if isinstance(result, Exception):
+            lines.append(f"错误  {path}: {getattr(result, 'strerror', None) or result}")
+            continue
+        digest, size, hit = result
+        total += size
+        hits += hit
+        line = f"{digest}  {path}"
+        if path in expected and not isinstance(expected[path], str):
+            # 期望值类型错误只影响这一项
+            invalid += 1
+            line += f"  [错误: 期望值必须是字符串，收到 {type(expected[path]).__name__}]"
+        elif path in expected:
+            matched = expected[path].lower() == digest
+            mismatches += not matched
+            line += "  [一致]" if matched else f"  [不一致，期望 {expected[path]}]"
+        lines.append(line)
+    
+    elapsed = (time.perf_counter() - start) * 1000
+    summary = f"{algorithm}，{len(paths)} 个文件，{total} 字节，缓存命中 {hits} 个，耗时 {elapsed:.1f}ms"
+    if expected:
+        summary += f"，{mismatches} 个与期望值不一致"
+    if invalid:
+        summary += f"，{invalid} 个期望值无效"
+    return f"文件摘要（{summary}）:\n" + "\n".join(lines)
+
+
+async def _find_duplicates(arguments: dict, algorithm: str, start: float) -> str:
+    root = Path(arguments.get("root") or ".")
+    if not root.is_dir():
+        return f"错误: 目录不存在: {root}"
+    
+    index = get_file_index(root)
+    await asyncio.to_thread(index.refresh)
+    min_size = max(1, _int_arg(arguments, "min_size") or 1)
+    entries = index.query(pattern=arguments.get("pattern"), min_size=min_size)
+    
+    by_size: Dict[int, List[str]] = {}
+    for relative, size, _ in entries:
+        by_size.setdefault(size, []).append(relative)
+    candidates = [relative for group in by_size.values() if len(group) > 1 for relative in group]
+    if len(candidates) > MAX_HASH_FILES:
+        return (f"错误: {len(candidates)} 个文件需要计算摘要，超过单次上限 {MAX_HASH_FILES}，"
+                f"请用 pattern 或 min_size 缩小范围")
+    
+    results = await _hash_all([os.path.join(index.root, relative) for relative in candidates], algorithm)
+    groups: Dict[Tuple[int, str], List[str]] = {}
+    for relative in candidates:
+        result = results[os.path.join(index.root, relative)]
+        if isinstance(result, Exception):
+            continue
+        digest, size, _ = result
+        groups.setdefault((size, digest), []).append(relative)
+    duplicates = sorted(
+        ((size, digest, sorted(paths)) for (size, digest), paths in groups.items() if len(paths) > 1),
+        key=lambda group: -group[0] * (len(group[2]) - 1)
+    )
+    
+    max_bytes = max(1, min(int(arguments.get("max_bytes", DEFAULT_SEARCH_MAX_BYTES)), MAX_READ_BYTES))
+    wasted = sum(size * (len(paths) - 1) for size, _, paths in duplicates)
+    elapsed = (time.perf_counter() - start) * 1000
+    summary = (f"{len(entries)} 个文件，{len(candidates)} 个大小相同需要比较，"
+               f"{len(duplicates)} 组重复，可节省 {wasted} 字节，耗时 {elapsed:.1f}ms")
+    if not duplicates:
+        return f"重复文件: {root}（{summary}）"
+    
+    lines = []
+    size_used = 0
+    for size, digest, paths in duplicates:
+        block = [f"[{size} 字节 × {len(paths)}] {algorithm}:{digest}"] + [f"  {path}" for path in paths]
+        block_size = sum(len(line.encode("utf-8")) + 1 for line in block)
+        if size_used + block_size > max_bytes:
+            lines.append(f"...（其余分组超过 {max_bytes} 字节上限，未显示）")
+            break
+        lines.extend(block)
+        size_used += block_size
+    return f"重复文件: {root}（{summary}）:\n" + "\n".join(lines)
+
 
 @app.list_tools()
 async def list_tools() -> List[Tool]:
@@ -31,18 +1461,174 @@ async def list_tools() -> List[Tool]:
     return [
         Tool(
             name="read_file",
-            description="读取指定文件的内容",
+            description="读取指定文件的内容。大文件请按字节范围或行范围分段读取，查看日志末尾请使用 tail_lines",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "file_path": {
                         "type": "string",
                         "description": "要读取的文件路径"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "起始字节偏移（可选），默认 0"
+                    },
+                    "length": {
+                        "type": "integer",
+                        "description": "读取的字节数（可选）"
+                    },
+                    "start_line": {
+                        "type": "integer",
+                        "description": "起始行号（可选，从 1 开始），按行读取"
+                    },
+                    "max_lines": {
+                        "type": "integer",
+                        "description": "按行读取时最多读取的行数，未指定 start_line 时从第 1 行开始"
+                    },
+                    "tail_lines": {
+                        "type": "integer",
+                        "description": "读取文件末尾的行数（可选，至少 1）"
+                    },
+                    "max_bytes": {
+                        "type": "integer",
+                        "description": f"本次最多返回的字节数，默认且最大 {MAX_READ_BYTES}。"
+                                       "未读完时结果末尾会给出继续读取的参数"
+                    },
+                    "encoding": {
+                        "type": "string",
+                        "enum": ["auto", "utf-8", "base64"],
+                        "description": "auto（默认）自动识别，二进制内容以 base64 返回；utf-8 按文本读取；base64 按二进制读取",
+                        "default": "auto"
+                    },
+                    "decompress": {
+                        "type": "boolean",
+                        "description": "自动解压 gzip/bz2/xz/zstd 文件，范围和行数按解压后的内容计算，默认 true",
+                        "default": True
                     }
                 },
                 "required": ["file_path"]
             }
         ),
+        Tool(
+            name="search_files",
+            description="在目录树中搜索文件内容，只返回匹配的行（可带上下文）。"
+                        "查找内容时请优先使用本工具，而不是逐个读取文件",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "root": {
+                        "type": "string",
+                        "description": "搜索的根目录，默认当前目录"
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "要搜索的文本或正则表达式"
+                    },
+                    "regex": {
+                        "type": "boolean",
+                        "description": "pattern 是否为正则表达式，默认 false（按字面文本搜索）",
+                        "default": False
+                    },
+                    "case_sensitive": {
+                        "type": "boolean",
+                        "description": "是否区分大小写，默认 true",
+                        "default": True
+                    },
+                    "include": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "只搜索匹配这些 glob 的文件（文件名或相对路径），如 [\"*.py\", \"src/*\"]"
+                    },
+                    "exclude": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": f"排除的文件或目录 glob，默认 {DEFAULT_EXCLUDED_DIRS}"
+                    },
+                    "context_lines": {
+                        "type": "integer",
+                        "description": f"每处匹配前后显示的行数，默认 0，最大 {MAX_CONTEXT_LINES}",
+                        "default": 0
+                    },
+                    "max_matches": {
+                        "type": "integer",
+                        "description": f"最多返回的匹配数，默认 {DEFAULT_SEARCH_MAX_MATCHES}",
+                        "default": DEFAULT_SEARCH_MAX_MATCHES
+                    },
+                    "max_bytes": {
+                        "type": "integer",
+                        "description": f"结果的最大字节数，默认 {DEFAULT_SEARCH_MAX_BYTES}",
+                        "default": DEFAULT_SEARCH_MAX_BYTES
+                    }
+                },
+                "required": ["pattern"]
+            }
+        ),
+        Tool(
+            name="list_files",
+            description="列出目录树中的文件（大小、修改时间），可按 glob、大小和修改时间筛选。"
+                        "结果来自增量维护的文件索引，重复列出同一目录很快",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "root": {
+                        "type": "string",
+                        "description": "根目录，默认当前目录"
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "文件名或相对路径的 glob，如 \"*.py\"、\"src/*/*.json\""
+                    },
+                    "min_size": {
+                        "type": "integer",
+                        "description": "最小文件大小（字节）"
+                    },
+                    "max_size": {
+                        "type": "integer",
+                        "description": "最大文件大小（字节）"
+                    },
+                    "min_age_seconds": {
+                        "type": "number",
+                        "description": "只列出至少这么多秒之前修改的文件"
+                    },
+                    "max_age_seconds": {
+                        "type": "number",
+                        "description": "只列出最近这么多秒内修改的文件"
+                    },
+                    "sort_by": {
+                        "type": "string",
+                        "enum": ["path", "size", "mtime"],
+                        "description": "排序方式：path（默认）、size（从大到小）、mtime（从新到旧）",
+                        "default": "path"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": f"最多返回的文件数，默认 {DEFAULT_LIST_LIMIT}，最大 {MAX_LIST_LIMIT}",
+                        "default": DEFAULT_LIST_LIMIT
+                    },
+                    "refresh": {
+                        "type": "boolean",
+                        "description": f"立即重新扫描所有目录（索引每 {FILE_INDEX_TTL:g} 秒内最多自动增量刷新一次，"
+                                       "刚修改过的文件需要准确结果时使用）",
+                        "default": False
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="stat_files",
+            description="查看指定路径的类型、大小和修改时间（直接读取文件系统，结果准确）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "paths": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "文件或目录路径列表"
+                    }
+                },
+                "required": ["paths"]
+            }
+        ),
         Tool(
             name="write_file",
             description="写入内容到指定文件",
@@ -56,15 +1642,149 @@ async def list_tools() -> List[Tool]:
                     "content": {
                         "type": "string",
                         "description": "要写入的内容"
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["overwrite", "append"],
+                        "description": "overwrite（默认）原子替换整个文件；append 追加到文件末尾，可分多次写入大文件",
+                        "default": "overwrite"
                     }
                 },
                 "required": ["file_path", "content"]
             }
+        ),
+        Tool(
+            name="read_many",
+            description="一次读取多个文件，每个文件可单独指定 read_file 的范围参数。需要查看多个文件时优先使用本工具",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "files": {
+                        "type": "array",
+                        "description": f"文件路径，或 {{file_path, offset, length, start_line, max_lines, tail_lines, max_bytes}} 对象，最多 {MAX_BATCH_FILES} 个",
+                        "items": {
+                            "anyOf": [
+                                {"type": "string"},
+                                {
+                                    "type": "object",
+                                    "properties": {
+                                        "file_path": {"type": "string"},
+                                        "offset": {"type": "integer"},
+                                        "length": {"type": "integer"},
+                                        "start_line": {"type": "integer"},
+                                        "max_lines": {"type": "integer"},
+                                        "tail_lines": {"type": "integer"},
+                                        "max_bytes": {"type": "integer"}
+                                    },
+                                    "required": ["file_path"]
+                                }
+                            ]
+                        }
+                    },
+                    "max_total_bytes": {
+                        "type": "integer",
+                        "description": f"所有文件结果的总字节上限，默认 {MAX_BATCH_READ_BYTES}",
+                        "default": MAX_BATCH_READ_BYTES
+                    }
+                },
+                "required": ["files"]
+            }
+        ),
+        Tool(
+            name="write_many",
+            description="一次写入多个文件（原子替换或追加），返回每个文件的结果",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "files": {
+                        "type": "array",
+                        "description": f"最多 {MAX_BATCH_FILES} 个条目；同一路径的多个条目按顺序写入",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "file_path": {"type": "string"},
+                                "content": {
+                                    "description": "要写入的内容，或按顺序写入的内容块列表",
+                                    "anyOf": [
+                                        {"type": "string"},
+                                        {"type": "array", "items": {"type": "string"}}
+                                    ]
+                                },
+                                "mode": {
+                                    "type": "string",
+                                    "enum": ["overwrite", "append"],
+                                    "default": "overwrite"
+                                }
+                            },
+                            "required": ["file_path", "content"]
+                        }
+                    }
+                },
+                "required": ["files"]
+            }
+        ),
+        Tool(
+            name="hash_files",
+            description="计算文件摘要（流式读取，不返回文件内容），可与期望值比对判断文件是否变化，"
+                        "或在目录中查找内容重复的文件",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "paths": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": f"要计算摘要的文件路径，最多 {MAX_HASH_FILES} 个"
+                    },
+                    "algorithm": {
+                        "type": "string",
+                        "enum": HASH_ALGORITHMS,
+                        "description": "摘要算法，默认 sha256",
+                        "default": "sha256"
+                    },
+                    "expected": {
+                        "type": "object",
+                        "additionalProperties": {"type": "string"},
+                        "description": "路径到期望摘要的映射，用于校验文件是否变化"
+                    },
+                    "find_duplicates": {
+                        "type": "boolean",
+                        "description": f"在 root 目录中查找内容重复的文件（忽略 paths），"
+                                       f"需要计算摘要的文件最多 {MAX_HASH_FILES} 个",
+                        "default": False
+                    },
+                    "root": {
+                        "type": "string",
+                        "description": "查找重复文件的根目录，默认当前目录"
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "查找重复文件时只比较匹配该 glob 的文件"
+                    },
+                    "min_size": {
+                        "type": "integer",
+                        "description": "查找重复文件时忽略小于该大小（字节）的文件"
+                    },
+                    "max_bytes": {
+                        "type": "integer",
+                        "description": f"重复文件结果的最大字节数，默认 {DEFAULT_SEARCH_MAX_BYTES}",
+                        "default": DEFAULT_SEARCH_MAX_BYTES
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="file_cache_stats",
+            description="查看 read_file 读取缓存的命中率、占用字节数和淘汰次数",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
         )
     ]
 
 
 @app.call_tool()
+@spool_large_results
 async def call_tool(name: str, arguments: Any) -> List[TextContent]:
     """执行工具调用"""
     
@@ -75,22 +1795,63 @@ async def call_tool(name: str, arguments: Any) -> List[TextContent]:
             if not path.exists():
                 return [TextContent(type="text", text=f"错误: 文件不存在: {file_path}")]
             
-            content = path.read_text(encoding="utf-8")
-            return [TextContent(type="text", text=f"文件内容:\n{content}")]
+            # 大文件的分段读取在线程中进行，不阻塞 stdio 通信
+            content = await asyncio.to_thread(read_range, path, arguments)
+            return [TextContent(type="text", text=content)]
         except Exception as e:
             return [TextContent(type="text", text=f"读取文件时出错: {str(e)}")]
     
+    elif name == "search_files":
+        try:
+            return [TextContent(type="text", text=await search_files(arguments))]
+        except Exception as e:
+            return [TextContent(type="text", text=f"搜索文件时出错: {str(e)}")]
+    
+    elif name == "list_files":
+        try:
+            return [TextContent(type="text", text=await asyncio.to_thread(list_files, arguments))]
+        except Exception as e:
+            return [TextContent(type="text", text=f"列出文件时出错: {str(e)}")]
+    
+    elif name == "stat_files":
+        try:
+            return [TextContent(type="text", text=await asyncio.to_thread(stat_files, arguments))]
+        except Exception as e:
+            return [TextContent(type="text", text=f"查看文件信息时出错: {str(e)}")]
+    
     elif name == "write_file":
         file_path = arguments.get("file_path")
         content = arguments.get("content")
+        mode = arguments.get("mode", "overwrite")
         try:
-            path = Path(file_path)
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(content, encoding="utf-8")
-            return [TextContent(type="text", text=f"成功写入文件: {file_path}")]
+            await asyncio.to_thread(write_content, file_path, content, mode)
+            action = "追加到" if mode == "append" else "写入"
+            return [TextContent(type="text", text=f"成功{action}文件: {file_path}")]
         except Exception as e:
             return [TextContent(type="text", text=f"写入文件时出错: {str(e)}")]
     
+    elif name == "read_many":
+        try:
+            return [TextContent(type="text", text=text) for text in await read_many(arguments)]
+        except Exception as e:
+            return [TextContent(type="text", text=f"批量读取文件时出错: {str(e)}")]
+    
+    elif name == "write_many":
+        try:
+            return [TextContent(type="text", text=text) for text in await write_many(arguments)]
+        except Exception as e:
+            return [TextContent(type="text", text=f"批量写入文件时出错: {str(e)}")]
+    
+    elif name == "hash_files":
+        try:
+            return [TextContent(type="text", text=await hash_files(arguments))]
+        except Exception as e:
+            return [TextContent(type="text", text=f"计算文件摘要时出错: {str(e)}")]
+    
+    elif name == "file_cache_stats":
+        stats = read_cache.stats()
+        return [TextContent(type="text", text=f"读取缓存统计:\n{json.dumps(stats, ensure_ascii=False, indent=2)}")]
+    
     else:
         return [TextContent(type="text", text=f"未知工具: {name}")]
 
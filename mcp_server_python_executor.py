@@ -6,11 +6,37 @@ MCP Server - Python 代码执行器
 """
 
 import asyncio
+import functools
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import signal
 import sys
+import threading
+import time
 import io
+import logging
 import traceback
-from typing import Any, List
-from contextlib import redirect_stdout, redirect_stderr
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional
+from contextlib import nullcontext, redirect_stdout, redirect_stderr
+
+try:
+    import resource
+except ImportError:  # Windows 不支持 CPU 和内存限制，仅限制输出大小
+    resource = None
+
+# 每个工作进程只用一个 BLAS 线程：并行由进程池提供，额外线程还会占用内存限制
+for _var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+try:
+    import numpy
+except ImportError:  # 可选依赖，未安装时不提供 numpy 沙箱配置
+    numpy = None
 
 # 设置 Windows 控制台编码
 if sys.platform == 'win32':
@@ -21,10 +47,60 @@ from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
+from mcp_result_spool import spool_large_results
+
+# 配置日志（写入标准错误，标准输出是 MCP 的 JSON-RPC 管道）
+logger = logging.getLogger(__name__)
+
 
 # 创建服务器实例
 app = Server("python-executor-server")
 
+# 工作进程数，默认与 CPU 核数相同
+POOL_SIZE = int(os.getenv("PY_EXECUTOR_WORKERS", str(os.cpu_count() or 2)))
+
+# 单次执行的资源限制：工具参数可以调整，但不能超过服务端上限
+MAX_CPU_SECONDS = float(os.getenv("PY_EXECUTOR_MAX_CPU_SECONDS", "30"))
+MAX_MEMORY_MB = float(os.getenv("PY_EXECUTOR_MAX_MEMORY_MB", "1024"))
+MAX_OUTPUT_BYTES = int(os.getenv("PY_EXECUTOR_MAX_OUTPUT_BYTES", str(1024 * 1024)))
+DEFAULT_CPU_SECONDS = min(10.0, MAX_CPU_SECONDS)
+DEFAULT_MEMORY_MB = min(256.0, MAX_MEMORY_MB)
+DEFAULT_OUTPUT_BYTES = min(64 * 1024, MAX_OUTPUT_BYTES)
+
+# 工具参数可设置的最小值：过小的限制会让工作进程在执行用户代码前就因 SIGXCPU 或 MemoryError 退出
+MIN_CPU_SECONDS = 1.0
+MIN_MEMORY_MB = 16.0
+MIN_OUTPUT_BYTES = 1024
+
+# 父进程检查工作进程 CPU 时间的间隔（秒），以及发出 SIGXCPU 后等待代码自行终止的时间（秒）
+CPU_POLL_INTERVAL = 0.1
+CPU_KILL_GRACE_SECONDS = 0.5
+
+# 替代工作进程启动失败后重试的最长间隔（秒）
+SPAWN_RETRY_MAX_DELAY = 30.0
+
+# 单次调用的超时时间上限（秒）
+MAX_TIMEOUT_SECONDS = float(os.getenv("PY_EXECUTOR_MAX_TIMEOUT_SECONDS", "300"))
+MIN_TIMEOUT_SECONDS = 0.1
+
+# 编译缓存的最大条目数
+CODE_CACHE_SIZE = int(os.getenv("PY_EXECUTOR_CODE_CACHE_SIZE", "256"))
+
+# 执行会话：最大会话数、空闲超时（秒）和单个会话的内存上限（MB）
+MAX_SESSIONS = int(os.getenv("PY_EXECUTOR_MAX_SESSIONS", "8"))
+SESSION_IDLE_TIMEOUT = float(os.getenv("PY_EXECUTOR_SESSION_IDLE_SECONDS", "600"))
+SESSION_MAX_MEMORY_MB = int(os.getenv("PY_EXECUTOR_SESSION_MAX_MEMORY_MB", "1024"))
+
+# 执行过程中推送部分输出：最短推送间隔（秒）和单次执行推送的字节上限
+PROGRESS_INTERVAL = float(os.getenv("PY_EXECUTOR_PROGRESS_INTERVAL", "0.5"))
+PROGRESS_MAX_BYTES = int(os.getenv("PY_EXECUTOR_PROGRESS_MAX_BYTES", str(64 * 1024)))
+
+# numpy 沙箱配置中单个数组的最大元素数
+NUMPY_MAX_ELEMENTS = int(os.getenv("PY_EXECUTOR_NUMPY_MAX_ELEMENTS", str(10_000_000)))
+
+# parallel_map 单次调用的最大输入数
+MAP_MAX_ITEMS = int(os.getenv("PY_EXECUTOR_MAP_MAX_ITEMS", "100000"))
+
 
 @app.list_tools()
 async def list_tools() -> List[Tool]:
@@ -42,13 +118,120 @@ async def list_tools() -> List[Tool]:
                     },
                     "timeout": {
                         "type": "number",
-                        "description": "执行超时时间（秒），默认 5 秒",
+                        "description": f"执行超时时间（秒），默认 5 秒，最大 {MAX_TIMEOUT_SECONDS:g}",
                         "default": 5
+                    },
+                    "max_cpu_seconds": {
+                        "type": "number",
+                        "description": f"CPU 时间上限（秒），默认 {DEFAULT_CPU_SECONDS:g}，"
+                                       f"范围 {MIN_CPU_SECONDS:g} 到 {MAX_CPU_SECONDS:g}"
+                    },
+                    "max_memory_mb": {
+                        "type": "number",
+                        "description": f"内存上限（MB），默认 {DEFAULT_MEMORY_MB:g}，"
+                                       f"范围 {MIN_MEMORY_MB:g} 到 {MAX_MEMORY_MB:g}"
+                    },
+                    "max_output_bytes": {
+                        "type": "integer",
+                        "description": f"输出上限（字节），默认 {DEFAULT_OUTPUT_BYTES}，"
+                                       f"范围 {MIN_OUTPUT_BYTES} 到 {MAX_OUTPUT_BYTES}"
+                    },
+                    "session_id": {
+                        "type": "string",
+                        "description": "会话名称（可选）。指定后变量、函数等状态在同名会话的多次调用间保留，"
+                                       "多步分析时只需发送新增的代码"
+                    },
+                    "profile": {
+                        "type": "string",
+                        "enum": list(SANDBOX_PROFILES),
+                        "description": "沙箱配置，默认 default。numpy 配置额外提供 np（NumPy 的常用子集），"
+                                       "数值计算请优先使用向量化运算而不是 Python 循环",
+                        "default": "default"
                     }
                 },
                 "required": ["code"]
             }
         ),
+        Tool(
+            name="parallel_map",
+            description="把同一个函数并行应用到一组输入上（如参数扫描、逐项转换），"
+                        "输入按批分发到多个工作进程，结果按输入顺序以 JSON 返回，单项出错不影响其他项",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "function": {
+                        "type": "string",
+                        "description": "函数源码：一个 lambda 表达式，或包含 def 定义的代码（函数接收一个参数）"
+                    },
+                    "function_name": {
+                        "type": "string",
+                        "description": "要调用的函数名（可选）。源码中只定义了一个函数时可省略"
+                    },
+                    "inputs": {
+                        "type": "array",
+                        "description": f"输入列表，每一项作为函数的参数，最多 {MAP_MAX_ITEMS} 项"
+                    },
+                    "chunk_size": {
+                        "type": "integer",
+                        "description": "每批的输入数（可选），默认按工作进程数自动划分"
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": f"总超时时间（秒），默认 30 秒，最大 {MAX_TIMEOUT_SECONDS:g}，"
+                                       "超时未完成的输入标记为错误",
+                        "default": 30
+                    },
+                    "max_memory_mb": {
+                        "type": "number",
+                        "description": f"每个工作进程的内存上限（MB），默认 {DEFAULT_MEMORY_MB:g}，"
+                                       f"范围 {MIN_MEMORY_MB:g} 到 {MAX_MEMORY_MB:g}"
+                    },
+                    "profile": {
+                        "type": "string",
+                        "enum": list(SANDBOX_PROFILES),
+                        "description": "沙箱配置，默认 default",
+                        "default": "default"
+                    }
+                },
+                "required": ["function", "inputs"]
+            }
+        ),
+        Tool(
+            name="reset_session",
+            description="清空指定执行会话中的所有变量",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "session_id": {
+                        "type": "string",
+                        "description": "会话名称"
+                    }
+                },
+                "required": ["session_id"]
+            }
+        ),
+        Tool(
+            name="close_session",
+            description="关闭指定执行会话并释放其资源",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "session_id": {
+                        "type": "string",
+                        "description": "会话名称"
+                    }
+                },
+                "required": ["session_id"]
+            }
+        ),
+        Tool(
+            name="list_sessions",
+            description="列出所有执行会话及其调用次数、空闲时间和内存占用",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
+        ),
         Tool(
             name="evaluate_expression",
             description="计算 Python 表达式并返回结果。适合快速计算数学表达式或简单求值。",
@@ -99,6 +282,7 @@ def create_safe_globals():
         'oct': oct,
         'ord': ord,
         'pow': pow,
+        'print': print,
         'range': range,
         'reversed': reversed,
         'round': round,
@@ -123,82 +307,1237 @@ def create_safe_globals():
     }
 
 
-async def execute_code_with_timeout(code: str, timeout: float) -> str:
-    """在单独的线程中执行代码，带超时控制"""
-    import concurrent.futures
+class _ReadOnlyNamespace:
+    """只读的模块替身，只暴露允许的属性（沙箱模板在多次执行间共享，不能被用户代码修改）"""
+    
+    def __init__(self, name: str, attrs: dict):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_attrs", MappingProxyType(attrs))
+    
+    def __getattr__(self, item):
+        try:
+            return self._attrs[item]
+        except KeyError:
+            raise AttributeError(f"{self._name} 中不存在或不允许使用 {item}") from None
+    
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{self._name} 是只读的")
+    
+    def __delattr__(self, item):
+        raise AttributeError(f"{self._name} 是只读的")
+    
+    def __dir__(self):
+        return sorted(self._attrs)
+    
+    def __repr__(self):
+        return f"<沙箱模块 {self._name}>"
+
+
+# numpy 允许使用的属性：不包含文件读写（load/save/fromfile/memmap 等）和底层接口（ctypeslib/lib 等）
+_NUMPY_ALLOWED = [
+    # 数组和数据类型
+    "array", "asarray", "ndarray", "dtype", "float64", "float32", "int64", "int32", "int8",
+    "uint8", "bool_", "complex128", "nan", "inf", "pi", "e", "newaxis",
+    "zeros_like", "ones_like", "full_like", "empty_like", "copy",
+    # 形状操作
+    "reshape", "ravel", "transpose", "swapaxes", "expand_dims", "squeeze", "concatenate",
+    "stack", "vstack", "hstack", "column_stack", "split", "array_split", "tile", "repeat",
+    "flip", "roll", "meshgrid", "broadcast_to", "atleast_1d", "atleast_2d",
+    # 逐元素运算
+    "abs", "absolute", "sign", "sqrt", "square", "exp", "expm1", "log", "log1p", "log2", "log10",
+    "sin", "cos", "tan", "arcsin", "arccos", "arctan", "arctan2", "sinh", "cosh", "tanh",
+    "floor", "ceil", "round", "rint", "trunc", "clip", "power", "mod", "maximum", "minimum",
+    "add", "subtract", "multiply", "divide", "floor_divide", "hypot", "deg2rad", "rad2deg",
+    "isnan", "isinf", "isfinite", "nan_to_num", "where", "logical_and", "logical_or", "logical_not",
+    # 归约和统计
+    "sum", "prod", "mean", "median", "average", "std", "var", "min", "max", "amin", "amax",
+    "argmin", "argmax", "ptp", "cumsum", "cumprod", "diff", "percentile", "quantile",
+    "nansum", "nanmean", "nanmedian", "nanstd", "nanvar", "nanmin", "nanmax",
+    "histogram", "bincount", "digitize", "corrcoef", "cov", "count_nonzero", "all", "any",
+    "allclose", "isclose", "array_equal",
+    # 排序和查找
+    "sort", "argsort", "unique", "searchsorted", "nonzero", "argwhere", "in1d", "isin",
+    # 线性代数和多项式
+    "dot", "vdot", "matmul", "inner", "outer", "cross", "trace", "polyfit", "polyval", "roots",
+    "interp", "convolve", "gradient", "trapezoid",
+]
+
+_NUMPY_LINALG_ALLOWED = [
+    "norm", "inv", "pinv", "det", "solve", "lstsq", "eig", "eigh", "eigvals", "svd",
+    "qr", "cholesky", "matrix_rank",
+]
+
+_NUMPY_RANDOM_ALLOWED = ["seed", "shuffle", "permutation"]
+
+
+def _check_elements(count: int):
+    """创建数组前检查元素数"""
+    if count > NUMPY_MAX_ELEMENTS:
+        raise ValueError(f"数组元素数 {count} 超过上限 {NUMPY_MAX_ELEMENTS}")
+
+
+def _shape_size(shape) -> int:
+    if isinstance(shape, (int, numpy.integer)):
+        return int(shape)
+    return math.prod(int(dim) for dim in shape)
+
+
+def _cap_shape(func, position: int, keyword: str):
+    """包装以形状（或 size）参数创建数组的函数，分配前检查元素数"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        shape = args[position] if len(args) > position else kwargs.get(keyword)
+        if shape is not None:
+            _check_elements(_shape_size(shape))
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def _cap_dims(func):
+    """包装以多个维度参数创建数组的函数（如 rand(2, 3)）"""
+    @functools.wraps(func)
+    def wrapper(*dims):
+        _check_elements(math.prod(int(dim) for dim in dims))
+        return func(*dims)
+    return wrapper
+
+
+def _capped_arange(*args, **kwargs):
+    """arange，分配前按起止和步长计算元素数"""
+    bounds = list(args[:3])
+    if len(bounds) == 1:
+        bounds = [0, bounds[0]]
+    if len(bounds) >= 2 and all(isinstance(v, (int, float, numpy.integer, numpy.floating)) for v in bounds):
+        start, stop = bounds[0], bounds[1]
+        step = bounds[2] if len(bounds) == 3 else kwargs.get("step", 1)
+        if step:
+            _check_elements(max(0, math.ceil((stop - start) / step)))
+    return numpy.arange(*args, **kwargs)
+
+
+def _capped_eye(N, M=None, *args, **kwargs):
+    _check_elements(int(N) * int(N if M is None else M))
+    return numpy.eye(N, M, *args, **kwargs)
+
+
+def _capped_identity(n, *args, **kwargs):
+    _check_elements(int(n) * int(n))
+    return numpy.identity(n, *args, **kwargs)
+
+
+# numpy 的 C 扩展运行时按需导入的内部模块（numpy 2.x 为 numpy._core.*，1.x 为 numpy.core.*）
+_NUMPY_RUNTIME_MODULES = tuple(
+    f"{package}.{module}"
+    for package in ("numpy._core", "numpy.core")
+    for module in ("_methods", "_internal", "_dtype", "_exceptions", "_ufunc_config", "arrayprint")
+)
+
+
+def _preload_numpy_runtime_modules():
+    """构建沙箱模板前导入 numpy 运行时需要的内部模块（工作进程随模板一起继承）"""
+    for name in _NUMPY_RUNTIME_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+
+
+def _numpy_runtime_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """
+    numpy 配置沙箱的 __import__
+    
+    numpy 的 C 扩展通过 PyImport_Import 导入内部模块（如 numpy._core._methods），
+    它查找调用方（即用户代码）的 __builtins__ 中的 __import__，只为其副作用调用，
+    之后自行从 sys.modules 取模块。因此这里只确认模块在显式列表中且已预先导入，
+    不导入任何模块，也不把模块对象返回给调用方。
+    """
+    if level or name not in _NUMPY_RUNTIME_MODULES or name not in sys.modules:
+        raise ImportError(f"沙箱中不允许导入 {name}")
+    return None
+
+
+def create_numpy_namespace() -> _ReadOnlyNamespace:
+    """
+    创建沙箱中的 np：只包含允许的 numpy 属性
+    
+    直接按形状分配内存的函数包装为先检查元素数；其余运算（如广播产生的大数组）
+    由执行期间的内存限制兜底。
+    """
+    attrs = {name: getattr(numpy, name) for name in _NUMPY_ALLOWED if hasattr(numpy, name)}
+    for name in ("zeros", "ones", "empty", "full"):
+        attrs[name] = _cap_shape(getattr(numpy, name), 0, "shape")
+    attrs["linspace"] = _cap_shape(numpy.linspace, 2, "num")
+    attrs["arange"] = _capped_arange
+    attrs["eye"] = _capped_eye
+    attrs["identity"] = _capped_identity
+    
+    attrs["linalg"] = _ReadOnlyNamespace("np.linalg", {
+        name: getattr(numpy.linalg, name) for name in _NUMPY_LINALG_ALLOWED if hasattr(numpy.linalg, name)
+    })
+    
+    random_attrs = {name: getattr(numpy.random, name) for name in _NUMPY_RANDOM_ALLOWED}
+    random_attrs["rand"] = _cap_dims(numpy.random.rand)
+    random_attrs["randn"] = _cap_dims(numpy.random.randn)
+    random_attrs["random"] = _cap_shape(numpy.random.random, 0, "size")
+    random_attrs["randint"] = _cap_shape(numpy.random.randint, 2, "size")
+    random_attrs["choice"] = _cap_shape(numpy.random.choice, 1, "size")
+    for name in ("normal", "uniform"):
+        random_attrs[name] = _cap_shape(getattr(numpy.random, name), 2, "size")
+    random_attrs["poisson"] = _cap_shape(numpy.random.poisson, 1, "size")
+    attrs["random"] = _ReadOnlyNamespace("np.random", random_attrs)
+    
+    return _ReadOnlyNamespace("np", attrs)
+
+
+def _build_profiles() -> Dict[str, MappingProxyType]:
+    """构建各沙箱配置的模板"""
+    default = create_safe_globals()
+    profiles = {"default": default}
+    if numpy is not None:
+        _preload_numpy_runtime_modules()
+        builtins = dict(default['__builtins__'], __import__=_numpy_runtime_import)
+        profiles["numpy"] = dict(default, __builtins__=builtins, np=create_numpy_namespace())
+    return {name: MappingProxyType(template) for name, template in profiles.items()}
+
+
+# 预先构建的只读沙箱模板，每次执行时浅拷贝（工作进程从 forkserver 继承，无需重复导入模块）
+SANDBOX_PROFILES = _build_profiles()
+
+
+def new_sandbox(profile: str = "default") -> dict:
+    """从模板复制一份独立的沙箱全局环境"""
+    template = SANDBOX_PROFILES[profile]
+    sandbox = dict(template)
+    sandbox['__builtins__'] = dict(template['__builtins__'])
+    return sandbox
+
+
+class _CodeCache:
+    """
+    按源码缓存编译结果的 LRU 缓存
+    
+    以 (模式, 源码) 为键：字符串的哈希值在首次计算后会缓存在字符串对象上，
+    查找开销远小于每次计算摘要；过长的源码不缓存，限制缓存占用的内存。
+    """
+    
+    def __init__(self, max_entries: int, max_source_bytes: int = 64 * 1024):
+        self.max_entries = max_entries
+        self.max_source_bytes = max_source_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def compile(self, source: str, mode: str):
+        """编译源码，命中缓存时直接返回已编译的代码对象"""
+        if len(source) > self.max_source_bytes:
+            return compile(source, "<string>", mode)
+        
+        key = (mode, source)
+        code = self._entries.get(key)
+        if code is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return code
+        
+        self.misses += 1
+        code = compile(source, "<string>", mode)
+        self._entries[key] = code
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return code
+
+
+# 编译缓存（每个进程各有一份）
+code_cache = _CodeCache(CODE_CACHE_SIZE)
+
+
+class _LimitExceeded(BaseException):
+    """超出资源限制（继承 BaseException，用户代码的 except Exception 无法吞掉）"""
+
+
+class _OutputLimitExceeded(_LimitExceeded):
+    pass
+
+
+class _CPULimitExceeded(_LimitExceeded):
+    pass
+
+
+class _BoundedOutput(io.TextIOBase):
+    """有字节上限的输出捕获，标准输出和错误输出共享同一个预算"""
+    
+    def __init__(self, budget: dict, on_write=None):
+        self._budget = budget
+        self._chunks: List[str] = []
+        self._on_write = on_write
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8", errors="replace")
+        remaining = self._budget["remaining"]
+        if len(data) > remaining:
+            self._append(data[:remaining].decode("utf-8", errors="ignore"))
+            self._budget["remaining"] = 0
+            raise _OutputLimitExceeded()
+        self._append(text)
+        self._budget["remaining"] = remaining - len(data)
+        return len(text)
+    
+    def _append(self, text: str):
+        self._chunks.append(text)
+        if self._on_write is not None and text:
+            self._on_write(text)
+    
+    def getvalue(self) -> str:
+        return "".join(self._chunks)
+
+
+class _ProgressStreamer:
+    """
+    把执行过程中的输出分批推送给父进程
+    
+    输出先缓存在内存中，后台线程每隔 interval 秒把新输出作为一条进度消息发出，
+    避免频繁的小块写入占满管道；推送总量达到 max_bytes 后不再推送（最终结果不受影响）。
+    """
+    
+    def __init__(self, conn, interval: float, max_bytes: int):
+        self._conn = conn
+        self._interval = interval
+        self._remaining = max_bytes
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def feed(self, text: str):
+        with self._lock:
+            if self._remaining > 0:
+                self._pending.append(text)
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        # 剩余的输出会包含在最终结果中，无需再推送
+        self._stop.set()
+        self._thread.join()
+        return False
+    
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self._flush()
+    
+    def _flush(self):
+        with self._lock:
+            if not self._pending or self._remaining <= 0:
+                return
+            data = "".join(self._pending).encode("utf-8", errors="replace")[:self._remaining]
+            self._pending.clear()
+            self._remaining -= len(data)
+            self._conn.send({"progress": data.decode("utf-8", errors="ignore")})
+
+
+def _raise_cpu_limit(signum, frame):
+    """SIGXCPU 处理函数：CPU 时间超过软限制"""
+    raise _CPULimitExceeded()
+
+
+def _process_cpu_time(pid: int) -> Optional[float]:
+    """指定进程已用的 CPU 时间（秒），仅 Linux 可用"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # 进程名可能包含空格和括号，从最后一个 ")" 之后开始解析
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _current_address_space() -> Optional[int]:
+    """当前进程的虚拟内存大小（字节），仅 Linux 可用"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _current_rss() -> Optional[int]:
+    """当前进程的常驻内存大小（字节），仅 Linux 可用"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class _ResourceLimits:
+    """在一次执行期间设置 CPU 和内存软限制，执行结束后恢复"""
+    
+    def __init__(self, cpu_seconds: float, memory_bytes: int):
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self._saved = {}
+    
+    def __enter__(self):
+        if resource is None:
+            return self
+        
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = usage.ru_utime + usage.ru_stime
+        self._set(resource.RLIMIT_CPU, math.ceil(used + self.cpu_seconds))
+        
+        address_space = _current_address_space()
+        if address_space is not None:
+            self._set(resource.RLIMIT_AS, address_space + self.memory_bytes)
+        return self
+    
+    def __exit__(self, *exc_info):
+        for which, soft in self._saved.items():
+            _, hard = resource.getrlimit(which)
+            resource.setrlimit(which, (soft, hard))
+        self._saved.clear()
+        return False
+    
+    def _set(self, which: int, soft: int):
+        current_soft, hard = resource.getrlimit(which)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        self._saved[which] = current_soft
+        resource.setrlimit(which, (soft, hard))
+
+
+# 用户代码执行期间禁止的审计事件：写文件、修改文件系统、ctypes 和创建进程
+_OPEN_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_TRUNC
+_DENIED_AUDIT_EVENTS = (
+    "os.remove", "os.rename", "os.rmdir", "os.mkdir", "os.truncate", "os.chmod", "os.chown",
+    "os.link", "os.symlink", "os.utime", "os.system", "os.exec", "os.posix_spawn", "os.spawn",
+    "os.fork", "os.forkpty", "os.kill", "os.startfile", "subprocess.Popen",
+)
+_DENIED_AUDIT_PREFIXES = ("ctypes.", "shutil.")
+
+
+class _SandboxAudit:
+    """
+    执行用户代码期间通过审计钩子拦截文件写入和底层接口
+    
+    沙箱里的对象本身仍可能间接触达文件操作（如 ndarray.tofile / dump、arr.ctypes），
+    审计钩子在解释器层面拦截这些操作，与调用路径无关。钩子一经安装无法移除，
+    只在 active 期间生效；工作进程之外（如父进程、解释器写入 .pyc）不受影响。
+    """
+    
+    active = False
+    _installed = False
+    
+    def __enter__(self):
+        if not _SandboxAudit._installed:
+            sys.addaudithook(_SandboxAudit._hook)
+            _SandboxAudit._installed = True
+        _SandboxAudit.active = True
+        return self
+    
+    def __exit__(self, *exc_info):
+        _SandboxAudit.active = False
+        return False
+    
+    @staticmethod
+    def _hook(event: str, args: tuple):
+        if not _SandboxAudit.active:
+            return
+        if event == "open":
+            # open / os.open 的参数均为 (路径, 模式, 标志位)
+            if len(args) >= 3 and isinstance(args[2], int) and args[2] & _OPEN_WRITE_FLAGS:
+                raise PermissionError(f"沙箱中不允许写入文件: {args[0]}")
+        elif event in _DENIED_AUDIT_EVENTS or event.startswith(_DENIED_AUDIT_PREFIXES):
+            raise PermissionError(f"沙箱中不允许该操作: {event}")
+
+
+def _execute(code: str, limits: dict, namespace: Optional[dict] = None,
+             streamer: Optional[_ProgressStreamer] = None, profile: str = "default") -> dict:
+    """
+    在当前进程中执行代码并格式化输出（在工作进程中调用）
     
-    def run_code():
-        # 捕获标准输出和错误输出
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
+    Args:
+        code: 要执行的代码
+        limits: 资源限制
+        namespace: 会话命名空间；提供时代码直接在其中执行，状态在多次调用间保留
+        streamer: 进度推送器；提供时执行过程中的输出会分批推送给父进程
+        profile: 沙箱配置（非会话模式）
+    
+    Returns:
+        {"output": 结果文本, "recycle": 是否需要替换工作进程}
+    """
+    # 捕获标准输出和错误输出，共享字节预算
+    budget = {"remaining": limits["output_bytes"]}
+    on_write = streamer.feed if streamer is not None else None
+    stdout_capture = _BoundedOutput(budget, on_write)
+    stderr_capture = _BoundedOutput(budget, on_write)
+    local_vars = {}
+    limit_notes = []
+    recycle = False
+    
+    try:
+        if namespace is not None:
+            # 会话模式：全局和局部使用同一个命名空间，记录执行前的状态用于显示变化的变量
+            safe_globals = local_vars = namespace
+            before = dict(namespace)
+        else:
+            # 复制预先构建的安全执行环境
+            safe_globals = new_sandbox(profile)
+        
+        compiled = code_cache.compile(code, "exec")
         
+        # 重定向输出并设置资源限制
+        with streamer or nullcontext(), \
+                _ResourceLimits(limits["cpu_seconds"], limits["memory_bytes"]), \
+                redirect_stdout(stdout_capture), redirect_stderr(stderr_capture), _SandboxAudit():
+            # 执行代码
+            exec(compiled, safe_globals, local_vars)
+    except _OutputLimitExceeded:
+        limit_notes.append(f"[输出已截断：超过 {limits['output_bytes']} 字节限制，执行已终止]")
+    except _CPULimitExceeded:
+        limit_notes.append(f"[CPU 时间超过 {limits['cpu_seconds']} 秒限制，执行已终止]")
+    except MemoryError:
+        limit_notes.append(f"[内存超过 {limits['memory_bytes'] // (1024 * 1024)} MB 限制，执行已终止]")
+        recycle = True
+    except Exception as e:
+        error_msg = f"执行错误:\n{type(e).__name__}: {str(e)}\n\n详细信息:\n{traceback.format_exc()}"
+        return {"output": error_msg[:limits["output_bytes"]], "recycle": False}
+    
+    # 获取输出
+    stdout_text = stdout_capture.getvalue()
+    stderr_text = stderr_capture.getvalue()
+    
+    result_parts = []
+    
+    if stdout_text:
+        result_parts.append(f"标准输出:\n{stdout_text}")
+    
+    if stderr_text:
+        result_parts.append(f"错误输出:\n{stderr_text}")
+    
+    # 会话模式只显示本次新增或重新赋值的变量
+    if namespace is not None:
+        local_vars = {k: v for k, v in namespace.items() if k not in before or before[k] is not v}
+    
+    # 如果有定义的变量，也显示出来（占用剩余的输出预算）
+    if local_vars and not limit_notes:
+        vars_str = "\n".join([f"{k} = {repr(v)}" for k, v in local_vars.items() if not k.startswith('_')])
+        if vars_str:
+            data = vars_str.encode("utf-8", errors="replace")
+            if len(data) > budget["remaining"]:
+                # 预算按字节计算，截断编码后的内容，丢弃被截断的不完整字符
+                vars_str = data[:budget["remaining"]].decode("utf-8", errors="ignore")
+                limit_notes.append(f"[变量输出已截断：超过 {limits['output_bytes']} 字节限制]")
+            result_parts.append(f"定义的变量:\n{vars_str}")
+    
+    result_parts.extend(limit_notes)
+    
+    if not result_parts:
+        return {"output": "代码执行成功（无输出）", "recycle": recycle}
+    
+    return {"output": "\n\n".join(result_parts), "recycle": recycle}
+
+
+def _json_default(obj):
+    """numpy 数组和标量转为列表和 Python 数值，其他无法序列化的对象使用 repr"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return repr(obj)
+
+
+def _load_function(source: str, function_name: Optional[str], sandbox: dict):
+    """在沙箱中执行函数源码并返回要调用的函数"""
+    if not function_name:
+        # 先按 lambda 表达式处理
+        try:
+            func = eval(code_cache.compile(source, "eval"), sandbox)
+        except SyntaxError:
+            func = None
+        if func is not None:
+            if not callable(func):
+                raise TypeError("函数源码的值不可调用")
+            return func
+    
+    before = set(sandbox)
+    exec(code_cache.compile(source, "exec"), sandbox)
+    if function_name:
+        func = sandbox.get(function_name)
+        if not callable(func):
+            raise NameError(f"源码中没有定义函数 {function_name}")
+        return func
+    
+    defined = [name for name, value in sandbox.items() if name not in before and callable(value)]
+    if len(defined) != 1:
+        raise NameError(f"源码中定义了 {len(defined)} 个函数，请通过 function_name 指定要调用的函数")
+    return sandbox[defined[0]]
+
+
+def _map_chunk(job: dict) -> dict:
+    """
+    对一批输入调用函数（在工作进程中调用）
+    
+    Returns:
+        {"items": [{"index", "result" 或 "error"}], "recycle": 是否需要替换工作进程}；
+        函数加载失败时返回 {"error": 错误信息}
+    """
+    limits = job["limits"]
+    items = job["items"]
+    results = []
+    recycle = False
+    
+    try:
+        with _ResourceLimits(limits["cpu_seconds"], limits["memory_bytes"]), redirect_stderr(sys.stdout), \
+                _SandboxAudit():
+            try:
+                func = _load_function(job["source"], job.get("function_name"), new_sandbox(job["profile"]))
+            except Exception as e:
+                return {"error": f"{type(e).__name__}: {e}", "recycle": False}
+            
+            for index, value in items:
+                try:
+                    # 在工作进程中完成序列化，无法序列化的结果只影响这一项
+                    result = json.loads(json.dumps(func(value), default=_json_default))
+                    results.append({"index": index, "result": result})
+                except MemoryError:
+                    recycle = True
+                    results.append({"index": index, "error": "MemoryError: 内存超过限制"})
+                except Exception as e:
+                    results.append({"index": index, "error": f"{type(e).__name__}: {e}"})
+    except _LimitExceeded:
+        # CPU 时间超限：本批剩余输入都标记为错误
+        message = f"CPU 时间超过 {limits['cpu_seconds']} 秒限制"
+        results.extend({"index": index, "error": message} for index, _ in items[len(results):])
+    
+    return {"items": results, "recycle": recycle}
+
+
+def _worker_main(conn):
+    """
+    工作进程主循环
+    
+    安全执行环境模板在导入模块时已构建好，之后循环接收任务并返回结果。
+    """
+    # 标准输出是 MCP 的 JSON-RPC 管道，工作进程绝不能写入
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    sys.stdout = open(os.devnull, 'w')
+    
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+    
+    # 会话命名空间（仅会话专用的工作进程使用）
+    namespace = None
+    
+    while True:
         try:
-            # 创建安全的执行环境
-            safe_globals = create_safe_globals()
-            local_vars = {}
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        
+        if job["op"] == "exec":
+            streamer = None
+            if job.get("stream"):
+                streamer = _ProgressStreamer(conn, PROGRESS_INTERVAL, PROGRESS_MAX_BYTES)
+            profile = job.get("profile", "default")
+            if job.get("persist"):
+                if namespace is None:
+                    namespace = new_sandbox(profile)
+                else:
+                    # 会话中途切换配置时补充该配置提供的名称，不覆盖已有变量
+                    template = SANDBOX_PROFILES[profile]
+                    for key, value in template.items():
+                        namespace.setdefault(key, value)
+                    for key, value in template['__builtins__'].items():
+                        namespace['__builtins__'].setdefault(key, value)
+                result = _execute(job["code"], job["limits"], namespace, streamer)
+            else:
+                result = _execute(job["code"], job["limits"], streamer=streamer, profile=profile)
+        elif job["op"] == "map":
+            result = _map_chunk(job)
+        elif job["op"] == "reset":
+            namespace = None
+            result = {"output": "会话已重置", "recycle": False}
+        else:
+            result = {"output": f"未知任务类型: {job['op']}", "recycle": False}
+        result["memory_bytes"] = _current_rss()
+        conn.send(result)
+        
+        # 内存超限后进程堆可能已经膨胀，退出并由进程池替换
+        if result["recycle"]:
+            break
+
+
+class _Worker:
+    """一个工作进程及其通信管道"""
+    
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+    
+    def request(self, job: dict, timeout: float, on_progress=None) -> Optional[dict]:
+        """
+        发送任务并等待结果（阻塞调用，应在线程中运行），超时返回 None
+        
+        结果之前可能先收到若干条进度消息，逐条交给 on_progress 处理。
+        """
+        cpu_limit = self._cpu_deadline(job)
+        self.conn.send(job)
+        deadline = time.monotonic() + timeout
+        signalled_at = None
+        while True:
+            wait = deadline - time.monotonic()
+            if cpu_limit is not None:
+                wait = min(wait, CPU_POLL_INTERVAL)
+            if not self.conn.poll(max(0.0, wait)):
+                if time.monotonic() >= deadline:
+                    return None
+                if signalled_at is None:
+                    cpu_time = _process_cpu_time(self.process.pid)
+                    if cpu_time is not None and cpu_time >= cpu_limit:
+                        # 先发 SIGXCPU，Python 代码会在处理函数中终止并保留已有输出
+                        os.kill(self.process.pid, signal.SIGXCPU)
+                        signalled_at = time.monotonic()
+                elif time.monotonic() - signalled_at >= CPU_KILL_GRACE_SECONDS:
+                    # 长时间运行的 C 代码不会回到解释器执行信号处理函数，由进程池杀死并替换
+                    return {"output": f"[CPU 时间超过 {job['limits']['cpu_seconds']} 秒限制，执行已终止]",
+                            "recycle": True}
+                continue
+            message = self.conn.recv()
+            if "progress" not in message:
+                if signalled_at is not None:
+                    # 信号可能在任务结束后才送达，不再复用这个工作进程
+                    message["recycle"] = True
+                return message
+            if on_progress is not None:
+                on_progress(message["progress"])
+    
+    def _cpu_deadline(self, job: dict) -> Optional[float]:
+        """
+        本次任务允许工作进程达到的 CPU 时间（秒），无法获取进程 CPU 时间时返回 None
+        
+        工作进程内的 RLIMIT_CPU 软限制只在解释器执行字节码时生效，且只能按整秒设置，
+        因此由父进程按实际 CPU 时间检查配额。
+        """
+        limits = job.get("limits")
+        if not limits:
+            return None
+        cpu_time = _process_cpu_time(self.process.pid)
+        if cpu_time is None:
+            return None
+        return cpu_time + limits["cpu_seconds"]
+    
+    def kill(self):
+        """强制结束工作进程"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    预先创建的工作进程池
+    
+    每个工作进程一次只执行一个任务，超时后直接杀死进程并在后台补充新进程，
+    因此失控的代码不会一直占用 CPU，超时也能立即返回。
+    """
+    
+    def __init__(self, size: int):
+        self.size = size
+        # forkserver 从干净的单线程进程派生工作进程，不支持时（Windows/macOS）使用 spawn
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._ctx = multiprocessing.get_context(method)
+        if method == "forkserver":
+            self._ctx.set_forkserver_preload(["__main__"])
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: set = set()
+        self._replacements: set = set()
+        self._start_lock = asyncio.Lock()
+        self._closed = False
+    
+    async def start(self):
+        """启动全部工作进程（重复调用无副作用）"""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            self._idle = asyncio.Queue()
+            workers = await asyncio.gather(*[self.spawn_worker() for _ in range(self.size)])
+            for worker in workers:
+                self._workers.add(worker)
+                self._idle.put_nowait(worker)
+    
+    async def spawn_worker(self) -> _Worker:
+        """启动一个新的工作进程（不加入进程池）"""
+        return await asyncio.to_thread(_Worker, self._ctx)
+    
+    async def run(self, job: dict, timeout: float, on_progress=None,
+                  deadline: Optional[float] = None) -> Optional[dict]:
+        """
+        在空闲工作进程中执行任务
+        
+        Args:
+            job: 任务字典
+            timeout: 超时时间（秒），包括等待空闲工作进程的时间
+            on_progress: 进度回调，在等待线程中以部分输出文本调用
+            deadline: 截止时间（time.monotonic()），多个任务共享总时限时使用
             
-            # 重定向输出
-            with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
-                # 执行代码
-                exec(code, safe_globals, local_vars)
+        Returns:
+            结果字典；超时返回 None
+        """
+        await self.start()
+        now = time.monotonic()
+        deadline = now + timeout if deadline is None else min(deadline, now + timeout)
+        worker = await self._acquire(deadline - now)
+        if worker is None:
+            return None
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            self._idle.put_nowait(worker)
+            return None
+        try:
+            result = await asyncio.to_thread(worker.request, job, timeout, on_progress)
+        except (EOFError, OSError) as e:
+            # 工作进程意外退出
+            self._replace(worker)
+            return {"output": f"工作进程异常退出: {type(e).__name__}"}
+        except BaseException:
+            # 等待被取消（如客户端取消请求或超时）：工作进程仍在执行这个任务，杀死并替换
+            self._replace(worker)
+            raise
+        
+        if result is None or result.get("recycle"):
+            self._replace(worker)
+        else:
+            self._idle.put_nowait(worker)
+        return result
+    
+    async def _acquire(self, timeout: float) -> Optional[_Worker]:
+        """等待空闲工作进程，超时返回 None（所有工作进程都在忙或正在替换时不会无限等待）"""
+        getter = asyncio.ensure_future(self._idle.get())
+        try:
+            await asyncio.wait({getter}, timeout=max(0.0, timeout))
+        except BaseException:
+            # 等待被取消：已经取到的工作进程放回队列
+            if getter.done():
+                self._idle.put_nowait(getter.result())
+            else:
+                getter.cancel()
+            raise
+        if getter.done():
+            return getter.result()
+        getter.cancel()
+        return None
+    
+    def _replace(self, worker: _Worker):
+        """杀死工作进程，并在后台启动替代进程"""
+        self._workers.discard(worker)
+        task = asyncio.create_task(self._spawn_replacement(worker))
+        self._replacements.add(task)
+        task.add_done_callback(self._replacements.discard)
+    
+    async def _spawn_replacement(self, old_worker: _Worker):
+        try:
+            await asyncio.to_thread(old_worker.kill)
+        except Exception as e:
+            logger.warning(f"结束工作进程失败: {e}")
+        
+        # 启动失败时按指数退避重试，否则进程池会永久少一个工作进程
+        delay = 1.0
+        while not self._closed:
+            try:
+                worker = await self.spawn_worker()
+            except Exception as e:
+                logger.error(f"启动替代工作进程失败，{delay:g} 秒后重试: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, SPAWN_RETRY_MAX_DELAY)
+                continue
+            if self._closed:
+                await asyncio.to_thread(worker.kill)
+                return
+            self._workers.add(worker)
+            self._idle.put_nowait(worker)
+            return
+    
+    def close(self):
+        """结束全部工作进程"""
+        self._closed = True
+        for task in list(self._replacements):
+            task.cancel()
+        for worker in list(self._workers):
+            worker.kill()
+        self._workers.clear()
+
+
+class _Session:
+    """一个执行会话：独占一个工作进程，命名空间在多次调用间保留"""
+    
+    def __init__(self, session_id: str, worker: _Worker):
+        self.session_id = session_id
+        self.worker = worker
+        self.lock = asyncio.Lock()
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.calls = 0
+        self.memory_bytes: Optional[int] = None
+    
+    def info(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "calls": self.calls,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            "memory_mb": round(self.memory_bytes / (1024 * 1024), 1) if self.memory_bytes else None,
+        }
+
+
+class SessionManager:
+    """
+    执行会话管理器
+    
+    每个会话独占一个工作进程，空闲超时后自动回收；会话数达到上限时回收最久未使用的空闲会话；
+    会话进程内存超过上限时关闭该会话。
+    """
+    
+    def __init__(self, pool: WorkerPool, max_sessions: int, idle_timeout: float, max_memory_bytes: int):
+        self.pool = pool
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_memory_bytes = max_memory_bytes
+        self.sessions: Dict[str, _Session] = {}
+        self._create_lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+    
+    async def execute(self, session_id: str, code: str, timeout: float, limits: dict,
+                      on_progress=None, profile: str = "default") -> str:
+        """在会话中执行代码"""
+        session = await self._get_or_create(session_id)
+        async with session.lock:
+            if self.sessions.get(session_id) is not session:
+                return f"会话 {session_id} 已被关闭，请重试"
             
-            # 获取输出
-            stdout_text = stdout_capture.getvalue()
-            stderr_text = stderr_capture.getvalue()
+            session.last_used = time.monotonic()
+            job = {"op": "exec", "code": code, "limits": limits, "persist": True,
+                   "stream": on_progress is not None, "profile": profile}
+            try:
+                result = await asyncio.to_thread(session.worker.request, job, timeout, on_progress)
+            except (EOFError, OSError) as e:
+                await self._discard(session)
+                return f"会话 {session_id} 的工作进程异常退出（{type(e).__name__}），会话状态已丢失"
+            except BaseException:
+                # 等待被取消：工作进程仍在执行，之后的结果会与下一次调用错位，关闭会话
+                self._drop(session)
+                raise
             
-            result_parts = []
+            session.last_used = time.monotonic()
+            session.calls += 1
             
-            if stdout_text:
-                result_parts.append(f"标准输出:\n{stdout_text}")
+            if result is None:
+                await self._discard(session)
+                return f"执行超时（超过 {timeout} 秒），会话 {session_id} 已关闭，会话状态已丢失"
             
-            if stderr_text:
-                result_parts.append(f"错误输出:\n{stderr_text}")
+            output = result["output"]
+            session.memory_bytes = result.get("memory_bytes")
+            if result.get("recycle"):
+                await self._discard(session)
+                return f"{output}\n\n会话 {session_id} 已因资源超限关闭，会话状态已丢失"
+            if session.memory_bytes and session.memory_bytes > self.max_memory_bytes:
+                await self._discard(session)
+                return (f"{output}\n\n会话 {session_id} 内存占用 {session.memory_bytes // (1024 * 1024)} MB，"
+                        f"超过上限 {self.max_memory_bytes // (1024 * 1024)} MB，会话已关闭")
             
-            # 如果有定义的变量，也显示出来
-            if local_vars:
-                vars_str = "\n".join([f"{k} = {repr(v)}" for k, v in local_vars.items() if not k.startswith('_')])
-                if vars_str:
-                    result_parts.append(f"定义的变量:\n{vars_str}")
+            memory = f"，内存 {session.memory_bytes / (1024 * 1024):.1f} MB" if session.memory_bytes else ""
+            return f"{output}\n\n[会话 {session_id}：第 {session.calls} 次执行{memory}]"
+    
+    async def reset(self, session_id: str) -> str:
+        """清空会话命名空间（保留工作进程）"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return f"会话 {session_id} 不存在"
+        async with session.lock:
+            try:
+                result = await asyncio.to_thread(session.worker.request, {"op": "reset"}, 5)
+            except (EOFError, OSError):
+                result = None
+            if result is None:
+                await self._discard(session)
+                return f"会话 {session_id} 重置失败，会话已关闭"
+            session.memory_bytes = result.get("memory_bytes")
+            session.last_used = time.monotonic()
+            return f"会话 {session_id} 已重置"
+    
+    async def close(self, session_id: str) -> str:
+        """关闭会话"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return f"会话 {session_id} 不存在"
+        await self._discard(session)
+        return f"会话 {session_id} 已关闭"
+    
+    def list(self) -> List[dict]:
+        """列出所有会话"""
+        return [session.info() for session in self.sessions.values()]
+    
+    async def _get_or_create(self, session_id: str) -> _Session:
+        async with self._create_lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                return session
             
-            if not result_parts:
-                return "代码执行成功（无输出）"
+            if len(self.sessions) >= self.max_sessions:
+                idle = [s for s in self.sessions.values() if not s.lock.locked()]
+                if not idle:
+                    raise RuntimeError(f"会话数已达上限 {self.max_sessions}，且所有会话都在执行中")
+                await self._discard(min(idle, key=lambda s: s.last_used))
             
-            return "\n\n".join(result_parts)
+            if self._reaper is None:
+                self._reaper = asyncio.create_task(self._reap_idle())
             
-        except Exception as e:
-            error_msg = f"执行错误:\n{type(e).__name__}: {str(e)}\n\n详细信息:\n{traceback.format_exc()}"
-            return error_msg
+            session = _Session(session_id, await self.pool.spawn_worker())
+            self.sessions[session_id] = session
+            return session
+    
+    async def _discard(self, session: _Session):
+        if self.sessions.get(session.session_id) is session:
+            del self.sessions[session.session_id]
+        await asyncio.to_thread(session.worker.kill)
+    
+    def _drop(self, session: _Session):
+        """立即移除会话，在后台结束其工作进程（用于无法等待的取消路径）"""
+        if self.sessions.get(session.session_id) is session:
+            del self.sessions[session.session_id]
+        asyncio.create_task(asyncio.to_thread(session.worker.kill))
     
-    # 使用线程池执行代码
-    loop = asyncio.get_event_loop()
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    async def _reap_idle(self):
+        """定期回收空闲超时的会话"""
+        while True:
+            await asyncio.sleep(min(30, self.idle_timeout))
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if not session.lock.locked() and now - session.last_used > self.idle_timeout:
+                    await self._discard(session)
+    
+    def close_all(self):
+        """结束全部会话进程"""
+        for session in list(self.sessions.values()):
+            session.worker.kill()
+        self.sessions.clear()
+
+
+# 全局工作进程池和会话管理器
+pool = WorkerPool(POOL_SIZE)
+sessions = SessionManager(pool, MAX_SESSIONS, SESSION_IDLE_TIMEOUT, SESSION_MAX_MEMORY_MB * 1024 * 1024)
+
+
+def resolve_limits(arguments: dict) -> dict:
+    """根据工具参数计算本次执行的资源限制，不低于各项最小值，不超过服务端上限"""
+    def clamp(value, default, minimum, maximum):
         try:
-            result = await asyncio.wait_for(
-                loop.run_in_executor(executor, run_code),
-                timeout=timeout
-            )
-            return result
-        except asyncio.TimeoutError:
-            return f"执行超时（超过 {timeout} 秒）"
+            value = float(value) if value is not None else default
+        except (TypeError, ValueError):
+            value = default
+        if not math.isfinite(value):
+            value = default
+        return min(max(value, minimum), maximum)
+    
+    return {
+        "cpu_seconds": clamp(arguments.get("max_cpu_seconds"), DEFAULT_CPU_SECONDS,
+                             MIN_CPU_SECONDS, MAX_CPU_SECONDS),
+        "memory_bytes": int(clamp(arguments.get("max_memory_mb"), DEFAULT_MEMORY_MB,
+                                  MIN_MEMORY_MB, MAX_MEMORY_MB) * 1024 * 1024),
+        "output_bytes": int(clamp(arguments.get("max_output_bytes"), DEFAULT_OUTPUT_BYTES,
+                                  MIN_OUTPUT_BYTES, MAX_OUTPUT_BYTES)),
+    }
+
+
+def resolve_timeout(value, default: float) -> float:
+    """解析超时参数：不是有效数字时使用默认值，并限制在 [MIN_TIMEOUT_SECONDS, MAX_TIMEOUT_SECONDS] 内"""
+    try:
+        timeout = float(value) if value is not None else default
+    except (TypeError, ValueError):
+        timeout = default
+    if not math.isfinite(timeout):
+        timeout = default
+    return max(MIN_TIMEOUT_SECONDS, min(timeout, MAX_TIMEOUT_SECONDS))
+
+
+def profile_error(profile: str) -> str:
+    """不可用的沙箱配置对应的错误信息"""
+    if profile == "numpy":
+        return "错误: 服务器未安装 numpy，不支持 numpy 配置"
+    return f"错误: 未知的沙箱配置 {profile}"
+
+
+async def execute_code_with_timeout(code: str, timeout: float, limits: dict, on_progress=None,
+                                    profile: str = "default") -> str:
+    """在工作进程中执行代码，超时后强制结束该进程并立即返回"""
+    job = {"op": "exec", "code": code, "limits": limits, "stream": on_progress is not None,
+           "profile": profile}
+    result = await pool.run(job, timeout, on_progress)
+    if result is None:
+        return f"执行超时（超过 {timeout} 秒）"
+    return result["output"]
+
+
+async def parallel_map(source: str, function_name: Optional[str], inputs: list, chunk_size: Optional[int],
+                       timeout: float, limits: dict, profile: str) -> str:
+    """
+    把输入分批分发到进程池并行执行，结果按输入顺序汇总为 JSON
+    
+    每批在一个工作进程中执行，超时的批次会被强制结束，其中的输入标记为错误，
+    其他批次的结果不受影响。
+    """
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    if not chunk_size or chunk_size < 1:
+        # 批数为工作进程数的数倍，慢批次不会拖住整体进度
+        chunk_size = max(1, math.ceil(len(inputs) / (pool.size * 4)))
+    indexed = list(enumerate(inputs))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+    
+    async def run_chunk(items: list) -> List[dict]:
+        job = {"op": "map", "source": source, "function_name": function_name,
+               "items": items, "limits": limits, "profile": profile}
+        result = await pool.run(job, timeout, deadline=deadline)
+        if result is None:
+            return [{"index": index, "error": f"超时（总时限 {timeout} 秒）"} for index, _ in items]
+        if "error" in result:
+            raise ValueError(result["error"])
+        if "items" not in result:
+            # 工作进程异常退出
+            return [{"index": index, "error": result["output"]} for index, _ in items]
+        return result["items"]
+    
+    try:
+        chunk_results = await asyncio.gather(*[run_chunk(items) for items in chunks])
+    except ValueError as e:
+        return f"函数加载失败: {e}"
+    
+    # 放不进输出上限的结果只保留错误标记
+    results = []
+    size = 0
+    for entry in sorted((entry for chunk in chunk_results for entry in chunk), key=lambda e: e["index"]):
+        entry_size = len(json.dumps(entry, ensure_ascii=False))
+        if size + entry_size > limits["output_bytes"]:
+            entry = {"index": entry["index"], "error": f"结果超过 {limits['output_bytes']} 字节输出上限，已省略"}
+        else:
+            size += entry_size
+        results.append(entry)
+    
+    failed = sum(1 for entry in results if "error" in entry)
+    return json.dumps({
+        "count": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "chunks": len(chunks),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "results": results,
+    }, ensure_ascii=False)
+
+
+def progress_reporter():
+    """
+    返回把部分输出作为 MCP 进度通知发送的回调
+    
+    回调在等待工作进程的线程中调用，通知通过事件循环发送；
+    客户端未在请求中提供 progressToken 时返回 None，不推送进度。
+    """
+    try:
+        ctx = app.request_context
+    except LookupError:
+        return None
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+    
+    loop = asyncio.get_running_loop()
+    sent = {"bytes": 0}
+    
+    def report(text: str):
+        # progress 必须递增，使用已推送的字节数
+        sent["bytes"] += len(text.encode("utf-8"))
+        asyncio.run_coroutine_threadsafe(
+            ctx.session.send_progress_notification(token, sent["bytes"], message=text),
+            loop
+        )
+    
+    return report
 
 
 @app.call_tool()
+@spool_large_results
 async def call_tool(name: str, arguments: Any) -> List[TextContent]:
     """执行工具调用"""
     
     if name == "execute_python":
         code = arguments.get("code", "")
-        timeout = arguments.get("timeout", 5)
+        timeout = resolve_timeout(arguments.get("timeout"), 5)
+        limits = resolve_limits(arguments)
+        session_id = arguments.get("session_id")
+        profile = arguments.get("profile") or "default"
         
         if not code.strip():
             return [TextContent(type="text", text="错误: 代码不能为空")]
+        if profile not in SANDBOX_PROFILES:
+            return [TextContent(type="text", text=profile_error(profile))]
+        
+        try:
+            on_progress = progress_reporter()
+            if session_id:
+                result = await sessions.execute(str(session_id), code, timeout, limits, on_progress, profile)
+            else:
+                result = await execute_code_with_timeout(code, timeout, limits, on_progress, profile)
+            return [TextContent(type="text", text=result)]
+        except Exception as e:
+            return [TextContent(type="text", text=f"执行失败: {str(e)}")]
+    
+    elif name == "parallel_map":
+        source = arguments.get("function", "")
+        inputs = arguments.get("inputs")
+        timeout = resolve_timeout(arguments.get("timeout"), 30)
+        profile = arguments.get("profile") or "default"
+        
+        if not source.strip():
+            return [TextContent(type="text", text="错误: 函数源码不能为空")]
+        if not isinstance(inputs, list):
+            return [TextContent(type="text", text="错误: inputs 必须是列表")]
+        if len(inputs) > MAP_MAX_ITEMS:
+            return [TextContent(type="text", text=f"错误: 输入数 {len(inputs)} 超过上限 {MAP_MAX_ITEMS}")]
+        if profile not in SANDBOX_PROFILES:
+            return [TextContent(type="text", text=profile_error(profile))]
         
+        # 每批的 CPU 时间上限与总超时一致
+        limits = resolve_limits(dict(arguments, max_cpu_seconds=timeout))
         try:
-            result = await execute_code_with_timeout(code, timeout)
+            result = await parallel_map(source, arguments.get("function_name"), inputs,
+                                        arguments.get("chunk_size"), timeout, limits, profile)
             return [TextContent(type="text", text=result)]
         except Exception as e:
             return [TextContent(type="text", text=f"执行失败: {str(e)}")]
     
+    elif name == "reset_session":
+        return [TextContent(type="text", text=await sessions.reset(str(arguments.get("session_id", ""))))]
+    
+    elif name == "close_session":
+        return [TextContent(type="text", text=await sessions.close(str(arguments.get("session_id", ""))))]
+    
+    elif name == "list_sessions":
+        session_list = sessions.list()
+        if not session_list:
+            return [TextContent(type="text", text="当前没有执行会话")]
+        lines = [
+            f"{info['session_id']}: 调用 {info['calls']} 次，空闲 {info['idle_seconds']} 秒，"
+            f"内存 {info['memory_mb']} MB"
+            for info in session_list
+        ]
+        return [TextContent(type="text", text=f"执行会话（{len(session_list)}/{MAX_SESSIONS}）:\n" + "\n".join(lines))]
+    
     elif name == "evaluate_expression":
         expression = arguments.get("expression", "")
         
@@ -206,11 +1545,8 @@ async def call_tool(name: str, arguments: Any) -> List[TextContent]:
             return [TextContent(type="text", text="错误: 表达式不能为空")]
         
         try:
-            # 创建安全环境
-            safe_globals = create_safe_globals()
-            
-            # 计算表达式
-            result = eval(expression, safe_globals, {})
+            # 计算表达式（复用编译缓存和沙箱模板）
+            result = eval(code_cache.compile(expression, "eval"), new_sandbox(), {})
             
             return [TextContent(type="text", text=f"表达式: {expression}\n结果: {repr(result)}")]
         except Exception as e:
@@ -223,12 +1559,18 @@ async def call_tool(name: str, arguments: Any) -> List[TextContent]:
 
 async def main():
     """运行服务器"""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    # 在接收请求前预先启动工作进程
+    await pool.start()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        sessions.close_all()
+        pool.close()
 
 
 if __name__ == "__main__":
@@ -7,15 +7,21 @@ API 包 - 包含所有 REST API 和 WebSocket 端点
 - servers: 服务器管理端点
 - tools: 工具查询端点
 - chat: 聊天 WebSocket 端点
+- admin: 运维管理端点
+- results: 暂存大结果的分页读取端点
 """
 
 from .servers import init_router as init_servers_router
 from .tools import init_router as init_tools_router
 from .chat import init_router as init_chat_router
+from .admin import init_router as init_admin_router
+from .results import init_router as init_results_router
 
 __all__ = [
     "init_servers_router",
     "init_tools_router",
-    "init_chat_router"
+    "init_chat_router",
+    "init_admin_router",
+    "init_results_router"
 ]
 
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管理 API 端点
+
+提供排空（drain）、事件循环监控和采样分析等运维操作
+"""
+
+import asyncio
+import logging
+import time
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from drain import DEFAULT_DRAIN_TIMEOUT
+from diagnostics import MAX_PROFILE_SECONDS
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 创建路由器
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+# 全局 DrainController、LoopLagWatchdog 和 SamplingProfiler 实例（将在主应用中注入）
+drain_controller = None
+loop_watchdog = None
+profiler = None
+
+
+def init_router(drain, watchdog, sampling_profiler):
+    """初始化路由器，注入 DrainController、LoopLagWatchdog 和 SamplingProfiler 实例"""
+    global drain_controller, loop_watchdog, profiler
+    drain_controller = drain
+    loop_watchdog = watchdog
+    profiler = sampling_profiler
+    return router
+
+
+def _drain_status():
+    """当前排空状态"""
+    return {
+        "draining": drain_controller.draining,
+        "active_chats": drain_controller.active_chats,
+        "connections": len(drain_controller.connections)
+    }
+
+
+@router.get("/drain")
+async def get_drain_status():
+    """
+    获取排空状态
+    
+    Returns:
+        是否正在排空、进行中的对话数和连接数
+    """
+    return _drain_status()
+
+
+@router.post("/drain")
+async def start_drain(timeout: float = DEFAULT_DRAIN_TIMEOUT, wait: bool = False):
+    """
+    开始排空：停止接收新对话，等待进行中的对话完成后提示客户端重连
+    
+    滚动重启时可在发送 SIGTERM 之前调用（如 Kubernetes preStop 钩子）。
+    
+    Args:
+        timeout: 等待进行中对话完成的截止时间（秒）
+        wait: 是否等待排空完成后再返回
+        
+    Returns:
+        排空状态
+    """
+    logger.info(f"收到排空请求，截止时间 {timeout} 秒")
+    task = asyncio.create_task(drain_controller.drain(timeout))
+    if wait:
+        await task
+    return _drain_status()
+
+
+@router.get("/loop-lag")
+async def get_loop_lag():
+    """
+    获取事件循环延迟统计
+    
+    Returns:
+        阈值、最近一次延迟、最大延迟和卡顿次数
+    """
+    return loop_watchdog.snapshot()
+
+
+@router.post("/profile")
+async def start_profile(seconds: float = 10, interval_ms: float = 5, loop_thread_only: bool = False):
+    """
+    开始采样分析 N 秒（在后台线程中进行，立即返回）
+    
+    采样结束或调用 POST /profile/stop 后，通过 GET /profile/result 下载折叠栈文件。
+    
+    Args:
+        seconds: 采样时长（秒），最长 120 秒
+        interval_ms: 采样间隔（毫秒）
+        loop_thread_only: 只采样事件循环线程
+        
+    Returns:
+        采样状态
+    """
+    if seconds <= 0 or seconds > MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"采样时长必须在 0 到 {MAX_PROFILE_SECONDS} 秒之间")
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="采样间隔不能小于 1 毫秒")
+    
+    try:
+        profiler.start(seconds, interval_ms, loop_thread_only, loop_watchdog.loop_thread_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"开始采样分析 {seconds} 秒，间隔 {interval_ms}ms")
+    return profiler.status()
+
+
+@router.post("/profile/stop")
+async def stop_profile():
+    """
+    提前结束采样分析
+    
+    Returns:
+        采样状态
+    """
+    await asyncio.to_thread(profiler.stop)
+    return profiler.status()
+
+
+@router.get("/profile")
+async def get_profile_status():
+    """
+    获取采样分析状态
+    
+    Returns:
+        是否正在采样、已采样次数和结果是否可下载
+    """
+    return profiler.status()
+
+
+@router.get("/profile/result", response_class=PlainTextResponse)
+async def get_profile_result():
+    """
+    下载最近一次采样的折叠栈文件
+    
+    结果可直接用于 flamegraph.pl 或上传到 speedscope.app 查看火焰图。
+    
+    Returns:
+        折叠栈文本文件
+    """
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="采样正在进行，结束后再下载")
+    if profiler.result is None:
+        raise HTTPException(status_code=404, detail="没有采样结果")
+    
+    filename = f"profile-{time.strftime('%Y%m%d-%H%M%S', time.localtime(profiler.finished_at))}.collapsed"
+    return PlainTextResponse(
+        profiler.result,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -6,45 +6,88 @@
 提供 WebSocket 聊天服务
 """
 
-import json
 import logging
+from typing import Any, Dict, Union
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from drain import ChatConnection
+from serialization import negotiate_serializer
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
 # 创建路由器
 router = APIRouter(tags=["chat"])
 
-# 全局 ChatBot 实例（将在主应用中注入）
+# 全局 ChatBot 和 DrainController 实例（将在主应用中注入）
 chatbot = None
+drain_controller = None
 
 
-def init_router(bot):
-    """初始化路由器，注入 ChatBot 实例"""
-    global chatbot
+def init_router(bot, drain):
+    """初始化路由器，注入 ChatBot 和 DrainController 实例"""
+    global chatbot, drain_controller
     chatbot = bot
+    drain_controller = drain
     return router
 
 
+async def _receive_payload(websocket: WebSocket) -> Union[str, bytes]:
+    """接收一帧数据，同时支持文本帧和二进制帧"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("text") is not None:
+        return message["text"]
+    return message.get("bytes") or b""
+
+
+async def _send_frame(websocket: WebSocket, serializer, frame: Dict[str, Any]):
+    """按协商的序列化器发送一帧数据"""
+    payload = serializer.dumps(frame)
+    if serializer.binary:
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+
+
 @router.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
     """
     WebSocket 聊天端点
     
-    提供实时聊天功能，支持工具调用
+    提供实时聊天功能，支持工具调用。客户端可通过 Sec-WebSocket-Protocol
+    声明 ``msgpack`` 子协议以使用二进制帧，默认使用 JSON 文本帧。
     """
-    await websocket.accept()
-    logger.info("WebSocket 连接已建立")
+    serializer, subprotocol = negotiate_serializer(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=subprotocol)
+    logger.info(f"WebSocket 连接已建立，序列化器: {serializer.name}")
+    
+    connection = ChatConnection(
+        send_frame=lambda frame: _send_frame(websocket, serializer, frame),
+        close=lambda code: websocket.close(code=code)
+    )
     
+    # 排空期间不再接收新连接，直接提示客户端重连
+    if drain_controller.draining:
+        await connection.send_reconnect_and_close()
+        return
+    
+    drain_controller.register(connection)
     try:
         while True:
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            data = await _receive_payload(websocket)
+            
+            # 排空期间不再接收新对话
+            if drain_controller.draining:
+                await connection.send_reconnect_and_close()
+                break
+            
+            message_data = serializer.loads(data)
             user_message = message_data.get("message", "")
             
             if not user_message:
-                await websocket.send_json({
+                await _send_frame(websocket, serializer, {
                     "type": "error",
                     "content": "消息不能为空"
                 })
@@ -52,16 +95,25 @@ async def websocket_chat(websocket: WebSocket):
             
             logger.info(f"收到用户消息: {user_message[:50]}...")
             
-            # 使用 ChatBot 进行对话
-            async for chunk in chatbot.chat(user_message):
-                await websocket.send_json(chunk)
+            # 使用 ChatBot 进行对话，进行中的对话在排空时会等待其完成
+            async with drain_controller.track_chat(connection):
+                async for chunk in chatbot.chat(user_message):
+                    await _send_frame(websocket, serializer, chunk)
+            
+            if drain_controller.draining:
+                await connection.send_reconnect_and_close()
+                break
                 
     except WebSocketDisconnect:
         logger.info("WebSocket 连接断开")
     except Exception as e:
+        if connection.closed:
+            logger.info("WebSocket 连接已因排空关闭")
+            return
         logger.error(f"WebSocket 错误: {e}", exc_info=True)
         try:
-            await websocket.send_json({"type": "error", "content": str(e)})
+            await _send_frame(websocket, serializer, {"type": "error", "content": str(e)})
         except:
             pass
-
+    finally:
+        drain_controller.unregister(connection)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+暂存结果 API 端点
+
+分页读取和删除 MCP 服务器暂存的大结果（见仓库根目录的 mcp_result_spool）
+"""
+
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException
+
+from mcp_manager import mcp_result_spool
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 创建路由器
+router = APIRouter(prefix="/api/results", tags=["results"])
+
+
+def init_router():
+    """初始化路由器"""
+    return router
+
+
+@router.get("/{handle}")
+async def get_result_page(handle: str, offset: int = 0, length: int = 64 * 1024):
+    """
+    分页读取暂存结果
+    
+    Args:
+        handle: 结果句柄
+        offset: 起始字节偏移
+        length: 本页最多字节数（不超过 1MB）
+    
+    Returns:
+        本页内容、总大小和下一页的 offset（没有下一页时为 null）
+    """
+    try:
+        return await asyncio.to_thread(mcp_result_spool.read_page, handle, offset, length)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="结果不存在或已过期")
+
+
+@router.delete("/{handle}")
+async def delete_result(handle: str):
+    """
+    删除暂存结果
+    
+    Returns:
+        操作状态
+    """
+    try:
+        deleted = await asyncio.to_thread(mcp_result_spool.delete, handle)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="结果不存在或已过期")
+    logger.info(f"删除暂存结果: {handle}")
+    return {"status": "success"}
@@ -38,7 +38,8 @@ async def get_servers():
     """
     return {
         "servers": [cfg.dict() for cfg in mcp_manager.configs],
-        "connected": list(mcp_manager.sessions.keys())
+        "connected": list(mcp_manager.sessions.keys()),
+        "dormant": [name for name in mcp_manager.lazy_configs if name not in mcp_manager.sessions]
     }
 
 
@@ -74,7 +75,7 @@ async def delete_server(server_name: str):
         删除结果
     """
     # 如果服务器已连接，先断开
-    if server_name in mcp_manager.sessions:
+    if server_name in mcp_manager.sessions or server_name in mcp_manager.lazy_configs:
         await mcp_manager.disconnect_server(server_name)
     
     # 从配置列表中移除
@@ -40,7 +40,7 @@ async def get_tools():
         server_type = tool_info["server_type"]
         
         # 根据服务器类型处理工具信息
-        if server_type == "stdio":
+        if server_type != "rest":  # stdio 或 inprocess
             tools.append({
                 "key": tool_key,
                 "name": tool.name,
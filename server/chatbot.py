@@ -9,12 +9,13 @@ ChatBot 模块 - 处理 AI 聊天和工具调用逻辑
 - 对话流程管理
 """
 
+import asyncio
 import json
 import os
 import logging
-from typing import List, Dict, AsyncGenerator, Optional, Any, Protocol
-import dashscope
-from dashscope import Generation
+from typing import List, Dict, AsyncGenerator, Optional, Any, Awaitable, Callable, Protocol
+
+from serialization import get_json_serializer
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -28,8 +29,9 @@ class MCPManagerProtocol(Protocol):
         """工具字典"""
         ...
     
-    async def call_tool(self, tool_key: str, arguments: Dict[str, Any]) -> str:
-        """调用工具"""
+    async def call_tool(self, tool_key: str, arguments: Dict[str, Any],
+                        progress_callback: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
+        """调用工具，progress_callback 接收执行过程中的部分输出"""
         ...
 
 
@@ -45,17 +47,25 @@ class ChatBot:
     # 默认最大迭代次数
     DEFAULT_MAX_ITERATIONS = 10
     
-    def __init__(self, mcp_manager: MCPManagerProtocol, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        mcp_manager: MCPManagerProtocol,
+        api_key: Optional[str] = None,
+        llm_call: Optional[Callable[..., Any]] = None
+    ):
         """
         初始化 ChatBot
         
         Args:
             mcp_manager: MCPManager 实例，用于调用工具
             api_key: 通义千问 API Key，如果为 None 则从环境变量读取
+            llm_call: 模型调用函数，签名与 Generation.call 一致，默认使用通义千问
+                      （压测时可替换为假模型）
         """
         self.mcp_manager = mcp_manager
+        self.llm_call = llm_call
+        self.serializer = get_json_serializer()
         self.api_key = api_key or os.getenv("DASHSCOPE_API_KEY", self.DEFAULT_API_KEY)
-        dashscope.api_key = self.api_key
         
         # 系统提示词
         self.system_prompt = (
@@ -66,6 +76,16 @@ class ChatBot:
         
         logger.info("ChatBot 初始化完成")
     
+    def _get_llm_call(self) -> Callable[..., Any]:
+        """获取模型调用函数，首次使用时才导入 dashscope SDK"""
+        if self.llm_call is None:
+            import dashscope
+            from dashscope import Generation
+            
+            dashscope.api_key = self.api_key
+            self.llm_call = Generation.call
+        return self.llm_call
+    
     def _get_tools_for_qwen(self) -> List[Dict[str, Any]]:
         """
         将 MCP 工具转换为通义千问的函数调用格式
@@ -84,8 +104,8 @@ class ChatBot:
                 tool = tool_info["tool"]
                 server_type = tool_info.get("server_type", "stdio")
                 
-                # 处理 stdio 和 rest 两种类型的工具
-                if server_type == "stdio":
+                # MCP 会话的工具（stdio、inprocess）与 rest 工具的结构不同
+                if server_type != "rest":
                     description = getattr(tool, "description", "")
                     parameters = getattr(tool, "inputSchema", {})
                 else:  # rest
@@ -168,6 +188,53 @@ class ChatBot:
             logger.warning(f"获取消息内容失败: {e}")
             return ""
     
+    async def _call_tool_streaming(
+        self,
+        function_name: str,
+        arguments: Dict[str, Any]
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        调用工具，执行过程中逐条产出部分输出
+        
+        Yields:
+            {"type": "tool_progress", ...} 进度消息，最后是 {"type": "tool_result", ...}
+        """
+        progress: asyncio.Queue = asyncio.Queue()
+        call = asyncio.create_task(
+            self.mcp_manager.call_tool(function_name, arguments, progress_callback=progress.put)
+        )
+        
+        try:
+            while not call.done():
+                next_progress = asyncio.ensure_future(progress.get())
+                await asyncio.wait({call, next_progress}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_progress.done():
+                    next_progress.cancel()
+                    break
+                yield {
+                    "type": "tool_progress",
+                    "tool": function_name,
+                    "content": next_progress.result()
+                }
+        finally:
+            # 对话被中断时不再等待工具结果
+            if not call.done():
+                call.cancel()
+        
+        # 工具结束前已到达的进度
+        while not progress.empty():
+            yield {
+                "type": "tool_progress",
+                "tool": function_name,
+                "content": progress.get_nowait()
+            }
+        
+        yield {
+            "type": "tool_result",
+            "tool": function_name,
+            "result": call.result()
+        }
+    
     async def chat(
         self, 
         user_message: str, 
@@ -213,7 +280,7 @@ class ChatBot:
                 logger.debug(f"第 {iteration + 1} 次迭代")
                 
                 # 调用通义千问 API
-                response = Generation.call(
+                response = self._get_llm_call()(
                     model=self.DEFAULT_MODEL,
                     messages=messages,
                     tools=tools if tools else None,
@@ -273,7 +340,7 @@ class ChatBot:
                             # 解析参数
                             try:
                                 if isinstance(arguments_str, str):
-                                    arguments = json.loads(arguments_str)
+                                    arguments = self.serializer.loads(arguments_str)
                                 else:
                                     arguments = arguments_str
                             except json.JSONDecodeError as e:
@@ -294,15 +361,10 @@ class ChatBot:
                                 "arguments": arguments
                             }
                             
-                            # 调用工具
-                            tool_result = await self.mcp_manager.call_tool(function_name, arguments)
-                            
-                            # 发送工具结果
-                            yield {
-                                "type": "tool_result",
-                                "tool": function_name,
-                                "result": tool_result
-                            }
+                            # 调用工具，转发执行过程中的部分输出和最终结果
+                            async for event in self._call_tool_streaming(function_name, arguments):
+                                yield event
+                            tool_result = event["result"]
                             
                             # 添加工具结果到消息历史
                             messages.append({
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+诊断模块 - 事件循环卡顿监控与采样分析器
+
+该模块负责：
+- 持续测量事件循环延迟，超过阈值时记录阻塞事件循环的调用栈
+- 按需对所有线程采样，生成可直接用于 flamegraph.pl / speedscope 的折叠栈
+
+只依赖标准库，可在离线环境中使用。
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 默认卡顿阈值（毫秒）
+DEFAULT_LAG_THRESHOLD_MS = float(os.getenv("MCP_LOOP_LAG_THRESHOLD_MS", "100"))
+
+# 采样分析最长时间（秒）
+MAX_PROFILE_SECONDS = 120
+
+
+class LoopLagWatchdog:
+    """
+    事件循环卡顿监控
+
+    事件循环中的心跳任务定期记录时间戳并测量调度延迟；
+    独立的监控线程发现心跳超时后，立即抓取事件循环线程当前的调用栈，
+    这样记录下来的正是阻塞事件循环的代码。
+    """
+
+    def __init__(self, threshold_ms: float = DEFAULT_LAG_THRESHOLD_MS, interval_ms: float = 50):
+        """
+        Args:
+            threshold_ms: 卡顿阈值（毫秒）
+            interval_ms: 心跳间隔（毫秒）
+        """
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._last_beat = time.monotonic()
+        self.loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """在当前事件循环中启动监控（需在事件循环内调用）"""
+        if self._task is not None:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-lag-heartbeat")
+        self._thread = threading.Thread(target=self._monitor, name="loop-lag-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"事件循环监控已启动，阈值 {self.threshold * 1000:.0f}ms")
+
+    async def stop(self):
+        """停止监控（之后可以再次 start）"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前监控数据"""
+        return {
+            "threshold_ms": round(self.threshold * 1000, 3),
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stalls
+        }
+
+    async def _heartbeat(self):
+        """心跳：测量 sleep 实际唤醒时间与预期时间之差"""
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                logger.warning(f"事件循环延迟 {lag * 1000:.1f}ms（阈值 {self.threshold * 1000:.0f}ms）")
+
+    def _monitor(self):
+        """监控线程：心跳超时时抓取事件循环线程的调用栈，每次卡顿只记录一次"""
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            stalled_for = time.monotonic() - last_beat - self.interval
+            if stalled_for <= self.threshold or reported_beat == last_beat:
+                continue
+
+            reported_beat = last_beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "（无法获取调用栈）"
+            logger.warning(
+                f"事件循环已阻塞 {stalled_for * 1000:.0f}ms，当前调用栈:\n{stack}"
+            )
+
+
+class SamplingProfiler:
+    """
+    基于 sys._current_frames 的采样分析器，输出折叠栈格式
+
+    采样在后台线程中进行：start() 立即返回，到达时长或调用 stop() 后结果保存在 result 中，
+    采样期间不占用事件循环，也不占用 HTTP 请求。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.seconds = 0.0
+        self.interval_ms = 0.0
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        """是否正在采样"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval_ms: float = 5, loop_thread_only: bool = False,
+              loop_thread_id: Optional[int] = None):
+        """
+        在后台线程中开始采样，立即返回
+
+        Args:
+            seconds: 采样时长（秒），最长 MAX_PROFILE_SECONDS
+            interval_ms: 采样间隔（毫秒）
+            loop_thread_only: 只采样事件循环线程
+            loop_thread_id: 事件循环线程 ID
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("已有采样正在进行")
+            self._stop.clear()
+            self.seconds = min(seconds, MAX_PROFILE_SECONDS)
+            self.interval_ms = interval_ms
+            self.samples = 0
+            self.started_at = time.time()
+            self.finished_at = None
+            self.result = None
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(self.seconds, interval_ms / 1000, loop_thread_only, loop_thread_id),
+                name="sampling-profiler",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """提前结束采样并等待结果生成（阻塞调用，应在线程中运行）"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """当前采样状态"""
+        now = self.finished_at or time.time()
+        return {
+            "running": self.running,
+            "seconds": self.seconds,
+            "interval_ms": self.interval_ms,
+            "elapsed_seconds": round(now - self.started_at, 3) if self.started_at else None,
+            "samples": self.samples,
+            "result_ready": self.result is not None
+        }
+
+    def _run(self, seconds: float, interval: float, loop_thread_only: bool, loop_thread_id: Optional[int]):
+        try:
+            self.result = self._sample(seconds, interval, loop_thread_only, loop_thread_id)
+        finally:
+            self.finished_at = time.time()
+
+    def _sample(self, seconds: float, interval: float, loop_thread_only: bool,
+                loop_thread_id: Optional[int]) -> str:
+        stacks: Counter = Counter()
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if loop_thread_only and thread_id != loop_thread_id:
+                    continue
+                stacks[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+            self.samples += 1
+            if self._stop.wait(interval):
+                break
+
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        """把调用栈折叠为一行（根在前）"""
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+排空（drain）模块 - 零停机重启支持
+
+该模块负责：
+- 跟踪 WebSocket 连接和进行中的对话
+- 排空时停止接收新对话，等待进行中的对话在截止时间内完成
+- 向客户端发送重连提示帧并关闭连接
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# WebSocket 关闭码 1012：服务重启
+CLOSE_SERVICE_RESTART = 1012
+
+# 默认排空截止时间（秒）
+DEFAULT_DRAIN_TIMEOUT = float(os.getenv("MCP_DRAIN_TIMEOUT", "30"))
+
+# 客户端重连等待时间（秒）
+RECONNECT_AFTER = 3
+
+
+def reconnect_frame() -> Dict[str, Any]:
+    """重连提示帧"""
+    return {
+        "type": "reconnect",
+        "content": "服务器正在重启，请稍后重新连接",
+        "retry_after": RECONNECT_AFTER
+    }
+
+
+class ChatConnection:
+    """一个 WebSocket 聊天连接"""
+
+    def __init__(self, send_frame: Callable[[Dict[str, Any]], Awaitable[None]],
+                 close: Callable[[int], Awaitable[None]]):
+        """
+        Args:
+            send_frame: 发送一帧数据的协程函数
+            close: 以指定关闭码关闭连接的协程函数
+        """
+        self._send_frame = send_frame
+        self._close = close
+        self.busy = False
+        self.closed = False
+
+    async def send_reconnect_and_close(self):
+        """发送重连提示并关闭连接（重复调用无副作用）"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._send_frame(reconnect_frame())
+            await self._close(CLOSE_SERVICE_RESTART)
+        except Exception as e:
+            logger.debug(f"关闭连接时出错: {e}")
+
+
+class DrainController:
+    """排空控制器"""
+
+    def __init__(self):
+        self.draining = False
+        self.connections: Set[ChatConnection] = set()
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._drain_task: Optional[asyncio.Task] = None
+
+    @property
+    def active_chats(self) -> int:
+        """进行中的对话数"""
+        return self._active
+
+    def register(self, connection: ChatConnection):
+        """登记连接"""
+        self.connections.add(connection)
+
+    def unregister(self, connection: ChatConnection):
+        """注销连接"""
+        self.connections.discard(connection)
+
+    @asynccontextmanager
+    async def track_chat(self, connection: ChatConnection):
+        """标记一次进行中的对话"""
+        connection.busy = True
+        self._active += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            connection.busy = False
+            self._active -= 1
+            if self._active == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: float = DEFAULT_DRAIN_TIMEOUT):
+        """
+        开始排空并等待完成（并发调用共享同一次排空）
+
+        Args:
+            timeout: 等待进行中对话完成的截止时间（秒）
+        """
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain(timeout))
+        await asyncio.shield(self._drain_task)
+
+    async def _drain(self, timeout: float):
+        self.draining = True
+        logger.info(
+            f"开始排空: {len(self.connections)} 个连接，{self._active} 个进行中的对话，"
+            f"截止时间 {timeout} 秒"
+        )
+
+        # 空闲连接立即提示重连；进行中的对话结束后由聊天端点自行关闭
+        await asyncio.gather(*[
+            conn.send_reconnect_and_close() for conn in list(self.connections) if not conn.busy
+        ])
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            logger.info("进行中的对话已全部完成")
+        except asyncio.TimeoutError:
+            logger.warning(f"排空超时，仍有 {self._active} 个对话未完成，强制关闭")
+
+        await asyncio.gather(*[
+            conn.send_reconnect_and_close() for conn in list(self.connections)
+        ])
+        logger.info("排空完成")
@@ -9,21 +9,81 @@ MCP Manager - MCP 服务器管理器
 - 配置文件的加载和保存
 """
 
+import asyncio
+import hashlib
+import importlib
+import importlib.util
 import json
 import logging
-from typing import List, Dict, Optional
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, Dict, Optional
 from pathlib import Path
-from contextlib import AsyncExitStack
-
-import requests
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 
 from models import MCPServerConfig
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 仓库根目录：内置 MCP 服务器和大结果暂存模块所在目录（不在导入路径中）
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# 按文件路径导入模块可能在多个线程中同时进行
+_module_load_lock = threading.Lock()
+
+
+def load_module_from_path(path: Path, name: Optional[str] = None):
+    """
+    按文件路径导入模块，并以模块名登记到 sys.modules（不修改 sys.path）
+    
+    已登记同名模块时直接返回，之后其他代码按模块名导入得到的是同一个模块。
+    
+    Args:
+        path: .py 文件路径
+        name: 模块名，默认为文件名
+    """
+    name = name or path.stem
+    with _module_load_lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.spec_from_file_location(name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"无法从 {path} 导入模块 {name}")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+        return module
+
+
+# 大结果暂存模块与 MCP 服务器共用
+mcp_result_spool = load_module_from_path(ROOT_DIR / "mcp_result_spool.py")
+
+# 工具列表缓存文件（按服务器配置的哈希保存 list_tools 结果）
+TOOL_CACHE_FILE = Path(os.getenv(
+    "MCP_TOOL_CACHE_FILE", str(Path.home() / ".cache" / "mcp-web-server" / "tools.json")
+))
+
+# 工具列表缓存的读-改-写在线程中执行，并发连接时需要串行化
+_tool_cache_lock = threading.Lock()
+
+# 按需启动的服务器空闲多久后关闭（秒），0 表示不关闭
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("MCP_IDLE_TIMEOUT", "600"))
+
+
+def config_hash(config: MCPServerConfig) -> str:
+    """服务器配置的哈希，配置变化后缓存的工具列表自动失效"""
+    data = json.dumps(config.model_dump(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
 
 class MCPManager:
     """MCP 服务器管理器"""
@@ -37,9 +97,15 @@ class MCPManager:
         """
         self.sessions: Dict[str, Dict] = {}
         self.tools: Dict[str, Dict] = {}
-        self.exit_stack = AsyncExitStack()
         self.configs: List[MCPServerConfig] = []
         self.config_file = config_file or Path("../mcp_servers_config.json")
+        # 按需启动的服务器：工具始终可见，首次调用时才启动进程，空闲后关闭
+        self.lazy_configs: Dict[str, MCPServerConfig] = {}
+        self.last_used: Dict[str, float] = {}
+        self.idle_timeout = DEFAULT_IDLE_TIMEOUT
+        self._inflight: Dict[str, int] = {}
+        self._spawn_locks: Dict[str, asyncio.Lock] = {}
+        self._reaper_task: Optional[asyncio.Task] = None
         self.load_configs()
         logger.info("MCPManager 初始化完成")
     
@@ -72,7 +138,7 @@ class MCPManager:
     
     async def connect_to_server(self, config: MCPServerConfig):
         """
-        连接到 MCP 服务器（支持 stdio 和 REST API）
+        连接到 MCP 服务器（支持 stdio、进程内和 REST API）
         
         Args:
             config: 服务器配置
@@ -82,11 +148,143 @@ class MCPManager:
         """
         if config.type == "rest":
             return await self._connect_rest_server(config)
+        elif config.type == "inprocess":
+            result = await self._connect_inprocess_server(config)
         else:
-            return await self._connect_stdio_server(config)
+            result = await self._connect_stdio_server(config)
+        self.last_used[config.name] = time.monotonic()
+        await asyncio.to_thread(self._save_tool_cache, config)
+        return result
+    
+    def _load_tool_cache(self) -> Dict[str, Dict]:
+        try:
+            with open(TOOL_CACHE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_tool_cache(self, config: MCPServerConfig):
+        """
+        保存服务器的工具列表，下次启动时无需启动服务器即可提供这些工具
+        
+        配置哈希和工具列表都与缓存一致时不重写缓存文件。
+        """
+        prefix = f"{config.name}:"
+        tools = [
+            info["tool"].model_dump(mode="json", exclude_none=True)
+            for key, info in self.tools.items() if key.startswith(prefix)
+        ]
+        cache_key = config_hash(config)
+        with _tool_cache_lock:
+            cache = self._load_tool_cache()
+            cached = cache.get(cache_key)
+            if cached is not None and cached.get("server") == config.name and cached.get("tools") == tools:
+                return
+            # 同名服务器只保留当前配置的条目
+            cache = {key: entry for key, entry in cache.items() if entry.get("server") != config.name}
+            cache[cache_key] = {"server": config.name, "saved_at": time.time(), "tools": tools}
+            try:
+                TOOL_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+                # 临时文件名唯一，多个进程同时保存时不会互相覆盖
+                fd, temp_file = tempfile.mkstemp(dir=TOOL_CACHE_FILE.parent, prefix=".tools.", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(cache, f, ensure_ascii=False)
+                    os.replace(temp_file, TOOL_CACHE_FILE)
+                except BaseException:
+                    os.unlink(temp_file)
+                    raise
+            except OSError as e:
+                logger.warning(f"保存工具列表缓存失败: {e}")
+    
+    async def enable_lazy(self, config: MCPServerConfig) -> Dict:
+        """
+        以按需启动方式提供服务器的工具
+        
+        有与当前配置匹配的工具列表缓存时直接登记缓存的工具，不启动服务器；
+        没有缓存时先连接一次获取工具列表（之后空闲时会被关闭）。
+        
+        Args:
+            config: 服务器配置（stdio 或 inprocess）
+            
+        Returns:
+            结果字典，status 为 dormant（未启动）或 success（已连接）
+        """
+        if config.type == "rest":
+            return await self.connect_to_server(config)
+        
+        self.lazy_configs[config.name] = config
+        entry = (await asyncio.to_thread(self._load_tool_cache)).get(config_hash(config))
+        if entry is None:
+            logger.info(f"服务器 {config.name} 没有工具列表缓存，先连接一次")
+            return await self.connect_to_server(config)
+        
+        from mcp.types import Tool
+        
+        for tool_data in entry["tools"]:
+            tool = Tool(**tool_data)
+            self.tools[f"{config.name}:{tool.name}"] = {
+                "server": config.name,
+                "server_type": config.type,
+                "tool": tool
+            }
+        logger.info(f"服务器 {config.name} 按需启动，已登记缓存的 {len(entry['tools'])} 个工具")
+        return {"status": "dormant", "tools": [t["name"] for t in entry["tools"]]}
+    
+    async def _ensure_session(self, server_name: str):
+        """按需启动的服务器在首次调用时启动（并发调用只启动一次）"""
+        lock = self._spawn_locks.setdefault(server_name, asyncio.Lock())
+        async with lock:
+            if server_name in self.sessions:
+                return
+            config = self.lazy_configs.get(server_name)
+            if config is None:
+                raise Exception(f"服务器 {server_name} 未连接")
+            logger.info(f"按需启动服务器: {server_name}")
+            await self.connect_to_server(config)
+    
+    def start_idle_reaper(self):
+        """启动空闲服务器回收任务（需在事件循环内调用）"""
+        if self._reaper_task is None and self.idle_timeout > 0:
+            self._reaper_task = asyncio.create_task(self._reap_idle(), name="mcp-idle-reaper")
+    
+    async def _reap_idle(self):
+        """定期关闭空闲超时的按需启动服务器，其工具仍保留，下次调用时重新启动"""
+        interval = min(30.0, max(1.0, self.idle_timeout / 2))
+        while True:
+            await asyncio.sleep(interval)
+            for name in [n for n in list(self.sessions) if n in self.lazy_configs and self._is_idle(n)]:
+                try:
+                    await self._close_if_idle(name)
+                except Exception as e:
+                    logger.error(f"关闭空闲服务器 {name} 失败: {e}")
+    
+    def _is_idle(self, server_name: str) -> bool:
+        """没有进行中的调用且最近一次使用已超过空闲超时"""
+        if self._inflight.get(server_name):
+            return False
+        now = time.monotonic()
+        return now - self.last_used.get(server_name, now) > self.idle_timeout
+    
+    async def _close_if_idle(self, server_name: str):
+        """
+        持有启动锁关闭空闲服务器
+        
+        等锁期间可能有新的调用开始，因此拿到锁后重新检查；检查与 _close_session
+        移除会话之间没有 await，之后到达的调用会看到会话已关闭，在启动锁上等待关闭完成后重新启动。
+        """
+        lock = self._spawn_locks.setdefault(server_name, asyncio.Lock())
+        async with lock:
+            if server_name not in self.sessions or not self._is_idle(server_name):
+                return
+            logger.info(f"服务器 {server_name} 空闲超过 {self.idle_timeout:.0f} 秒，关闭进程")
+            await self._close_session(server_name)
     
     async def _connect_stdio_server(self, config: MCPServerConfig):
         """连接到 stdio 协议的 MCP 服务器"""
+        # 延迟导入 MCP SDK，避免拖慢 Web 服务器启动
+        from mcp import StdioServerParameters
+        
         logger.info(f"连接 stdio 服务器: {config.name}")
         
         # 调整命令路径（如果是相对路径）
@@ -100,45 +298,164 @@ class MCPManager:
             else:
                 args.append(arg)
         
+        # 把暂存目录传给子进程，保证两端使用同一个目录
+        env = dict(config.env or {})
+        env.setdefault(mcp_result_spool.SPOOL_DIR_ENV, str(mcp_result_spool.SPOOL_DIR))
+        
         server_params = StdioServerParameters(
             command=config.command,
             args=args,
-            env=config.env
+            env=env
         )
         
-        stdio_transport = await self.exit_stack.enter_async_context(
-            stdio_client(server_params)
-        )
+        @asynccontextmanager
+        async def open_session():
+            from mcp import ClientSession
+            from mcp.client.stdio import stdio_client
+            
+            async with stdio_client(server_params) as (stdio, write):
+                async with ClientSession(stdio, write) as session:
+                    await session.initialize()
+                    yield session
         
-        stdio, write = stdio_transport
-        session = await self.exit_stack.enter_async_context(
-            ClientSession(stdio, write)
-        )
+        return await self._start_session(config.name, "stdio", open_session)
+    
+    async def _connect_inprocess_server(self, config: MCPServerConfig):
+        """
+        连接到进程内的 MCP 服务器
+        
+        导入服务器模块并通过内存流连接其 app，工具调用不经过子进程和 stdio 管道。
+        服务器的处理函数运行在 Web 服务器的事件循环中，只适用于耗时操作都放到线程中
+        执行、不阻塞事件循环的纯 Python 服务器；需要进程隔离的服务器（如 Python 执行器）
+        应继续使用 stdio。没有管道需要保护，大结果不再写入暂存目录。
+        """
+        from mcp.shared.memory import create_connected_server_and_client_session
+        
+        logger.info(f"连接进程内服务器: {config.name}（模块 {config.module}）")
+        module = await asyncio.to_thread(self._import_server_module, config.module)
+        server_app = getattr(module, "app", None)
+        if server_app is None:
+            raise Exception(f"模块 {config.module} 中没有 MCP 服务器实例 app")
+        mcp_result_spool.disable()
+        
+        def open_session():
+            return create_connected_server_and_client_session(server_app)
+        
+        return await self._start_session(config.name, "inprocess", open_session)
+    
+    @staticmethod
+    def _import_server_module(module: Optional[str]):
+        """
+        导入服务器模块
         
-        await session.initialize()
+        Args:
+            module: 模块名（如 mcp_server_calc）或 .py 文件路径（相对路径按当前目录和上级目录查找）
+        
+        文件按路径导入并以文件名作为模块名登记，不修改 sys.path；
+        不在导入路径中的模块名按仓库根目录中的同名文件导入。
+        """
+        if not module:
+            raise Exception("进程内服务器需要配置 module")
+        if module.endswith(".py") or "/" in module or "\\" in module:
+            path = Path(module)
+            if not path.exists() and Path(f"../{module}").exists():
+                path = Path(f"../{module}")
+            return load_module_from_path(path.resolve())
+        if module not in sys.modules and importlib.util.find_spec(module) is None \
+                and (ROOT_DIR / f"{module}.py").exists():
+            return load_module_from_path(ROOT_DIR / f"{module}.py")
+        return importlib.import_module(module)
+    
+    async def _start_session(self, server_name: str, session_type: str, open_session):
+        """
+        启动会话并登记服务器的工具
+        
+        Args:
+            server_name: 服务器名称
+            session_type: 会话类型（stdio 或 inprocess）
+            open_session: 返回异步上下文管理器的函数，进入后得到已初始化的 ClientSession
+        """
+        # 每个服务器的会话由独立的后台任务持有，便于单独关闭和并行关闭
+        ready = asyncio.get_running_loop().create_future()
+        stop = asyncio.Event()
+        task = asyncio.create_task(
+            self._hold_session(server_name, open_session, ready, stop),
+            name=f"mcp-session-{server_name}"
+        )
+        session = await ready
         
-        # 获取服务器的工具列表
-        tools_list = await session.list_tools()
+        try:
+            tools_list = await session.list_tools()
+        except Exception:
+            stop.set()
+            await task
+            raise
         
         # 存储会话和工具
-        self.sessions[config.name] = {
-            "type": "stdio",
-            "session": session
+        self.sessions[server_name] = {
+            "type": session_type,
+            "session": session,
+            "stop": stop,
+            "task": task
         }
         
+        # 替换之前登记的工具（可能来自已过期的工具列表缓存）
+        for tool_key in [k for k in self.tools if k.startswith(f"{server_name}:")]:
+            del self.tools[tool_key]
+        
         for tool in tools_list.tools:
-            tool_key = f"{config.name}:{tool.name}"
+            tool_key = f"{server_name}:{tool.name}"
             self.tools[tool_key] = {
-                "server": config.name,
-                "server_type": "stdio",
+                "server": server_name,
+                "server_type": session_type,
                 "tool": tool
             }
         
-        logger.info(f"成功连接 {config.name}，发现 {len(tools_list.tools)} 个工具")
+        logger.info(f"成功连接 {server_name}，发现 {len(tools_list.tools)} 个工具")
         return {"status": "success", "tools": [t.name for t in tools_list.tools]}
     
+    async def _hold_session(self, server_name: str, open_session, ready: asyncio.Future,
+                            stop: asyncio.Event):
+        """
+        在同一个任务中进入和退出客户端会话上下文，直到收到停止信号
+        
+        Args:
+            server_name: 服务器名称
+            open_session: 返回会话上下文管理器的函数
+            ready: 会话初始化完成后写入 ClientSession
+            stop: 设置后关闭会话（stdio 服务器的进程随之结束）
+        """
+        try:
+            async with open_session() as session:
+                ready.set_result(session)
+                await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.error(f"服务器 {server_name} 会话异常结束: {e}")
+        finally:
+            if not ready.done():
+                ready.set_exception(RuntimeError(f"服务器 {server_name} 会话未能建立"))
+    
+    async def _close_session(self, server_name: str, timeout: float = 10):
+        """关闭服务器会话，stdio 服务器会等待其进程退出"""
+        session_info = self.sessions.pop(server_name, None)
+        if not session_info or session_info["type"] == "rest":
+            return
+        
+        session_info["stop"].set()
+        try:
+            await asyncio.wait_for(session_info["task"], timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"关闭服务器 {server_name} 超时")
+        except Exception as e:
+            logger.warning(f"关闭服务器 {server_name} 时出错: {e}")
+    
     async def _connect_rest_server(self, config: MCPServerConfig):
         """连接到 REST API 的 MCP 服务器"""
+        import requests
+        
         logger.info(f"连接 REST API 服务器: {config.name}")
         base_url = config.url.rstrip('/')
         
@@ -182,25 +499,28 @@ class MCPManager:
         Returns:
             断开结果字典
         """
-        if server_name in self.sessions:
-            # 移除相关工具
+        if server_name in self.sessions or server_name in self.lazy_configs:
+            # 移除相关工具，不再按需启动
             tools_to_remove = [k for k in self.tools.keys() if k.startswith(f"{server_name}:")]
             for tool_key in tools_to_remove:
                 del self.tools[tool_key]
+            self.lazy_configs.pop(server_name, None)
             
-            # 移除会话
-            del self.sessions[server_name]
+            # 关闭会话
+            await self._close_session(server_name)
             logger.info(f"断开服务器连接: {server_name}")
             return {"status": "success"}
         return {"status": "error", "message": "服务器未连接"}
     
-    async def call_tool(self, tool_key: str, arguments: Dict) -> str:
+    async def call_tool(self, tool_key: str, arguments: Dict,
+                        progress_callback: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
         """
-        调用 MCP 工具（支持 stdio 和 REST API）
+        调用 MCP 工具（支持 stdio、进程内和 REST API）
         
         Args:
             tool_key: 工具键（格式：server:tool）
             arguments: 工具参数
+            progress_callback: 进度回调，以工具执行过程中的部分输出调用（REST 工具不支持）
             
         Returns:
             工具执行结果
@@ -211,22 +531,53 @@ class MCPManager:
         tool_info = self.tools[tool_key]
         server_type = tool_info["server_type"]
         
-        if server_type == "stdio":
-            return await self._call_stdio_tool(tool_info, arguments)
-        else:  # rest
+        if server_type == "rest":
             return await self._call_rest_tool(tool_info, arguments)
+        
+        # stdio 或 inprocess，均为 MCP 会话；按需启动的服务器在此启动
+        server_name = tool_info["server"]
+        if server_name not in self.sessions:
+            try:
+                await self._ensure_session(server_name)
+            except Exception as e:
+                logger.error(f"启动服务器 {server_name} 失败: {e}")
+                return f"错误: 启动服务器 {server_name} 失败: {str(e)}"
+            tool_info = self.tools.get(tool_key)
+            if tool_info is None:
+                return f"错误: 工具 {tool_key} 不存在"
+        
+        self._inflight[server_name] = self._inflight.get(server_name, 0) + 1
+        try:
+            return await self._call_stdio_tool(tool_info, arguments, progress_callback)
+        finally:
+            self._inflight[server_name] -= 1
+            self.last_used[server_name] = time.monotonic()
     
-    async def _call_stdio_tool(self, tool_info: Dict, arguments: Dict) -> str:
-        """调用 stdio 类型的工具"""
+    async def _call_stdio_tool(self, tool_info: Dict, arguments: Dict,
+                               progress_callback: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
+        """通过 MCP 会话调用工具（stdio 和进程内服务器）"""
         server_name = tool_info["server"]
         tool_name = tool_info["tool"].name
         session_info = self.sessions[server_name]
         session = session_info["session"]
         
+        on_progress = None
+        if progress_callback is not None:
+            async def on_progress(progress: float, total: Optional[float], message: Optional[str]):
+                # 服务器通过进度通知的 message 推送部分输出
+                if message:
+                    await progress_callback(message)
+        
         try:
-            result = await session.call_tool(tool_name, arguments)
+            result = await session.call_tool(tool_name, arguments, progress_callback=on_progress)
             if result.content:
-                return "\n".join([item.text for item in result.content if hasattr(item, 'text')])
+                texts = [item.text for item in result.content if hasattr(item, 'text')]
+                # 大结果已由服务器写入暂存目录，对话中只保留预览和句柄
+                marker = mcp_result_spool.parse_marker(texts[0]) if len(texts) == 1 else None
+                if marker is not None:
+                    logger.info(f"工具 {tool_name} 的结果已暂存: {marker['handle']}（{marker.get('size')} 字节）")
+                    return mcp_result_spool.describe(marker)
+                return "\n".join(texts)
             return "工具执行成功，但没有返回内容"
         except Exception as e:
             logger.error(f"工具调用错误: {e}")
@@ -234,6 +585,8 @@ class MCPManager:
     
     async def _call_rest_tool(self, tool_info: Dict, arguments: Dict) -> str:
         """调用 REST API 类型的工具"""
+        import requests
+        
         base_url = tool_info["base_url"]
         tool_name = tool_info["tool"]["name"]
         
@@ -260,7 +613,12 @@ class MCPManager:
             return f"REST API 调用错误: {str(e)}"
     
     async def cleanup(self):
-        """清理资源"""
-        await self.exit_stack.aclose()
+        """清理资源，并行关闭所有服务器会话"""
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        await asyncio.gather(*[
+            self._close_session(server_name) for server_name in list(self.sessions)
+        ])
         logger.info("MCPManager 资源已清理")
 
@@ -12,21 +12,39 @@ MCP Web Server - 主应用入口
 
 import sys
 import io
+import asyncio
 import logging
 from pathlib import Path
+from typing import Optional
+
+from startup import StartupTimer, StartupState
+
+# 启动计时从导入第三方依赖之前开始
+startup_timer = StartupTimer()
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import uvicorn
 
-from mcp_manager import MCPManager
-from chatbot import ChatBot
+startup_timer.mark("import_fastapi")
+
+from serialization import get_response_class
+from drain import DrainController, DEFAULT_DRAIN_TIMEOUT
+from diagnostics import LoopLagWatchdog, SamplingProfiler
 from api import (
+    servers as servers_api,
+    tools as tools_api,
+    chat as chat_api,
     init_servers_router,
     init_tools_router,
-    init_chat_router
+    init_chat_router,
+    init_admin_router,
+    init_results_router
 )
 
+startup_timer.mark("import_app_modules")
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -42,7 +60,8 @@ if sys.platform == 'win32':
 app = FastAPI(
     title="MCP Web API",
     description="MCP 服务器管理和聊天 API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=get_response_class()
 )
 
 # 配置 CORS - 允许 React 开发服务器访问
@@ -59,14 +78,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 全局管理器实例
-mcp_manager = MCPManager()
-chatbot = ChatBot(mcp_manager)
+startup_timer.mark("create_app")
+
+# 全局管理器实例；MCPManager（读取配置文件）和 ChatBot 在启动钩子中通过 init_managers() 创建
+mcp_manager = None
+chatbot = None
+startup_state = StartupState(startup_timer)
+drain_controller = DrainController()
+loop_watchdog = LoopLagWatchdog()
+profiler = SamplingProfiler()
+
+startup_timer.mark("construct_managers")
 
-# 注册路由
-app.include_router(init_servers_router(mcp_manager))
-app.include_router(init_tools_router(mcp_manager))
-app.include_router(init_chat_router(chatbot))
+# 注册路由（依赖 MCPManager 和 ChatBot 的路由在 init_managers() 中注入实例）
+app.include_router(servers_api.router)
+app.include_router(tools_api.router)
+app.include_router(chat_api.router)
+app.include_router(init_admin_router(drain_controller, loop_watchdog, profiler))
+app.include_router(init_results_router())
+
+startup_timer.mark("register_routers")
+
+
+def init_managers():
+    """
+    创建 MCPManager 和 ChatBot 并注入路由（重复调用返回已创建的实例）
+    
+    模块和配置文件在这里才加载，导入本模块不会读取配置或构造聊天客户端。
+    """
+    global mcp_manager, chatbot
+    if mcp_manager is None:
+        from mcp_manager import MCPManager
+        from chatbot import ChatBot
+        
+        mcp_manager = MCPManager()
+        chatbot = ChatBot(mcp_manager)
+        init_servers_router(mcp_manager)
+        init_tools_router(mcp_manager)
+        init_chat_router(chatbot, drain_controller)
+        startup_timer.mark("init_managers")
+    return mcp_manager, chatbot
 
 
 @app.get("/")
@@ -80,14 +131,80 @@ async def root():
     }
 
 
+@app.get("/healthz")
+async def healthz():
+    """存活检查：进程能够响应请求即为存活"""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """就绪检查：后台初始化（SDK 预热、自动连接服务器）完成后才就绪，排空期间不就绪"""
+    if drain_controller.draining:
+        status = "draining"
+    else:
+        status = "ready" if startup_state.ready else "starting"
+    body = {
+        "status": status,
+        "connected": list(mcp_manager.sessions.keys()) if mcp_manager is not None else [],
+        "errors": startup_state.errors
+    }
+    return JSONResponse(body, status_code=200 if status == "ready" else 503)
+
+
+@app.on_event("startup")
+async def startup_event():
+    """应用启动：创建管理器实例后只启动后台任务，保证端口尽快开放"""
+    init_managers()
+    loop_watchdog.start()
+    mcp_manager.start_idle_reaper()
+    startup_state.start(mcp_manager)
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
-    """应用关闭时清理资源"""
+    """应用关闭时先排空进行中的对话，再并行关闭 MCP 会话"""
     logger.info("应用正在关闭，清理资源...")
-    await mcp_manager.cleanup()
+    await drain_controller.drain(DEFAULT_DRAIN_TIMEOUT)
+    if mcp_manager is not None:
+        await mcp_manager.cleanup()
+    await loop_watchdog.stop()
     logger.info("资源清理完成")
 
 
+class DrainingServer(uvicorn.Server):
+    """收到退出信号时先排空再停止的 uvicorn 服务器，第二次信号立即退出"""
+    
+    def __init__(self, config: uvicorn.Config):
+        super().__init__(config)
+        self._drain_requested = False
+        self._drain_task: Optional[asyncio.Task] = None
+    
+    def handle_exit(self, sig, frame):
+        if self._drain_requested:
+            return super().handle_exit(sig, frame)
+        
+        # 信号处理函数在运行事件循环的主线程中执行；事件循环尚未运行时直接退出
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return super().handle_exit(sig, frame)
+        
+        self._drain_requested = True
+        logger.info("收到退出信号，开始排空（再次发送信号可立即退出）")
+        # 信号可能打断事件循环内部的任何位置，通过 call_soon_threadsafe 回到事件循环中创建任务
+        loop.call_soon_threadsafe(self._start_drain, sig, frame)
+    
+    def _start_drain(self, sig, frame):
+        self._drain_task = asyncio.create_task(self._drain_then_exit(sig, frame))
+    
+    async def _drain_then_exit(self, sig, frame):
+        try:
+            await drain_controller.drain(DEFAULT_DRAIN_TIMEOUT)
+        finally:
+            super().handle_exit(sig, frame)
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("MCP Web API Server 启动中...")
@@ -97,4 +214,5 @@ if __name__ == "__main__":
     print(f"WebSocket: ws://localhost:8000/ws/chat")
     print("\n按 Ctrl+C 停止服务器\n")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    server = DrainingServer(uvicorn.Config(app, host="0.0.0.0", port=8000, log_level="info"))
+    server.run()
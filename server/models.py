@@ -11,10 +11,11 @@ from pydantic import BaseModel
 class MCPServerConfig(BaseModel):
     """MCP 服务器配置"""
     name: str
-    type: str = "stdio"  # "stdio" 或 "rest"
+    type: str = "stdio"  # "stdio"、"inprocess" 或 "rest"
     command: Optional[str] = None  # stdio 类型需要
     args: Optional[List[str]] = None  # stdio 类型需要
     url: Optional[str] = None  # rest 类型需要
+    module: Optional[str] = None  # inprocess 类型需要：模块名或 .py 文件路径
     env: Optional[Dict[str, str]] = None
 
 
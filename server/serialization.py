@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+序列化模块 - 可插拔的 JSON / orjson / msgpack 序列化层
+
+该模块负责：
+- 为 REST 响应和 WebSocket 帧提供统一的序列化接口
+- 安装了 orjson 时自动启用快速路径，否则回退到标准库 json
+- 与客户端协商 WebSocket 子协议（可选 msgpack 二进制帧）
+
+默认仍然使用 JSON 文本帧，只有客户端在握手时声明支持
+``msgpack`` 子协议且服务端安装了 msgpack 时才会切换为二进制帧。
+"""
+
+import json
+import logging
+from typing import Any, Iterable, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# WebSocket 子协议名称
+SUBPROTOCOL_JSON = "json"
+SUBPROTOCOL_MSGPACK = "msgpack"
+
+
+class JSONSerializer:
+    """标准库 json 序列化器（文本帧）"""
+
+    name = "json"
+    binary = False
+
+    def dumps(self, obj: Any) -> str:
+        """序列化为紧凑的 JSON 文本"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """从 JSON 文本反序列化"""
+        return json.loads(data)
+
+
+class OrjsonSerializer(JSONSerializer):
+    """orjson 序列化器（文本帧，与 JSON 线格式完全兼容）"""
+
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # orjson 不支持的类型（如超过 64 位的整数）回退到标准库
+            return super().dumps(obj)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackSerializer:
+    """msgpack 序列化器（二进制帧）"""
+
+    name = "msgpack"
+    binary = True
+
+    def dumps(self, obj: Any) -> bytes:
+        """序列化为 msgpack 二进制"""
+        return msgpack.packb(obj, use_bin_type=True, default=str)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """从 msgpack 二进制反序列化，文本帧按 JSON 处理"""
+        if isinstance(data, str):
+            return json.loads(data)
+        return msgpack.unpackb(data, raw=False)
+
+
+def get_json_serializer() -> JSONSerializer:
+    """获取当前环境下最快的 JSON 文本序列化器"""
+    return _JSON_SERIALIZER
+
+
+def negotiate_serializer(
+    offered: Iterable[str]
+) -> Tuple[Union[JSONSerializer, MsgpackSerializer], Optional[str]]:
+    """
+    根据客户端声明的 WebSocket 子协议选择序列化器
+
+    Args:
+        offered: 客户端在 Sec-WebSocket-Protocol 中声明的子协议列表
+
+    Returns:
+        (序列化器, 接受的子协议名称)；未协商任何子协议时名称为 None
+    """
+    for protocol in offered:
+        if protocol == SUBPROTOCOL_MSGPACK and msgpack is not None:
+            return _MSGPACK_SERIALIZER, SUBPROTOCOL_MSGPACK
+        if protocol == SUBPROTOCOL_JSON:
+            return _JSON_SERIALIZER, SUBPROTOCOL_JSON
+    return _JSON_SERIALIZER, None
+
+
+def get_response_class():
+    """获取 FastAPI 默认响应类，安装了 orjson 时使用 ORJSONResponse"""
+    from fastapi.responses import JSONResponse, ORJSONResponse
+
+    return ORJSONResponse if orjson is not None else JSONResponse
+
+
+_JSON_SERIALIZER = OrjsonSerializer() if orjson is not None else JSONSerializer()
+_MSGPACK_SERIALIZER = MsgpackSerializer() if msgpack is not None else None
+
+logger.debug(f"JSON 序列化器: {_JSON_SERIALIZER.name}，msgpack 可用: {msgpack is not None}")
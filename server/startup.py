@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动管理模块 - 启动阶段计时与后台就绪流程
+
+该模块负责：
+- 记录导入和启动各阶段耗时，便于发现启动回归
+- 在端口开放后于后台预热重量级 SDK 并自动连接 MCP 服务器
+- 区分存活（liveness）与就绪（readiness）状态
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 后台预热的重量级模块（首次使用时才需要，提前在线程中导入）
+WARMUP_MODULES = ["dashscope", "mcp", "mcp.client.stdio", "requests"]
+
+
+class StartupTimer:
+    """按阶段记录启动耗时"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._last = self.started_at
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> float:
+        """记录从上一个阶段结束到现在的耗时（毫秒）"""
+        now = time.perf_counter()
+        elapsed = (now - self._last) * 1000
+        self._last = now
+        self.phases.append((phase, elapsed))
+        return elapsed
+
+    @property
+    def total_ms(self) -> float:
+        """从计时开始到最后一个阶段的总耗时（毫秒）"""
+        return (self._last - self.started_at) * 1000
+
+    def report(self, title: str):
+        """输出各阶段耗时"""
+        breakdown = ", ".join(f"{name}={ms:.1f}ms" for name, ms in self.phases)
+        logger.info(f"{title}: 总计 {self.total_ms:.1f}ms ({breakdown})")
+
+
+class StartupState:
+    """启动状态：存活即进程可服务，就绪则表示后台初始化已完成"""
+
+    def __init__(self, timer: StartupTimer):
+        self.timer = timer
+        self.ready = False
+        self.errors: Dict[str, str] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, mcp_manager):
+        """在事件循环中启动后台初始化任务（不阻塞端口开放）"""
+        self.timer.mark("startup_event")
+        self.timer.report("服务启动")
+        self.task = asyncio.create_task(self._bring_up(mcp_manager))
+
+    async def _bring_up(self, mcp_manager):
+        """后台预热 SDK 并自动连接服务器"""
+        timer = StartupTimer()
+
+        # 在同一个线程中依次导入：并发导入同一个包（如 mcp 和 mcp.client.stdio）会互相看到未初始化完的模块
+        await asyncio.to_thread(self._warm_imports, WARMUP_MODULES)
+        timer.mark("warmup_imports")
+
+        lazy_names = self._server_names(mcp_manager, "MCP_LAZY")
+        names = self._server_names(mcp_manager, "MCP_AUTOCONNECT")
+        # 按需启动的服务器只登记缓存的工具，首次调用时才启动进程
+        lazy_configs = [cfg for cfg in mcp_manager.configs if cfg.name in lazy_names]
+        configs = [cfg for cfg in mcp_manager.configs if cfg.name in names and cfg.name not in lazy_names]
+        results = await asyncio.gather(
+            *[mcp_manager.connect_to_server(cfg) for cfg in configs],
+            *[mcp_manager.enable_lazy(cfg) for cfg in lazy_configs],
+            return_exceptions=True
+        )
+        for config, result in zip(configs + lazy_configs, results):
+            if isinstance(result, BaseException):
+                self.errors[config.name] = str(result)
+                logger.error(f"自动连接服务器 {config.name} 失败: {result}")
+        timer.mark(f"autoconnect({len(configs)}+{len(lazy_configs)} lazy)")
+
+        self.ready = True
+        timer.report("后台初始化完成")
+
+    def _warm_imports(self, module_names: List[str]):
+        """依次导入模块，失败时仅记录日志（首次使用时会再次报错）"""
+        for module_name in module_names:
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                logger.warning(f"预热导入 {module_name} 失败: {e}")
+
+    @staticmethod
+    def _server_names(mcp_manager, variable: str) -> List[str]:
+        """
+        从环境变量读取服务器名称
+
+        MCP_AUTOCONNECT（自动连接）和 MCP_LAZY（按需启动）均为逗号分隔的服务器名称，
+        "all" 表示全部，默认为空
+        """
+        value = os.getenv(variable, "").strip()
+        if value == "all":
+            return [cfg.name for cfg in mcp_manager.configs]
+        return [name.strip() for name in value.split(",") if name.strip()]
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""测试公共配置：仓库根目录（MCP 服务器）、server 目录（Web 服务器模块）和 loadtest 目录加入导入路径"""
+
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+for path in (ROOT_DIR, ROOT_DIR / "server", ROOT_DIR / "loadtest"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""计算工具服务器的批量求值和统计测试"""
+
+import pytest
+
+pytest.importorskip("mcp")
+
+import mcp_server_calc as calc
+
+needs_numpy = pytest.mark.skipif(calc.numpy is None, reason="未安装 numpy")
+
+ROWS = calc.VECTORIZE_MIN_ROWS * 2
+
+
+def scalar_results(expression, bindings):
+    compiled = calc.compile_expression(expression)
+    return [calc._evaluate_row(compiled, item) for item in bindings]
+
+
+def assert_same(expected, actual):
+    assert len(expected) == len(actual)
+    for want, got in zip(expected, actual):
+        if isinstance(want, Exception):
+            assert type(got) is type(want)
+        else:
+            assert got == want
+
+
+@needs_numpy
+def test_vectorized_keeps_ints_beyond_float_precision_exact():
+    bindings = [{"x": 2 ** 53 + 1 + i} for i in range(ROWS)]
+    results = calc.evaluate_bindings(calc.compile_expression("x - 9007199254740992"), bindings)
+    assert results == [1 + i for i in range(ROWS)]
+
+
+@needs_numpy
+def test_vectorized_isolates_ints_too_large_for_float():
+    bindings = [{"x": i} for i in range(ROWS)]
+    bindings[3] = {"x": 10 ** 400}
+    results = calc.evaluate_bindings(calc.compile_expression("x + 1"), bindings)
+    assert results[3] == 10 ** 400 + 1
+    assert results[4] == 5
+
+
+@needs_numpy
+@pytest.mark.parametrize("expression", ["min(x)", "max(x)", "min(x, y)", "max(x, y, 3)", "sqrt(x - y)", "x / y"])
+def test_vectorized_matches_scalar(expression):
+    bindings = [{"x": float(i) - 5, "y": i % 7} for i in range(ROWS)]
+    compiled = calc.compile_expression(expression)
+    assert_same(scalar_results(expression, bindings), calc.evaluate_bindings(compiled, bindings))
+
+
+def test_format_value_uses_exact_integer_bound():
+    assert calc.format_value(float(2 ** 53 - 2)) == str(2 ** 53 - 2)
+    assert calc.format_value(float(2 ** 53)) == str(float(2 ** 53))
+    assert calc.format_value(1.5) == "1.5"
+
+
+@pytest.mark.parametrize("bins, expected", [(0, 0), (10, 10), ("5", 5), (10 ** 9, calc.MAX_HISTOGRAM_BINS)])
+def test_histogram_bins_are_bounded(bins, expected):
+    stats = calc.compute_statistics({"numbers": [1, 2, 3, 4], "bins": bins})
+    assert len(stats["histogram"]) == expected
+
+
+@pytest.mark.parametrize("bins", [-1, "many", float("inf")])
+def test_invalid_histogram_bins_are_rejected(bins):
+    with pytest.raises(ValueError):
+        calc.compute_statistics({"numbers": [1, 2, 3], "bins": bins})
+
+
+@needs_numpy
+def test_statistics_missing_values_match_pure_python(monkeypatch):
+    arguments = {"numbers": [1, None, 2.5, float("nan"), 4, None, 10], "bins": 3}
+    vectorized = calc.compute_statistics(arguments)
+    monkeypatch.setattr(calc, "numpy", None)
+    python = calc.compute_statistics(arguments)
+    assert (python["count"], python["missing"]) == (vectorized["count"], vectorized["missing"]) == (4, 3)
+    assert python["mean"] == pytest.approx(vectorized["mean"])
+    assert python["histogram"] == pytest.approx(vectorized["histogram"])
+    assert python["quantiles"] == pytest.approx(vectorized["quantiles"])
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""ChatBot 工具调用的进度转发测试"""
+
+import asyncio
+
+from chatbot import ChatBot
+
+
+class ProgressTools:
+    """工具执行期间通过进度回调推送部分输出"""
+
+    tools = {}
+
+    async def call_tool(self, tool_key, arguments, progress_callback=None):
+        for part in ("step 1\n", "step 2\n"):
+            if progress_callback is not None:
+                await progress_callback(part)
+            await asyncio.sleep(0.01)
+        return "done"
+
+
+def stream(bot: ChatBot) -> list:
+    async def run():
+        return [event async for event in bot._call_tool_streaming("py:execute_python", {"code": "..."})]
+    return asyncio.run(run())
+
+
+def test_tool_progress_is_forwarded_before_result():
+    events = stream(ChatBot(ProgressTools(), llm_call=lambda **kwargs: None))
+    assert events == [
+        {"type": "tool_progress", "tool": "py:execute_python", "content": "step 1\n"},
+        {"type": "tool_progress", "tool": "py:execute_python", "content": "step 2\n"},
+        {"type": "tool_result", "tool": "py:execute_python", "result": "done"},
+    ]
+
+
+def test_progress_arriving_with_result_is_not_lost():
+    class BurstTools(ProgressTools):
+        async def call_tool(self, tool_key, arguments, progress_callback=None):
+            # 进度和结果在同一次调度中完成
+            await progress_callback("a")
+            await progress_callback("b")
+            return "done"
+
+    events = stream(ChatBot(BurstTools(), llm_call=lambda **kwargs: None))
+    assert [event.get("content") for event in events[:-1]] == ["a", "b"]
+    assert events[-1]["result"] == "done"
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""事件循环监控和采样分析器测试"""
+
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+
+from diagnostics import LoopLagWatchdog, SamplingProfiler
+
+
+def busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_runs_in_background_and_stops_early():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stop,), name="busy-worker")
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        started = time.monotonic()
+        profiler.start(60, interval_ms=1)
+        assert time.monotonic() - started < 1
+        assert profiler.running
+        with pytest.raises(RuntimeError):
+            profiler.start(1)
+
+        time.sleep(0.2)
+        profiler.stop()
+        assert not profiler.running
+        assert time.monotonic() - started < 5
+    finally:
+        stop.set()
+        worker.join()
+
+    status = profiler.status()
+    assert status["samples"] > 0
+    assert status["result_ready"]
+    assert any(line.startswith("busy-worker;") and "busy_worker" in line for line in profiler.result.splitlines())
+
+
+def test_profile_endpoints_do_not_block():
+    fastapi = pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from api import init_admin_router
+    from drain import DrainController
+
+    app = fastapi.FastAPI()
+    app.include_router(init_admin_router(DrainController(), LoopLagWatchdog(), SamplingProfiler()))
+    with TestClient(app) as client:
+        assert client.get("/api/admin/profile/result").status_code == 404
+        assert client.post("/api/admin/profile", params={"seconds": 0}).status_code == 400
+
+        started = time.monotonic()
+        response = client.post("/api/admin/profile", params={"seconds": 60, "interval_ms": 2})
+        assert response.status_code == 200
+        assert response.json()["running"]
+        assert time.monotonic() - started < 2
+        assert client.post("/api/admin/profile", params={"seconds": 1}).status_code == 409
+        assert client.get("/api/admin/profile/result").status_code == 409
+
+        time.sleep(0.1)
+        assert not client.post("/api/admin/profile/stop").json()["running"]
+        result = client.get("/api/admin/profile/result")
+        assert result.status_code == 200
+        assert "attachment" in result.headers["content-disposition"]
+        assert result.text.strip()
+
+
+def test_watchdog_start_stop_and_restart():
+    async def scenario():
+        watchdog = LoopLagWatchdog(threshold_ms=50, interval_ms=10)
+        for _ in range(2):
+            watchdog.start()
+            watchdog.start()
+            assert watchdog.loop_thread_id == threading.get_ident()
+            monitor = watchdog._thread
+            assert monitor.is_alive()
+            await asyncio.sleep(0.05)
+            await watchdog.stop()
+            assert not monitor.is_alive()
+            assert watchdog._task is None
+        assert watchdog.snapshot()["threshold_ms"] == 50
+
+    asyncio.run(scenario())
+
+
+def test_watchdog_records_blocking_call_stack(caplog):
+    def blocking_call():
+        time.sleep(0.3)
+
+    async def scenario():
+        watchdog = LoopLagWatchdog(threshold_ms=50, interval_ms=10)
+        watchdog.start()
+        await asyncio.sleep(0.05)
+        blocking_call()
+        await asyncio.sleep(0.05)
+        await watchdog.stop()
+        return watchdog.snapshot()
+
+    with caplog.at_level(logging.WARNING, logger="diagnostics"):
+        snapshot = asyncio.run(scenario())
+    assert snapshot["stalls"] >= 1
+    assert snapshot["max_lag_ms"] >= 200
+    assert any("blocking_call" in record.getMessage() for record in caplog.records)
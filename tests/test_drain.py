@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""排空模式测试：重连提示帧、关闭码 1012 和进行中对话的等待"""
+
+import asyncio
+import json
+
+import pytest
+
+from drain import CLOSE_SERVICE_RESTART, ChatConnection, DrainController
+
+
+class FakeConnection:
+    """记录发送的帧和关闭码"""
+
+    def __init__(self):
+        self.frames = []
+        self.close_codes = []
+        self.connection = ChatConnection(self.send, self.close)
+
+    async def send(self, frame):
+        self.frames.append(frame)
+
+    async def close(self, code):
+        self.close_codes.append(code)
+
+
+def test_idle_connections_get_reconnect_and_1012():
+    async def scenario():
+        controller = DrainController()
+        idle = FakeConnection()
+        controller.register(idle.connection)
+        await controller.drain(timeout=1)
+        assert controller.draining
+        assert [frame["type"] for frame in idle.frames] == ["reconnect"]
+        assert idle.close_codes == [CLOSE_SERVICE_RESTART] == [1012]
+
+    asyncio.run(scenario())
+
+
+def test_drain_waits_for_active_chat():
+    async def scenario():
+        controller = DrainController()
+        busy = FakeConnection()
+        controller.register(busy.connection)
+        finish = asyncio.Event()
+
+        async def chat():
+            async with controller.track_chat(busy.connection):
+                await finish.wait()
+
+        chat_task = asyncio.create_task(chat())
+        await asyncio.sleep(0)
+        drain_task = asyncio.create_task(controller.drain(timeout=5))
+        await asyncio.sleep(0.05)
+        # 进行中的对话不会被打断
+        assert not drain_task.done()
+        assert busy.close_codes == []
+        assert controller.active_chats == 1
+
+        finish.set()
+        await chat_task
+        await asyncio.wait_for(drain_task, timeout=5)
+        assert busy.close_codes == [CLOSE_SERVICE_RESTART]
+
+    asyncio.run(scenario())
+
+
+def test_drain_timeout_closes_busy_connections():
+    async def scenario():
+        controller = DrainController()
+        busy = FakeConnection()
+        controller.register(busy.connection)
+        async with controller.track_chat(busy.connection):
+            await controller.drain(timeout=0.05)
+            assert busy.close_codes == [CLOSE_SERVICE_RESTART]
+
+    asyncio.run(scenario())
+
+
+def test_websocket_receives_reconnect_frame_and_close_code():
+    fastapi = pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+
+    from api import init_chat_router
+
+    class Bot:
+        async def chat(self, message):
+            yield {"type": "response", "content": message}
+
+    controller = DrainController()
+    app = fastapi.FastAPI()
+    app.include_router(init_chat_router(Bot(), controller))
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/chat") as websocket:
+            websocket.send_text(json.dumps({"message": "hi"}))
+            assert json.loads(websocket.receive_text())["type"] == "response"
+
+            client.portal.call(controller.drain, 1)
+            assert json.loads(websocket.receive_text())["type"] == "reconnect"
+            with pytest.raises(WebSocketDisconnect) as closed:
+                websocket.receive_text()
+            assert closed.value.code == CLOSE_SERVICE_RESTART
+
+        # 排空后的新连接直接收到重连提示
+        with client.websocket_connect("/ws/chat") as websocket:
+            assert json.loads(websocket.receive_text())["type"] == "reconnect"
+            with pytest.raises(WebSocketDisconnect) as closed:
+                websocket.receive_text()
+            assert closed.value.code == CLOSE_SERVICE_RESTART
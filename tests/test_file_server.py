@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""文件服务器的写入和读取测试"""
+
+import asyncio
+import os
+import stat
+import sys
+
+import pytest
+
+pytest.importorskip("mcp")
+
+import mcp_server_file as file_server
+
+
+def test_atomic_write_without_fchmod(tmp_path, monkeypatch):
+    # Windows 上 Python 3.13 之前没有 os.fchmod
+    monkeypatch.delattr(os, "fchmod", raising=False)
+    target = tmp_path / "new.txt"
+    assert file_server.atomic_write(target, b"hello") == 5
+    assert target.read_bytes() == b"hello"
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Windows 只支持只读属性")
+def test_atomic_write_preserves_mode(tmp_path):
+    target = tmp_path / "existing.txt"
+    target.write_bytes(b"old")
+    os.chmod(target, 0o640)
+    file_server.atomic_write(target, [b"new ", b"content"])
+    assert target.read_bytes() == b"new content"
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o640
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_max_lines_without_start_line_reads_from_first_line(tmp_path, compressed):
+    import gzip
+
+    data = "".join(f"line {i}\n" for i in range(1, 101)).encode("utf-8")
+    path = tmp_path / ("lines.txt.gz" if compressed else "lines.txt")
+    path.write_bytes(gzip.compress(data) if compressed else data)
+
+    content = file_server.read_range(path, {"max_lines": 3})
+    assert "line 1\nline 2\nline 3\n" in content
+    assert "line 4" not in content
+    assert "start_line=4" in content
+
+
+def test_max_lines_with_byte_range_is_rejected(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_text("a\nb\n", encoding="utf-8")
+    assert file_server.read_range(path, {"offset": 0, "max_lines": 1}).startswith("错误")
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_server, "FILE_INDEX_DIR", tmp_path / "index-cache")
+    root = tmp_path / "tree"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_text("a")
+    (root / "sub" / "b.log").write_text("bb")
+    return root
+
+
+def test_file_index_refresh_picks_up_in_place_edits(index_dir):
+    index = file_server.FileIndex(index_dir)
+    index.refresh()
+    assert index.query(min_size=10) == []
+
+    # 追加内容不会改变目录 mtime，增量刷新仍应更新大小和修改时间
+    dir_mtime = os.stat(index_dir / "sub").st_mtime_ns
+    with open(index_dir / "sub" / "b.log", "a") as f:
+        f.write("x" * 20)
+    os.utime(index_dir / "sub" / "b.log", ns=(2 * 10 ** 18, 2 * 10 ** 18))
+    assert os.stat(index_dir / "sub").st_mtime_ns == dir_mtime
+
+    scanned, _ = index.refresh()
+    assert scanned == 0
+    path, size, mtime = index.query(min_size=10)[0]
+    assert path == os.path.join("sub", "b.log")
+    assert size == 22
+    assert mtime == 2 * 10 ** 18
+
+    # 持久化的索引包含更新后的元数据
+    assert file_server.FileIndex(index_dir).query(min_size=10)[0][1] == 22
+
+
+def test_file_index_rescans_changed_directories(index_dir):
+    index = file_server.FileIndex(index_dir)
+    index.refresh()
+    (index_dir / "sub" / "c.txt").write_text("c")
+    (index_dir / "a.txt").unlink()
+    index.refresh()
+    paths = sorted(path for path, _, _ in index.query())
+    assert paths == [os.path.join("sub", "b.log"), os.path.join("sub", "c.txt")]
+    assert [path for path, _, _ in index.query(pattern="*.log")] == [os.path.join("sub", "b.log")]
+
+
+def test_list_files_refreshes_after_ttl(index_dir, monkeypatch):
+    monkeypatch.setattr(file_server, "FILE_INDEX_TTL", 0)
+    listing = file_server.list_files({"root": str(index_dir), "sort_by": "size"})
+    assert "匹配 2 个文件" in listing
+    assert listing.splitlines()[1].endswith(os.path.join("sub", "b.log"))
+
+    (index_dir / "a.txt").write_text("a" * 100)
+    listing = file_server.list_files({"root": str(index_dir), "sort_by": "size", "min_size": 50})
+    assert "匹配 1 个文件" in listing
+    assert listing.splitlines()[1].split()[0] == "100"
+    assert listing.splitlines()[1].endswith("a.txt")
+
+def test_hash_files_reports_invalid_expected_per_entry(tmp_path):
+    first = tmp_path / "first.txt"
+    second = tmp_path / "second.txt"
+    first.write_text("one")
+    second.write_text("two")
+    digest = file_server.hashlib.sha256(b"one").hexdigest()
+    output = asyncio.run(file_server.hash_files({
+        "paths": [str(first), str(second)],
+        "expected": {str(first): digest.upper(), str(second): 123},
+    }))
+    assert "[一致]" in output
+    assert "期望值必须是字符串" in output
+    assert "1 个期望值无效" in output
+
+
+def test_find_duplicates_uses_fresh_sizes_and_caps_hashing(index_dir, monkeypatch):
+    (index_dir / "a.txt").write_text("same")
+    (index_dir / "sub" / "b.log").write_text("other")
+    arguments = {"find_duplicates": True, "root": str(index_dir)}
+    assert "0 组重复" in asyncio.run(file_server.hash_files(arguments))
+
+    # 原地修改内容后，索引中的旧大小不应导致漏报
+    (index_dir / "sub" / "b.log").write_text("same")
+    output = asyncio.run(file_server.hash_files(arguments))
+    assert "1 组重复" in output
+    assert os.path.join("sub", "b.log") in output
+
+    monkeypatch.setattr(file_server, "MAX_HASH_FILES", 1)
+    assert "超过单次上限" in asyncio.run(file_server.hash_files(arguments))
+
+
+@pytest.mark.parametrize("arguments", [{"tail_lines": 0}, {"start_line": 1, "max_lines": 0}])
+def test_zero_line_counts_are_rejected(tmp_path, arguments):
+    path = tmp_path / "lines.txt"
+    path.write_text("a\nb\n", encoding="utf-8")
+    assert file_server.read_range(path, arguments).startswith("错误")
+
+
+def test_tail_lines_reads_last_lines(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1, 11)), encoding="utf-8")
+    content = file_server.read_range(path, {"tail_lines": 2})
+    assert "line 9\nline 10\n" in content
+    assert "line 8" not in content
+
+
+@pytest.fixture
+def search_tree(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("import os\n\ndef main():\n    return Value\n", encoding="utf-8")
+    (tmp_path / "src" / "util.py").write_text("value = 1\nother = 2\n", encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("no match here\n", encoding="utf-8")
+    (tmp_path / "blob.bin").write_bytes(b"value\0\1\2")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "dep.py").write_text("value = 3\n", encoding="utf-8")
+    return tmp_path
+
+
+def search(root, **arguments) -> str:
+    return asyncio.run(file_server.search_files({"root": str(root), **arguments}))
+
+
+@pytest.mark.parametrize("inline", [True, False])
+def test_search_files_matches_and_skips_binary(search_tree, monkeypatch, inline):
+    if not inline:
+        monkeypatch.setattr(file_server, "SEARCH_INLINE_FILES", 0)
+    result = search(search_tree, pattern="value")
+    assert os.path.join("src", "util.py") + ":1:value = 1" in result
+    assert "app.py" not in result
+    assert "node_modules" not in result
+    assert "扫描 4 个文件，1 个文件匹配，显示 1 处匹配，跳过 1 个二进制或无法读取的文件" in result
+
+
+def test_search_files_case_insensitive_regex_with_context(search_tree):
+    result = search(search_tree, pattern=r"RETURN\s+\w+", regex=True, case_sensitive=False,
+                    context_lines=1, include="*.py")
+    app = os.path.join("src", "app.py")
+    assert f"{app}-3-def main():\n{app}:4:    return Value\n--" in result
+    assert "扫描 2 个文件" in result
+
+
+def test_search_files_limits_and_errors(search_tree):
+    assert "已达到结果上限" in search(search_tree, pattern="e", max_matches=1)
+    assert search(search_tree, pattern="(", regex=True).startswith("错误: 正则表达式无效")
+    assert search(search_tree, pattern="").startswith("错误")
+    assert search(search_tree, pattern="missing").startswith("搜索结果: 未找到 'missing'")
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = file_server.ReadCache(budget=1024, max_entry=32)
+    monkeypatch.setattr(file_server, "read_cache", cache)
+    return cache
+
+
+def test_read_cache_hits_until_file_is_replaced(tmp_path, cache):
+    path = tmp_path / "data.txt"
+    path.write_bytes(b"old content\n")
+    assert file_server.read_range(path, {}) == "文件内容:\nold content\n"
+    assert file_server.read_range(path, {}) == "文件内容:\nold content\n"
+    st = os.stat(path)
+
+    # 大小和修改时间都相同、只有 inode 不同的替换也必须读到新内容
+    replacement = tmp_path / "data.tmp"
+    replacement.write_bytes(b"new content\n")
+    os.utime(replacement, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(replacement, path)
+    assert os.stat(path).st_ino != st.st_ino
+    assert file_server.read_range(path, {}) == "文件内容:\nnew content\n"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_read_cache_respects_entry_size_and_budget(tmp_path, cache):
+    large = tmp_path / "large.txt"
+    large.write_bytes(b"x" * 40)
+    assert file_server.read_range(large, {}).endswith("x" * 40)
+    assert cache.stats()["entries"] == 0
+
+    cache.budget = 64
+    for name in "abc":
+        (tmp_path / name).write_bytes(name.encode() * 30)
+        file_server.read_range(tmp_path / name, {"offset": 0, "length": 1})
+    stats = cache.stats()
+    assert stats["bytes"] <= stats["budget_bytes"]
+    assert stats["evictions"] == 1
+    assert list(cache.entries) == [str(tmp_path / "b"), str(tmp_path / "c")]
+
+
+def test_write_invalidates_read_cache(tmp_path, cache):
+    path = tmp_path / "data.txt"
+    path.write_bytes(b"old\n")
+    file_server.read_range(path, {})
+    file_server.write_content(str(path), "new\n", mode="append")
+    assert cache.stats()["invalidations"] == 1
+    assert file_server.read_range(path, {}) == "文件内容:\nold\nnew\n"
+
+
+COMPRESSORS = {
+    "gzip": ("gz", "gzip"),
+    "bz2": ("bz2", "bz2"),
+    "xz": ("xz", "lzma"),
+}
+
+
+@pytest.fixture(params=sorted(COMPRESSORS))
+def compressed(request, tmp_path):
+    import importlib
+
+    suffix, module = COMPRESSORS[request.param]
+    data = "".join(f"第 {i} 行\n" for i in range(1, 1001)).encode("utf-8")
+    # 扩展名故意写错：压缩格式按魔数识别
+    path = tmp_path / f"lines.{suffix}.log"
+    path.write_bytes(importlib.import_module(module).compress(data))
+    return request.param, path, data
+
+
+def test_compressed_read_whole_file(compressed):
+    compression, path, data = compressed
+    assert file_server.read_range(path, {}) == f"文件内容（{compression} 解压）:\n" + data.decode("utf-8")
+    assert file_server.read_range(path, {"decompress": False}).startswith("文件内容（base64")
+
+
+def test_compressed_read_byte_range_and_lines(compressed, monkeypatch):
+    compression, path, data = compressed
+    # 小块解压，让范围跨越多个块
+    monkeypatch.setattr(file_server, "DECOMPRESS_CHUNK", 7)
+
+    content = file_server.read_range(path, {"offset": 100, "length": 30})
+    expected = data[100:130]
+    while True:
+        try:
+            expected.decode("utf-8")
+            break
+        except UnicodeDecodeError:
+            expected = expected[:-1]
+    assert content.split("\n", 1)[1].startswith(expected.decode("utf-8"))
+    assert f"[已读取解压后字节 100-{100 + len(expected)}" in content
+
+    content = file_server.read_range(path, {"start_line": 500, "max_lines": 2})
+    assert "第 500 行\n第 501 行\n" in content
+    assert "第 502 行" not in content
+    assert "start_line=502" in content
+
+    content = file_server.read_range(path, {"tail_lines": 2})
+    assert "第 999 行\n第 1000 行\n" in content
+    assert "第 998 行" not in content
+    assert f"解压后共 {len(data)} 字节" in content
+
+    assert file_server.read_range(path, {"start_line": 2000}).startswith("错误: 起始行 2000")
+
+
+def test_compressed_binary_is_returned_as_base64(tmp_path):
+    import base64
+    import gzip
+
+    data = bytes(range(256)) * 4
+    path = tmp_path / "blob.gz"
+    path.write_bytes(gzip.compress(data))
+    content = file_server.read_range(path, {"offset": 3, "length": 9})
+    assert content.startswith("文件内容（gzip 解压，base64，字节 3-12）")
+    assert base64.b64decode(content.split("\n")[1]) == data[3:12]
+    assert file_server.read_range(path, {"tail_lines": 1}).startswith("错误: 二进制内容不支持按行读取")
+
+
+def test_binary_file_is_read_as_base64_in_chunks(tmp_path):
+    import base64
+
+    data = bytes(range(256))
+    path = tmp_path / "blob.bin"
+    path.write_bytes(data)
+    content = file_server.read_range(path, {"max_bytes": 100})
+    assert content.startswith("文件内容（base64，字节 0-75）")
+    assert "offset=75" in content
+    rest = file_server.read_range(path, {"offset": 75})
+    decoded = base64.b64decode(content.split("\n")[1]) + base64.b64decode(rest.split("\n")[1])
+    assert decoded == data
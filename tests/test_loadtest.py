@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""压测工具测试：假 LLM 驱动 ChatBot，负载生成器对真实 WebSocket 服务器运行"""
+
+import asyncio
+import socket
+import threading
+import time
+from argparse import Namespace
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("websockets")
+
+from fake_llm import FakeLLM
+import load_generator
+from chatbot import ChatBot
+
+
+class EchoTools:
+    """最小的 MCPManager 替身：一个把参数原样返回的工具"""
+
+    def __init__(self):
+        self.tools = {"fake:echo": {"tool": SimpleNamespace(description="echo", inputSchema={"type": "object"}),
+                                    "server_type": "stdio"}}
+        self.calls = []
+
+    async def call_tool(self, tool_key, arguments, progress_callback=None):
+        self.calls.append((tool_key, arguments))
+        return f"echo {arguments}"
+
+
+def collect(bot: ChatBot, message: str) -> list:
+    async def run():
+        return [frame async for frame in bot.chat(message)]
+    return asyncio.run(run())
+
+
+def test_percentiles_use_nearest_rank():
+    values = list(range(1, 101))
+    assert load_generator.percentile(values, 50) == 50
+    assert load_generator.percentile(values, 99) == 99
+    assert load_generator.percentile([], 50) is None
+    summary = load_generator.summarize([3.0, 1.0, 2.0])
+    assert summary["count"] == 3
+    assert summary["p50"] == 2.0
+    assert summary["max"] == 3.0
+    assert load_generator.summarize([])["mean"] is None
+
+
+def test_fake_llm_drives_tool_calls_then_answers():
+    tools = EchoTools()
+    llm = FakeLLM(latency_ms=0, tool_calls_per_turn=2, tool_arguments={"n": 1}, response_bytes=16)
+    frames = collect(ChatBot(tools, llm_call=llm), "你好")
+    assert [frame["type"] for frame in frames] == ["tool_call", "tool_result", "tool_call", "tool_result", "response"]
+    assert tools.calls == [("fake:echo", {"n": 1}), ("fake:echo", {"n": 1})]
+    assert frames[-1]["content"] == "x" * 16
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_load_generator_against_chat_server():
+    import fastapi
+    import uvicorn
+
+    from api import init_chat_router
+    from drain import DrainController
+
+    tools = EchoTools()
+    app = fastapi.FastAPI()
+    bot = ChatBot(tools, llm_call=FakeLLM(latency_ms=0, tool_calls_per_turn=1))
+    app.include_router(init_chat_router(bot, DrainController()))
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        for _ in range(100):
+            if server.started:
+                break
+            time.sleep(0.05)
+        assert server.started
+
+        args = Namespace(url=f"ws://127.0.0.1:{port}/ws/chat", clients=3, conversations=2, script=None,
+                         ramp_up=0.0, turn_timeout=10.0, error_grace=0.5, subprotocol=None, label="test")
+        result = asyncio.run(load_generator.run(args))
+    finally:
+        server.should_exit = True
+        thread.join(10)
+
+    turns = 3 * 2 * len(load_generator.DEFAULT_SCRIPT)
+    assert result["summary"]["turns_ok"] == turns
+    assert result["summary"]["turns_failed"] == 0
+    assert result["latency_ms"]["count"] == turns
+    assert len(tools.calls) == turns
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""MCPManager 的工具列表缓存和按需启动测试"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("pydantic")
+
+from mcp.types import Tool
+
+import mcp_manager
+from mcp_manager import MCPManager, config_hash
+from models import MCPServerConfig
+
+SERVER_DIR = Path(mcp_manager.__file__).resolve().parent
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_manager, "TOOL_CACHE_FILE", tmp_path / "cache" / "tools.json")
+    return MCPManager(config_file=tmp_path / "servers.json")
+
+
+def register_tools(manager: MCPManager, config: MCPServerConfig, names):
+    for name in names:
+        manager.tools[f"{config.name}:{name}"] = {
+            "server": config.name,
+            "server_type": config.type,
+            "tool": Tool(name=name, description="", inputSchema={"type": "object"})
+        }
+
+
+def test_concurrent_tool_cache_saves_keep_every_entry(manager):
+    configs = [MCPServerConfig(name=f"s{i}", command="python", args=[f"s{i}.py"]) for i in range(8)]
+    for config in configs:
+        register_tools(manager, config, ["echo"])
+
+    async def save_all():
+        await asyncio.gather(*[asyncio.to_thread(manager._save_tool_cache, cfg) for cfg in configs])
+
+    for _ in range(5):
+        asyncio.run(save_all())
+
+    cache = json.loads(mcp_manager.TOOL_CACHE_FILE.read_text(encoding="utf-8"))
+    assert set(cache) == {config_hash(cfg) for cfg in configs}
+    assert list(mcp_manager.TOOL_CACHE_FILE.parent.glob("*.tmp")) == []
+
+
+class FakeServers:
+    """替换 stdio 连接：登记会话和一个 echo 工具，记录启动和关闭次数"""
+
+    def __init__(self, manager: MCPManager):
+        self.manager = manager
+        self.spawned = []
+        manager._connect_stdio_server = self.connect
+        manager._call_stdio_tool = self.call
+
+    async def connect(self, config: MCPServerConfig):
+        self.spawned.append(config.name)
+        stop = asyncio.Event()
+        self.manager.sessions[config.name] = {
+            "type": "stdio", "stop": stop, "task": asyncio.create_task(stop.wait())
+        }
+        register_tools(self.manager, config, ["echo"])
+        return {"status": "success", "tools": ["echo"]}
+
+    async def call(self, tool_info, arguments, progress_callback=None):
+        await asyncio.sleep(0.01)
+        return "ok"
+
+
+def test_lazy_server_spawns_on_first_call_and_keeps_tools_when_reaped(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_manager, "TOOL_CACHE_FILE", tmp_path / "tools.json")
+    config = MCPServerConfig(name="calc", command="python", args=["calc.py"])
+
+    async def scenario():
+        first = MCPManager(config_file=tmp_path / "servers.json")
+        FakeServers(first)
+        assert (await first.enable_lazy(config))["status"] == "success"
+
+        manager = MCPManager(config_file=tmp_path / "servers.json")
+        servers = FakeServers(manager)
+        assert (await manager.enable_lazy(config))["status"] == "dormant"
+        assert "calc:echo" in manager.tools and "calc" not in manager.sessions
+
+        results = await asyncio.gather(*[manager.call_tool("calc:echo", {}) for _ in range(5)])
+        assert results == ["ok"] * 5
+        assert servers.spawned == ["calc"]
+
+        manager.idle_timeout = 0
+        await manager._close_if_idle("calc")
+        assert "calc" not in manager.sessions and "calc:echo" in manager.tools
+
+        assert await manager.call_tool("calc:echo", {}) == "ok"
+        assert servers.spawned == ["calc", "calc"]
+
+    asyncio.run(scenario())
+
+
+def test_reaper_rechecks_before_closing(manager):
+    config = MCPServerConfig(name="calc", command="python")
+    FakeServers(manager)
+
+    async def scenario():
+        await manager.connect_to_server(config)
+        manager.lazy_configs["calc"] = config
+        manager.idle_timeout = 0
+
+        # 回收任务在等启动锁时有调用开始，拿到锁后应放弃关闭
+        lock = manager._spawn_locks.setdefault("calc", asyncio.Lock())
+        async with lock:
+            reap = asyncio.create_task(manager._close_if_idle("calc"))
+            await asyncio.sleep(0)
+            manager._inflight["calc"] = 1
+        await reap
+        assert "calc" in manager.sessions
+
+        manager._inflight["calc"] = 0
+        await manager._close_if_idle("calc")
+        assert "calc" not in manager.sessions
+
+    asyncio.run(scenario())
+
+
+def test_reaper_survives_close_errors(manager):
+    FakeServers(manager)
+    closed = []
+
+    async def close_session(server_name, timeout=10):
+        manager.sessions.pop(server_name, None)
+        if server_name == "broken":
+            raise RuntimeError("close failed")
+        closed.append(server_name)
+
+    manager._close_session = close_session
+
+    async def scenario():
+        for name in ("broken", "calc"):
+            config = MCPServerConfig(name=name, command="python")
+            await manager.connect_to_server(config)
+            manager.lazy_configs[name] = config
+        manager.idle_timeout = 0.01
+        manager.start_idle_reaper()
+        await asyncio.sleep(1.2)
+        assert closed == ["calc"]
+        assert not manager._reaper_task.done()
+        await manager.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_inprocess_calc_runs_batches_off_the_event_loop(manager, monkeypatch, tmp_path):
+    import threading
+
+    import mcp_result_spool
+    import mcp_server_calc
+
+    monkeypatch.setattr(mcp_result_spool, "SPOOL_DIR", tmp_path / "spool")
+    monkeypatch.setattr(mcp_result_spool, "SPOOL_THRESHOLD", 1024)
+    # 连接进程内服务器会关闭本进程的暂存，测试结束后恢复
+    monkeypatch.setattr(mcp_result_spool, "_enabled", True)
+    threads = []
+    calculate_batch = mcp_server_calc.calculate_batch
+
+    def recording_batch(arguments):
+        threads.append(threading.current_thread())
+        return calculate_batch(arguments)
+
+    monkeypatch.setattr(mcp_server_calc, "calculate_batch", recording_batch)
+    config = MCPServerConfig(name="calc", type="inprocess", module="mcp_server_calc")
+
+    async def scenario():
+        await manager.connect_to_server(config)
+        try:
+            expressions = [f"{i} * 2" for i in range(500)]
+            result = await manager.call_tool("calc:calculate_batch", {"expressions": expressions})
+        finally:
+            await manager.cleanup()
+        return result
+
+    result = asyncio.run(scenario())
+    assert threads and threads[0] is not threading.main_thread()
+    # 进程内结果超过暂存阈值也直接返回，不写入暂存目录
+    assert "998" in result and mcp_result_spool.MARKER_PREFIX not in result
+    assert not (tmp_path / "spool").exists()
+
+
+def test_inprocess_modules_load_without_changing_sys_path(tmp_path):
+    # 在新进程中检查：测试进程的导入路径已包含仓库根目录
+    (tmp_path / "notes.txt").write_text("a needle here\n")
+    (tmp_path / "other.txt").write_text("nothing\n")
+    script = f"""
+import asyncio, sys
+before = list(sys.path)
+import mcp_manager
+calc = mcp_manager.MCPManager._import_server_module("mcp_server_calc")
+files = mcp_manager.MCPManager._import_server_module("mcp_server_file.py")
+assert mcp_manager.MCPManager._import_server_module("mcp_server_file") is files
+assert sys.path == before, sys.path
+assert sys.modules["mcp_result_spool"] is mcp_manager.mcp_result_spool
+# 强制使用搜索进程池：子进程需要按模块名导入 mcp_server_file
+files.SEARCH_INLINE_FILES = 0
+print(asyncio.run(files.search_files({{"root": {str(tmp_path)!r}, "pattern": "needle"}})))
+"""
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONPATH"}
+    result = subprocess.run([sys.executable, "-c", script], cwd=SERVER_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert "notes.txt" in result.stdout
+    assert "a needle here" in result.stdout
+
+
+def test_tool_cache_is_not_rewritten_when_unchanged(manager, monkeypatch):
+    config = MCPServerConfig(name="s", command="python", args=["s.py"])
+    register_tools(manager, config, ["echo"])
+    manager._save_tool_cache(config)
+
+    writes = []
+    real_mkstemp = mcp_manager.tempfile.mkstemp
+    monkeypatch.setattr(mcp_manager.tempfile, "mkstemp", lambda **kwargs: writes.append(1) or real_mkstemp(**kwargs))
+    manager._save_tool_cache(config)
+    assert writes == []
+
+    # 工具列表或配置变化时重写
+    register_tools(manager, config, ["echo", "add"])
+    manager._save_tool_cache(config)
+    changed = MCPServerConfig(name="s", command="python", args=["s2.py"])
+    manager._save_tool_cache(changed)
+    assert len(writes) == 2
+    cache = json.loads(mcp_manager.TOOL_CACHE_FILE.read_text(encoding="utf-8"))
+    assert list(cache) == [config_hash(changed)]
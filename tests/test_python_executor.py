@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""Python 代码执行器的沙箱测试"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp")
+
+import mcp_server_python_executor as executor
+
+LIMITS = {"cpu_seconds": 10, "memory_bytes": 512 * 1024 * 1024, "output_bytes": 64 * 1024}
+
+
+def run(code: str, profile: str = "default") -> str:
+    return executor._execute(code, LIMITS, profile=profile)["output"]
+
+
+needs_numpy = pytest.mark.skipif(executor.numpy is None, reason="未安装 numpy")
+
+
+@needs_numpy
+def test_numpy_profile_basic_usage():
+    output = run("a = np.arange(4.0).reshape(2, 2)\nprint(a.mean(), a.std(), a)", profile="numpy")
+    assert "1.5" in output
+    assert "执行错误" not in output
+
+
+@needs_numpy
+@pytest.mark.parametrize("code", [
+    "import numpy.lib.format as f",
+    "import numpy.ctypeslib",
+    "import os",
+    "__import__('numpy.lib.format')",
+])
+def test_numpy_profile_rejects_imports(code):
+    assert "ImportError" in run(code, profile="numpy")
+
+
+@needs_numpy
+def test_numpy_runtime_modules_are_not_exposed():
+    output = run("m = __import__('numpy._core._internal')\nprint(m.ctypes)", profile="numpy")
+    assert "AttributeError" in output
+
+
+@needs_numpy
+@pytest.mark.parametrize("code", [
+    "np.arange(3).tofile({path!r})",
+    "np.arange(3).dump({path!r})",
+    "type(np.arange(3)).__dict__['tofile'](np.arange(3), {path!r})",
+])
+def test_numpy_profile_blocks_file_writes(tmp_path, code):
+    target = tmp_path / "escape.bin"
+    output = run(code.format(path=str(target)), profile="numpy")
+    assert "执行错误" in output
+    assert not target.exists()
+
+
+@needs_numpy
+def test_numpy_profile_blocks_ctypes():
+    output = run("np.arange(3).ctypes._ctypes.CDLL(None)", profile="numpy")
+    assert "PermissionError" in output
+    output = run("np.arange(3).ctypes._ctypes.string_at(0, 1)", profile="numpy")
+    assert "PermissionError" in output
+
+
+def test_sandbox_audit_is_inactive_outside_execution(tmp_path):
+    run("x = 1")
+    target = tmp_path / "outside.txt"
+    target.write_text("ok")
+    assert target.read_text() == "ok"
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 5),
+    ("abc", 5),
+    (float("nan"), 5),
+    (-3, executor.MIN_TIMEOUT_SECONDS),
+    (0, executor.MIN_TIMEOUT_SECONDS),
+    (1e9, executor.MAX_TIMEOUT_SECONDS),
+    ("2.5", 2.5),
+])
+def test_resolve_timeout(value, expected):
+    assert executor.resolve_timeout(value, 5) == expected
+
+
+def test_cancelled_run_replaces_worker():
+    async def scenario():
+        pool = executor.WorkerPool(1)
+        try:
+            busy = asyncio.create_task(pool.run({"op": "exec", "code": "while True: pass", "limits": LIMITS}, 30))
+            await asyncio.sleep(0.5)
+            busy.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await busy
+
+            # 被取消的任务占用的工作进程应被替换，进程池仍可使用
+            job = {"op": "exec", "code": "print('alive')", "limits": LIMITS}
+            result = await asyncio.wait_for(pool.run(job, 10), timeout=30)
+            assert "alive" in result["output"]
+        finally:
+            pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_session_call_closes_session():
+    async def scenario():
+        pool = executor.WorkerPool(1)
+        manager = executor.SessionManager(pool, 2, 600, 1024 * 1024 * 1024)
+        try:
+            busy = asyncio.create_task(manager.execute("s", "while True: pass", 30, LIMITS))
+            await asyncio.sleep(0.5)
+            busy.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await busy
+            assert "s" not in manager.sessions
+
+            # 同名会话重新创建，不会收到被取消的那次执行的结果
+            output = await asyncio.wait_for(manager.execute("s", "x = 41 + 1", 10, LIMITS), timeout=30)
+            assert "x = 42" in output
+        finally:
+            manager.close_all()
+            pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_resolve_limits_enforces_minimums():
+    limits = executor.resolve_limits({"max_cpu_seconds": 0, "max_memory_mb": 0, "max_output_bytes": -5})
+    assert limits["cpu_seconds"] == executor.MIN_CPU_SECONDS
+    assert limits["memory_bytes"] == int(executor.MIN_MEMORY_MB * 1024 * 1024)
+    assert limits["output_bytes"] == executor.MIN_OUTPUT_BYTES
+
+
+def test_resolve_limits_defaults_and_maximums():
+    limits = executor.resolve_limits({"max_cpu_seconds": "abc", "max_memory_mb": float("inf"),
+                                      "max_output_bytes": 10 ** 12})
+    assert limits["cpu_seconds"] == executor.DEFAULT_CPU_SECONDS
+    assert limits["memory_bytes"] == int(executor.DEFAULT_MEMORY_MB * 1024 * 1024)
+    assert limits["output_bytes"] == executor.MAX_OUTPUT_BYTES
+
+
+def test_minimum_limits_still_run_code():
+    limits = executor.resolve_limits({"max_cpu_seconds": 0, "max_memory_mb": 0})
+    assert "2" in executor._execute("print(1 + 1)", limits)["output"]
+
+
+def test_variable_dump_is_truncated_by_bytes():
+    limits = dict(LIMITS, output_bytes=1024)
+    output = executor._execute("s = '汉' * 2000", limits)["output"]
+    dump = output.split("定义的变量:\n", 1)[1].split("\n\n", 1)[0]
+    assert len(dump.encode("utf-8")) <= 1024
+    assert "变量输出已截断" in output
+
+
+@pytest.mark.parametrize("code", ["sum(range(10 ** 10))", "while True: pass"])
+def test_cpu_quota_stops_c_level_and_python_loops(code):
+    if executor._process_cpu_time(executor.os.getpid()) is None:
+        pytest.skip("无法读取进程 CPU 时间")
+
+    async def scenario():
+        pool = executor.WorkerPool(1)
+        try:
+            await pool.start()
+            limits = dict(LIMITS, cpu_seconds=1)
+            started = executor.time.monotonic()
+            result = await pool.run({"op": "exec", "code": code, "limits": limits}, 20)
+            assert "CPU 时间超过 1 秒限制" in result["output"]
+            assert executor.time.monotonic() - started < 5
+
+            # 超限的工作进程被替换，进程池仍可使用
+            job = {"op": "exec", "code": "print('alive')", "limits": LIMITS}
+            result = await asyncio.wait_for(pool.run(job, 10), timeout=30)
+            assert "alive" in result["output"]
+        finally:
+            pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_run_times_out_while_all_workers_are_busy():
+    async def scenario():
+        pool = executor.WorkerPool(1)
+        try:
+            await pool.start()
+            busy = asyncio.create_task(pool.run({"op": "exec", "code": "while True: pass", "limits": LIMITS}, 3))
+            await asyncio.sleep(0.2)
+            started = executor.time.monotonic()
+            result = await pool.run({"op": "exec", "code": "print(1)", "limits": LIMITS}, 0.5)
+            assert result is None
+            assert executor.time.monotonic() - started < 2
+            assert await busy is None
+        finally:
+            pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_replacement_spawn_is_retried(monkeypatch):
+    async def scenario():
+        pool = executor.WorkerPool(1)
+        try:
+            await pool.start()
+            real_spawn = pool.spawn_worker
+            attempts = []
+
+            async def flaky_spawn():
+                attempts.append(1)
+                if len(attempts) == 1:
+                    raise OSError("spawn failed")
+                return await real_spawn()
+
+            monkeypatch.setattr(pool, "spawn_worker", flaky_spawn)
+            monkeypatch.setattr(executor.asyncio, "sleep", lambda delay: real_sleep(0))
+            result = await pool.run({"op": "exec", "code": "while True: pass", "limits": LIMITS}, 0.3)
+            assert result is None
+
+            # 第一次启动失败后重试，进程池恢复原有大小
+            job = {"op": "exec", "code": "print('alive')", "limits": LIMITS}
+            result = await asyncio.wait_for(pool.run(job, 20), timeout=30)
+            assert "alive" in result["output"]
+            assert len(attempts) == 2
+        finally:
+            pool.close()
+
+    real_sleep = asyncio.sleep
+    asyncio.run(scenario())
+
+
+class FakeConn:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+def test_progress_streamer_batches_and_caps_output():
+    conn = FakeConn()
+    with executor._ProgressStreamer(conn, interval=0.05, max_bytes=8) as streamer:
+        streamer.feed("ab")
+        streamer.feed("cd")
+        executor.time.sleep(0.2)
+        streamer.feed("汉字汉字")
+        executor.time.sleep(0.2)
+    assert conn.sent[0] == {"progress": "abcd"}
+    # 推送总量不超过上限，被截断的多字节字符整体丢弃
+    pushed = "".join(message["progress"] for message in conn.sent)
+    assert pushed == "abcd汉"
+    assert len(pushed.encode("utf-8")) <= 8
+
+
+def test_partial_output_reaches_progress_callback_before_result():
+    async def scenario():
+        pool = executor.WorkerPool(1)
+        progress = []
+        try:
+            code = "print('first')\nx = 0\nwhile x < 4 * 10 ** 7:\n    x += 1\nprint('last')"
+            job = {"op": "exec", "code": code, "limits": LIMITS, "stream": True}
+            result = await pool.run(job, 30, on_progress=progress.append)
+        finally:
+            pool.close()
+        return progress, result
+
+    progress, result = asyncio.run(scenario())
+    assert progress and progress[0].startswith("first")
+    assert "first" in result["output"] and "last" in result["output"]
+
+
+def parallel_map(monkeypatch, source, inputs, chunk_size=2, function_name=None, timeout=10):
+    async def scenario():
+        pool = executor.WorkerPool(2)
+        monkeypatch.setattr(executor, "pool", pool)
+        try:
+            await pool.start()
+            return await executor.parallel_map(source, function_name, inputs, chunk_size, timeout, LIMITS, "default")
+        finally:
+            pool.close()
+
+    return asyncio.run(scenario())
+
+
+def test_parallel_map_isolates_per_item_errors(monkeypatch):
+    result = executor.json.loads(parallel_map(monkeypatch, "lambda x: 10 // x", [5, 0, 2, "a", 1]))
+    assert result["count"] == 5
+    assert result["succeeded"] == 3
+    assert result["failed"] == 2
+    assert result["chunks"] == 3
+    by_index = {entry["index"]: entry for entry in result["results"]}
+    assert [by_index[i].get("result") for i in (0, 2, 4)] == [2, 5, 10]
+    assert by_index[1]["error"].startswith("ZeroDivisionError")
+    assert by_index[3]["error"].startswith("TypeError")
+
+
+def test_parallel_map_reports_function_load_failure(monkeypatch):
+    assert parallel_map(monkeypatch, "def f(x):\n    return", [1], function_name="g").startswith("函数加载失败")
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""大结果暂存的写入、分页读取和清理测试"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+import mcp_result_spool as spool
+
+TEXT = "数据" * 2000 + "\ntail"
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(spool, "SPOOL_DIR", tmp_path / "spool")
+    monkeypatch.setattr(spool, "SPOOL_THRESHOLD", 1000)
+    monkeypatch.setattr(spool, "SPOOL_PREVIEW_BYTES", 50)
+    monkeypatch.setattr(spool, "_enabled", True)
+    return tmp_path / "spool"
+
+
+def read_all(handle: str, length: int) -> str:
+    parts = []
+    offset = 0
+    while offset is not None:
+        page = spool.read_page(handle, offset, length)
+        parts.append(page["content"])
+        offset = page["next_offset"]
+    return "".join(parts)
+
+
+def test_decorator_spools_only_large_results():
+    types = pytest.importorskip("mcp.types")
+
+    @spool.spool_large_results
+    async def handler(text):
+        return [types.TextContent(type="text", text=text)]
+
+    small = asyncio.run(handler("short"))
+    assert small[0].text == "short"
+
+    large = asyncio.run(handler(TEXT))
+    marker = spool.parse_marker(large[0].text)
+    assert marker is not None
+    assert marker["size"] == len(TEXT.encode("utf-8"))
+    assert TEXT.startswith(marker["preview"])
+    assert read_all(marker["handle"], 1001) == TEXT
+    assert marker["handle"] in spool.describe(marker)
+
+
+def test_decorator_passes_through_when_disabled(monkeypatch):
+    types = pytest.importorskip("mcp.types")
+    monkeypatch.setattr(spool, "_enabled", False)
+
+    @spool.spool_large_results
+    async def handler():
+        return [types.TextContent(type="text", text=TEXT)]
+
+    assert asyncio.run(handler())[0].text == TEXT
+
+
+@pytest.mark.parametrize("length", [4, 5, 7, 1001, spool.MAX_PAGE_BYTES])
+def test_pages_reassemble_multibyte_text(length):
+    handle = spool.write(TEXT.encode("utf-8"))["handle"]
+    assert read_all(handle, length) == TEXT
+
+
+def test_tiny_pages_still_advance():
+    handle = spool.write("数".encode("utf-8") * 3)["handle"]
+    assert read_all(handle, 1) == "数" * 3
+
+
+@pytest.mark.parametrize("offset", range(0, 7))
+def test_offset_inside_a_character_snaps_forward(offset):
+    handle = spool.write("数据abc".encode("utf-8"))["handle"]
+    page = spool.read_page(handle, offset, 10)
+    assert page["offset"] % 3 == 0
+    assert page["offset"] >= offset
+    assert "�" not in page["content"]
+    assert "数据abc".encode("utf-8")[page["offset"]:].decode("utf-8").startswith(page["content"])
+
+
+def test_cleanup_removes_expired_results(spool_dir):
+    expired = spool.write(b"old")["handle"]
+    fresh = spool.write(b"new")["handle"]
+    old = time.time() - 7200
+    os.utime(spool_dir / f"{expired}.txt", (old, old))
+
+    assert spool.cleanup(max_age=3600) == 1
+    with pytest.raises(FileNotFoundError):
+        spool.read_page(expired)
+    assert spool.read_page(fresh)["content"] == "new"
+
+
+@pytest.mark.parametrize("handle", ["../etc/passwd", "", "ABC", "0" * 31, "g" * 32])
+def test_invalid_handles_are_rejected(handle):
+    with pytest.raises(ValueError):
+        spool.read_page(handle)
+    with pytest.raises(ValueError):
+        spool.delete(handle)
+
+
+def test_parse_marker_rejects_non_markers():
+    assert spool.parse_marker("hello") is None
+    assert spool.parse_marker(spool.MARKER_PREFIX + "{bad") is None
+    assert spool.parse_marker(spool.MARKER_PREFIX + '{"handle": "../x"}') is None
+
+
+def test_delete():
+    handle = spool.write(b"data")["handle"]
+    assert spool.delete(handle) is True
+    assert spool.delete(handle) is False
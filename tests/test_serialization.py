@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""序列化层和 WebSocket 子协议协商测试"""
+
+import json
+
+import pytest
+
+import serialization
+from serialization import JSONSerializer, negotiate_serializer
+
+FRAME = {"type": "content", "content": "你好", "tools": [{"name": "calc", "args": {"x": 1.5}}], "done": False}
+
+
+class EchoBot:
+    """把用户消息原样作为一帧返回"""
+
+    async def chat(self, message: str):
+        yield {"type": "content", "content": message}
+
+
+def chat_client():
+    fastapi = pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from api import init_chat_router
+    from drain import DrainController
+
+    app = fastapi.FastAPI()
+    app.include_router(init_chat_router(EchoBot(), DrainController()))
+    return TestClient(app)
+
+
+def test_json_serializers_round_trip():
+    serializer = serialization.get_json_serializer()
+    text = serializer.dumps(FRAME)
+    assert isinstance(text, str)
+    assert json.loads(text) == FRAME
+    assert serializer.loads(text) == FRAME
+    assert JSONSerializer().dumps(FRAME) == json.dumps(FRAME, ensure_ascii=False, separators=(",", ":"))
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason="未安装 orjson")
+def test_orjson_falls_back_for_unsupported_values():
+    serializer = serialization.get_json_serializer()
+    assert serializer.name == "orjson"
+    assert json.loads(serializer.dumps({"big": 2 ** 70})) == {"big": 2 ** 70}
+
+
+@pytest.mark.parametrize("offered, expected", [
+    ([], None),
+    (["unknown"], None),
+    (["json"], "json"),
+    (["unknown", "json", "msgpack"], "json"),
+])
+def test_negotiate_text_subprotocols(offered, expected):
+    serializer, subprotocol = negotiate_serializer(offered)
+    assert subprotocol == expected
+    assert not serializer.binary
+
+
+@pytest.mark.skipif(serialization.msgpack is None, reason="未安装 msgpack")
+def test_negotiate_msgpack():
+    serializer, subprotocol = negotiate_serializer(["msgpack", "json"])
+    assert subprotocol == "msgpack"
+    assert serializer.binary
+    assert serializer.loads(serializer.dumps(FRAME)) == FRAME
+    # 二进制协议下仍接受 JSON 文本帧
+    assert serializer.loads(json.dumps(FRAME)) == FRAME
+
+
+def test_negotiate_falls_back_without_msgpack(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+    serializer, subprotocol = negotiate_serializer(["msgpack", "json"])
+    assert subprotocol == "json"
+    assert not serializer.binary
+
+
+def test_websocket_uses_json_text_frames_by_default():
+    with chat_client() as client:
+        with client.websocket_connect("/ws/chat") as websocket:
+            websocket.send_text(json.dumps({"message": "hi"}))
+            assert json.loads(websocket.receive_text()) == {"type": "content", "content": "hi"}
+
+
+@pytest.mark.skipif(serialization.msgpack is None, reason="未安装 msgpack")
+def test_websocket_negotiates_msgpack_binary_frames():
+    msgpack = serialization.msgpack
+    with chat_client() as client:
+        with client.websocket_connect("/ws/chat", subprotocols=["msgpack", "json"]) as websocket:
+            assert websocket.accepted_subprotocol == "msgpack"
+            websocket.send_bytes(msgpack.packb({"message": "你好"}))
+            assert msgpack.unpackb(websocket.receive_bytes()) == {"type": "content", "content": "你好"}
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Web 服务器启动流程测试"""
+
+import asyncio
+import signal
+import sys
+import warnings
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("mcp")
+
+import uvicorn
+from fastapi.testclient import TestClient
+
+import mcp_web_server
+from drain import DrainController
+
+
+def test_import_does_not_construct_managers():
+    assert mcp_web_server.mcp_manager is None
+    assert mcp_web_server.chatbot is None
+    assert "dashscope" not in sys.modules
+
+
+def test_startup_constructs_managers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mcp_web_server, "mcp_manager", None)
+    monkeypatch.setattr(mcp_web_server, "chatbot", None)
+    with TestClient(mcp_web_server.app) as client:
+        assert client.get("/healthz").json() == {"status": "alive"}
+        manager = mcp_web_server.mcp_manager
+        assert manager is not None
+        assert mcp_web_server.chatbot.mcp_manager is manager
+        assert client.get("/api/servers").json()["connected"] == []
+        # 重复调用返回同一个实例
+        assert mcp_web_server.init_managers() == (manager, mcp_web_server.chatbot)
+
+
+def test_exit_signal_drains_before_stopping(monkeypatch):
+    monkeypatch.setattr(mcp_web_server, "drain_controller", DrainController())
+    server = mcp_web_server.DrainingServer(uvicorn.Config(mcp_web_server.app))
+
+    async def scenario():
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            server.handle_exit(signal.SIGTERM, None)
+        assert not server.should_exit
+        for _ in range(100):
+            if server.should_exit:
+                break
+            await asyncio.sleep(0.01)
+        assert mcp_web_server.drain_controller.draining
+        assert server.should_exit
+
+    asyncio.run(scenario())
+
+
+def test_exit_signal_without_running_loop_stops_immediately():
+    server = mcp_web_server.DrainingServer(uvicorn.Config(mcp_web_server.app))
+    server.handle_exit(signal.SIGTERM, None)
+    assert server.should_exit